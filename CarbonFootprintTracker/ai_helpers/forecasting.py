@@ -7,6 +7,8 @@ and predicted changes in behavior.
 
 import datetime
 
+import numpy as np
+
 class CarbonForecaster:
     """
     Forecasts future carbon metrics based on current data and potential changes.
@@ -35,96 +37,254 @@ class CarbonForecaster:
         Returns:
             dict: Forecast data including monthly projections and potential savings
         """
-        # Convert to annual emissions (52 weeks)
-        annual_emissions = current_emissions * 52
-        
-        # Current month as starting point
-        current_month = datetime.datetime.now().month
-        current_year = datetime.datetime.now().year
-        
-        # Calculate monthly reduction rate
-        monthly_reduction = self.reduction_rate / 12
-        
-        # Generate forecast data
-        forecast = []
-        cumulative_savings = 0
-        baseline_annual = annual_emissions
+        return self.forecast_individual_batch([current_emissions], months)[0]
+    
+    def forecast_individual_batch(self, current_emissions, months=12):
+        """
+        Forecast many individuals at once, like forecast_individual_emissions.
         
-        for i in range(months):
-            month_num = (current_month + i) % 12
-            if month_num == 0:
-                month_num = 12
-                
-            year = current_year + (current_month + i - 1) // 12
-            
-            # Calculate expected emissions with reductions
-            reduction_factor = 1 - (monthly_reduction * i)
-            monthly_emissions = (annual_emissions / 12) * reduction_factor
-            
-            # Calculate baseline (no changes) emissions
-            baseline_monthly = baseline_annual / 12
-            
-            # Calculate savings
-            monthly_savings = baseline_monthly - monthly_emissions
-            cumulative_savings += monthly_savings
+        Args:
+            current_emissions (array-like): Current weekly emissions in kg CO2
+            months (int): Number of months to forecast
             
-            # Add to forecast data
-            forecast.append({
-                'month': month_num,
-                'year': year,
-                'emissions': round(monthly_emissions, 2),
-                'baseline': round(baseline_monthly, 2),
-                'savings': round(monthly_savings, 2),
-                'cumulative_savings': round(cumulative_savings, 2)
-            })
+        Returns:
+            list: One forecast_individual_emissions result per input value
+        """
+        projection = self.forecast_batch(current_emissions, months)
+        cumulative = np.cumsum(projection['savings'], axis=1)
         
-        return {
-            'forecast': forecast,
-            'total_annual_savings': round(cumulative_savings, 2),
-            'reduction_percentage': round(self.reduction_rate * 100, 1)
-        }
+        results = []
+        for emissions, baseline, savings, running in zip(
+            projection['emissions'], projection['baseline'], projection['savings'], cumulative
+        ):
+            cumulative_savings = float(running[-1]) if months > 0 else 0
+            forecast = [
+                {
+                    'month': month_num,
+                    'year': year,
+                    'emissions': round(float(emissions[i]), 2),
+                    'baseline': round(float(baseline[i]), 2),
+                    'savings': round(float(savings[i]), 2),
+                    'cumulative_savings': round(float(running[i]), 2)
+                }
+                for i, (month_num, year) in enumerate(projection['months'])
+            ]
+            results.append({
+                'forecast': forecast,
+                'total_annual_savings': round(cumulative_savings, 2),
+                'reduction_percentage': round(self.reduction_rate * 100, 1)
+            })
+        return results
     
     def forecast_company_emissions(self, employee_data, months=12):
         """
         Forecast company-wide emissions based on employee data.
         
+        Every employee is projected individually (see forecast_batch) and the
+        projections are summed, so the forecast follows the actual spread of
+        emissions and reduction rates rather than the mean.
+        
         Args:
-            employee_data (list): List of employee emission data
+            employee_data (list): Dicts with 'total_footprint' (weekly kg CO2) and
+                optionally 'reduction_rate' and 'department'; with departments
+                the result includes a per-department forecast
             months (int): Number of months to forecast
             
         Returns:
             dict: Company-wide forecast data
         """
-        # Calculate current company emissions (sum of all employees)
-        total_current_emissions = sum(emp['total_footprint'] for emp in employee_data)
-        
-        # Get average emissions per employee
         num_employees = len(employee_data)
-        avg_emissions = total_current_emissions / num_employees if num_employees > 0 else 0
+        current = np.array([emp['total_footprint'] or 0 for emp in employee_data], dtype=float)
+        
+        # Employees may carry their own expected reduction rate
+        rates = None
+        if any(emp.get('reduction_rate') is not None for emp in employee_data):
+            rates = [
+                self.reduction_rate if emp.get('reduction_rate') is None else emp['reduction_rate']
+                for emp in employee_data
+            ]
         
-        # Get individual forecast and scale to company level
-        individual_forecast = self.forecast_individual_emissions(avg_emissions, months)
+        groups = None
+        if any('department' in emp for emp in employee_data):
+            groups = [emp.get('department') or 'Other' for emp in employee_data]
         
-        # Scale to company level
-        company_forecast = []
-        for month_data in individual_forecast['forecast']:
-            company_month = month_data.copy()
-            company_month['emissions'] = round(month_data['emissions'] * num_employees, 2)
-            company_month['baseline'] = round(month_data['baseline'] * num_employees, 2)
-            company_month['savings'] = round(month_data['savings'] * num_employees, 2)
-            company_month['cumulative_savings'] = round(month_data['cumulative_savings'] * num_employees, 2)
-            company_forecast.append(company_month)
+        projection = self.forecast_batch(current, months, reduction_rates=rates, groups=groups)
+        emissions = projection['emissions'].sum(axis=0)
+        baseline = projection['baseline'].sum(axis=0)
+        savings = baseline - emissions
+        cumulative = np.cumsum(savings)
+        
+        company_forecast = [
+            {
+                'month': month_num,
+                'year': year,
+                'emissions': round(float(emissions[i]), 2),
+                'baseline': round(float(baseline[i]), 2),
+                'savings': round(float(savings[i]), 2),
+                'cumulative_savings': round(float(cumulative[i]), 2)
+            }
+            for i, (month_num, year) in enumerate(projection['months'])
+        ]
         
         # Calculate total potential company savings
-        total_company_savings = individual_forecast['total_annual_savings'] * num_employees
+        total_company_savings = float(cumulative[-1]) if months > 0 and num_employees > 0 else 0
+        avg_emissions = float(current.mean()) if num_employees > 0 else 0
         
-        return {
+        # Effective company-wide rate: the emissions-weighted mean of the employee rates
+        if rates is not None and current.sum() > 0:
+            reduction_rate = float(np.average(projection['reduction_rates'], weights=current))
+        else:
+            reduction_rate = self.reduction_rate
+        
+        result = {
             'forecast': company_forecast,
             'total_annual_savings': round(total_company_savings, 2),
-            'reduction_percentage': individual_forecast['reduction_percentage'],
+            'reduction_percentage': round(reduction_rate * 100, 1),
             'employee_count': num_employees,
             'average_employee_emissions': round(avg_emissions, 2)
         }
+        if groups is not None:
+            result['department_forecast'] = {
+                str(group): [round(float(value), 2) for value in projection['group_emissions'][g]]
+                for g, group in enumerate(projection['groups'])
+            }
+        return result
+    
+    def forecast_batch(self, current_emissions, months=12, reduction_rates=None, groups=None):
+        """
+        Forecast many employees' monthly emissions in one vectorized pass.
+        
+        Follows forecast_individual_emissions: weekly emissions become a
+        monthly baseline (x 52 / 12) that falls linearly by rate / 12 per month.
+        
+        Args:
+            current_emissions (array-like): Current weekly emissions in kg CO2, one per employee
+            months (int): Number of months to forecast
+            reduction_rates (float or array-like, optional): Expected annual reduction
+                rate per employee (defaults to the forecaster's rate)
+            groups (array-like, optional): Group label per employee (e.g. department)
+                to aggregate projections by
+            
+        Returns:
+            dict: 'months' ((month, year) tuples), 'reduction_rates' (employees,),
+                  and 'emissions', 'baseline' and 'savings' matrices of shape
+                  (employees, months); with groups, also 'groups' (sorted unique
+                  labels) and 'group_emissions', 'group_baseline' of shape
+                  (groups, months)
+        """
+        current = np.asarray(current_emissions, dtype=float)
+        if reduction_rates is None:
+            reduction_rates = self.reduction_rate
+        rates = np.broadcast_to(np.asarray(reduction_rates, dtype=float), current.shape)
+        
+        monthly_baseline = current * 52 / 12
+        reduction_factor = 1 - np.outer(rates / 12, np.arange(months))
+        emissions = monthly_baseline[:, None] * reduction_factor
+        baseline = np.broadcast_to(monthly_baseline[:, None], emissions.shape)
+        
+        result = {
+            'months': self.forecast_months(months),
+            'reduction_rates': rates,
+            'emissions': emissions,
+            'baseline': baseline,
+            'savings': baseline - emissions
+        }
+        
+        if groups is not None:
+            labels, inverse = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+            # One bincount over (group, month) cells sums every employee into its group
+            cells = (inverse[:, None] * months + np.arange(months)).ravel()
+            size = len(labels) * months
+            result['groups'] = labels.tolist()
+            result['group_emissions'] = np.bincount(cells, weights=emissions.ravel(), minlength=size).reshape(len(labels), months)
+            result['group_baseline'] = np.bincount(cells, weights=baseline.ravel(), minlength=size).reshape(len(labels), months)
+        
+        return result
+    
+    def simulate_reduction_scenarios(self, current_emissions, switchable_emissions=0.0, switched_emissions=0.0,
+                                     trials=10000, months=60, rate_mean=None, rate_sd=0.05,
+                                     adoption_share=(0.1, 0.5), adoption_midpoint=(12, 36), adoption_steepness=0.25,
+                                     factor_sd=0.1, percentiles=(5, 25, 50, 75, 95), seed=None):
+        """
+        Run Monte Carlo trials of future emissions under uncertain reductions.
+        
+        Each trial draws an annual reduction rate (normal, clipped to 0-95%),
+        an electric car adoption curve (logistic, with a random final share of
+        switchable car commuters and a random midpoint month) and an emission
+        factor multiplier (lognormal with mean 1). All trials are evaluated
+        together as a (trials x months) array.
+        
+        Args:
+            current_emissions (float): Current weekly emissions in kg CO2
+            switchable_emissions (float): Weekly kg CO2 of gas and hybrid car commutes
+            switched_emissions (float): Weekly kg CO2 of the same commutes by electric car
+            trials (int): Number of Monte Carlo trials
+            months (int): Months simulated (60 gives 5-year outcomes)
+            rate_mean (float, optional): Mean annual reduction rate (defaults to the forecaster's)
+            rate_sd (float): Standard deviation of the annual reduction rate
+            adoption_share (tuple): Range of the final share of car commuters switching
+            adoption_midpoint (tuple): Range of the month when half of them have switched
+            adoption_steepness (float): Logistic adoption slope per month
+            factor_sd (float): Log-scale standard deviation of the emission factors
+            percentiles (tuple): Percentiles reported for every outcome
+            seed (int, optional): Random seed for reproducible results
+            
+        Returns:
+            dict: 'year1' and 'year5' (None under 60 months) outcomes with
+                  emissions and savings per percentile, 'monthly_bands' (one
+                  list per percentile), the baseline and the run settings
+        """
+        rng = np.random.default_rng(seed)
+        rate_mean = self.reduction_rate if rate_mean is None else rate_mean
+        rates = np.clip(rng.normal(rate_mean, rate_sd, trials), 0.0, 0.95)
+        share = rng.uniform(adoption_share[0], adoption_share[1], trials)
+        midpoint = rng.uniform(adoption_midpoint[0], adoption_midpoint[1], trials)
+        factor = rng.lognormal(-factor_sd ** 2 / 2, factor_sd, trials)
+        
+        elapsed = np.arange(months)
+        adoption = share[:, None] / (1 + np.exp(-adoption_steepness * (elapsed - midpoint[:, None])))
+        weekly = current_emissions - adoption * (switchable_emissions - switched_emissions)
+        retained = (1 - rates[:, None]) ** (elapsed / 12)
+        monthly = weekly * (52 / 12) * factor[:, None] * retained
+        
+        baseline_annual = current_emissions * 52
+        
+        def outcome(first_month):
+            if months < first_month + 12:
+                return None
+            emissions = monthly[:, first_month:first_month + 12].sum(axis=1)
+            bands = np.percentile(emissions, percentiles)
+            return {
+                'emissions': {f'p{p}': round(float(v), 2) for p, v in zip(percentiles, bands)},
+                # Lower emissions mean higher savings, so the bands flip
+                'savings': {f'p{p}': round(float(baseline_annual - v), 2) for p, v in zip(percentiles, bands[::-1])},
+                'mean': round(float(emissions.mean()), 2)
+            }
+        
+        monthly_bands = np.percentile(monthly, percentiles, axis=0)
+        return {
+            'trials': trials,
+            'months': months,
+            'seed': seed,
+            'percentiles': list(percentiles),
+            'baseline_annual': round(baseline_annual, 2),
+            'year1': outcome(0),
+            'year5': outcome(48),
+            'monthly_bands': {
+                f'p{p}': [round(float(v), 2) for v in band]
+                for p, band in zip(percentiles, monthly_bands)
+            },
+            'labels': [f"{month}/{year}" for month, year in self.forecast_months(months)]
+        }
+    
+    def forecast_months(self, months):
+        """(month, year) of each forecast month, starting with the current one."""
+        current_month = datetime.datetime.now().month
+        current_year = datetime.datetime.now().year
+        return [
+            ((current_month + i - 1) % 12 + 1, current_year + (current_month + i - 1) // 12)
+            for i in range(months)
+        ]
     
     def calculate_reduction_scenarios(self, current_emissions):
         """
@@ -170,3 +330,113 @@ class CarbonForecaster:
             })
         
         return results
+
+
+class HoltWintersModel:
+    """
+    Additive Holt-Winters (damped trend, monthly seasonality) on a monthly series.
+    
+    The model state is a plain dict so it can be persisted and updated one
+    observation at a time: each update is O(1) regardless of the history
+    length. Months without an observation are skipped by projecting the level
+    and trend forward in closed form.
+    """
+    
+    def __init__(self, alpha=0.5, beta=0.1, gamma=0.1, phi=0.9, period=12):
+        """
+        Initialize the smoothing parameters.
+        
+        Args:
+            alpha (float): Level smoothing (0-1)
+            beta (float): Trend smoothing (0-1)
+            gamma (float): Seasonal smoothing (0-1)
+            phi (float): Trend damping per month (0-1)
+            period (int): Season length in months
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.phi = phi
+        self.period = period
+    
+    def new_state(self):
+        """
+        Create the state of a model without observations.
+        
+        Returns:
+            dict: level, trend, seasonal (one value per period month), month
+                  (index of the last observation) and observations
+        """
+        return {'level': 0.0, 'trend': 0.0, 'seasonal': [0.0] * self.period, 'month': None, 'observations': 0}
+    
+    def _damped_sum(self, steps):
+        """phi + phi^2 + ... + phi^steps."""
+        if steps <= 0:
+            return 0.0
+        if self.phi == 1:
+            return float(steps)
+        return self.phi * (1 - self.phi ** steps) / (1 - self.phi)
+    
+    def update(self, state, month, value):
+        """
+        Fold one monthly observation into a state.
+        
+        Args:
+            state (dict): Current state (see new_state)
+            month (int): Month index (year * 12 + month - 1), after the state's month
+            value (float): Observed value for that month
+            
+        Returns:
+            dict: The updated state (the input is left unchanged)
+        """
+        seasonal = list(state['seasonal'])
+        season = month % self.period
+        
+        if state['observations'] == 0:
+            return {'level': value, 'trend': 0.0, 'seasonal': seasonal, 'month': month, 'observations': 1}
+        
+        gap = month - state['month']
+        if gap <= 0:
+            raise ValueError("Observations must be applied in month order")
+        
+        if state['observations'] == 1:
+            # The second observation initializes the trend
+            trend = (value - state['level']) / gap
+            return {'level': value, 'trend': trend, 'seasonal': seasonal, 'month': month, 'observations': 2}
+        
+        # Project through months without data, then smooth as usual
+        previous_level = state['level'] + state['trend'] * self._damped_sum(gap - 1)
+        previous_trend = state['trend'] * self.phi ** (gap - 1)
+        level = self.alpha * (value - seasonal[season]) + (1 - self.alpha) * (previous_level + self.phi * previous_trend)
+        trend = self.beta * (level - previous_level) + (1 - self.beta) * self.phi * previous_trend
+        seasonal[season] = self.gamma * (value - level) + (1 - self.gamma) * seasonal[season]
+        
+        return {
+            'level': level,
+            'trend': trend,
+            'seasonal': seasonal,
+            'month': month,
+            'observations': state['observations'] + 1
+        }
+    
+    def forecast(self, state, first_month, months):
+        """
+        Forecast consecutive months from a state.
+        
+        Args:
+            state (dict): Fitted state with at least one observation
+            first_month (int): Month index of the first forecast month
+            months (int): Number of months to forecast
+            
+        Returns:
+            numpy.ndarray: Forecast values, floored at 0
+        """
+        targets = first_month + np.arange(months)
+        steps = targets - state['month']
+        if self.phi == 1:
+            damped = steps.astype(float)
+        else:
+            damped = self.phi * (1 - self.phi ** steps) / (1 - self.phi)
+        damped = np.where(steps > 0, damped, 0.0)
+        seasonal = np.asarray(state['seasonal'])[targets % self.period]
+        return np.maximum(state['level'] + state['trend'] * damped + seasonal, 0.0)
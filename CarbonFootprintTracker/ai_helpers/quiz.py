@@ -5,6 +5,15 @@ Provides educational quiz questions and scoring functionality for
 teaching employees about sustainability and carbon footprint concepts.
 """
 
+import json
+import random
+from bisect import bisect_right
+from collections import defaultdict
+
+QUESTION_FIELDS = ('id', 'category', 'difficulty', 'question', 'options', 'correct_answer', 'explanation')
+# Question ids index the packed per-user history, so they must be small and dense
+MAX_QUESTION_ID = 4095
+
 class SustainabilityQuiz:
     """
     A quiz system with sustainability-focused questions.
@@ -12,9 +21,81 @@ class SustainabilityQuiz:
     Manages a database of questions, generates quizzes, and scores responses.
     """
     
-    def __init__(self):
-        """Initialize the quiz system with a question bank."""
+    def __init__(self, question_file=None):
+        """
+        Initialize the quiz system with a question bank.
+        
+        Args:
+            question_file (str, optional): JSON file of additional questions (see load_file)
+        """
         self.question_bank = self._create_question_bank()
+        self._build_index()
+        if question_file:
+            self.load_file(question_file)
+    
+    def _build_index(self):
+        """
+        Index the question bank by id and precompute the sampling pools.
+        
+        Pools hold questions in bank order for every category, every
+        difficulty and every (category, difficulty) pair.
+        """
+        self.questions_by_id = {q['id']: q for q in self.question_bank}
+        self._positions = {q['id']: position for position, q in enumerate(self.question_bank)}
+        by_category = defaultdict(list)
+        by_difficulty = defaultdict(list)
+        by_category_difficulty = defaultdict(list)
+        for q in self.question_bank:
+            by_category[q['category']].append(q)
+            by_difficulty[q['difficulty']].append(q)
+            by_category_difficulty[(q['category'], q['difficulty'])].append(q)
+        self.by_category = dict(by_category)
+        self.by_difficulty = dict(by_difficulty)
+        self.by_category_difficulty = dict(by_category_difficulty)
+    
+    def add_questions(self, questions):
+        """
+        Add questions to the bank, replacing any with the same id.
+        
+        Args:
+            questions (list): Question dicts with the QUESTION_FIELDS keys
+            
+        Raises:
+            ValueError: If a question is missing a field, its id is not an
+                        integer between 0 and MAX_QUESTION_ID, or its correct
+                        answer is not one of its options
+        """
+        for q in questions:
+            missing = [field for field in QUESTION_FIELDS if field not in q]
+            if missing:
+                raise ValueError(f"Question {q.get('id')} is missing {', '.join(missing)}")
+            if type(q['id']) is not int or not 0 <= q['id'] <= MAX_QUESTION_ID:
+                raise ValueError(f"Question id {q['id']!r} must be an integer between 0 and {MAX_QUESTION_ID}")
+            if not 0 <= q['correct_answer'] < len(q['options']):
+                raise ValueError(f"Question {q['id']} has no option {q['correct_answer']}")
+        
+        added = {q['id']: q for q in questions}
+        bank = [added.pop(q['id'], q) for q in self.question_bank]
+        self.question_bank = bank + list(added.values())
+        self._build_index()
+    
+    def load_file(self, path):
+        """
+        Add the questions of a JSON file to the bank.
+        
+        The file holds a list of questions, or {"questions": [...]}, in the
+        same format as the built-in bank.
+        
+        Args:
+            path (str): Path to the JSON file
+            
+        Returns:
+            int: Number of questions in the bank
+        """
+        with open(path) as f:
+            data = json.load(f)
+        self.add_questions(data['questions'] if isinstance(data, dict) else data)
+        return len(self.question_bank)
     
     def _create_question_bank(self):
         """
@@ -206,30 +287,105 @@ class SustainabilityQuiz:
         Returns:
             list: Selected quiz questions
         """
-        # Filter questions based on criteria
-        filtered_questions = self.question_bank.copy()
+        pools, total = self._matching_pools(num_questions, categories, difficulty)
+        if total <= num_questions:
+            # Every matching question, in bank order
+            return sorted((q for pool in pools for q in pool), key=lambda q: self._positions[q['id']])
         
-        if categories:
-            filtered_questions = [q for q in filtered_questions if q['category'] in categories]
+        # Sample positions across the pools without concatenating them
+        bounds = self._bounds(pools)
+        quiz_questions = [self._question_at(pools, bounds, position) for position in random.sample(range(total), num_questions)]
             
-        if difficulty:
-            filtered_questions = [q for q in filtered_questions if q['difficulty'] == difficulty]
+        # For API/route consumption, include all question data
+        # This will be used by the backend to score the quiz
+        return quiz_questions
+    
+    def generate_adaptive_quiz(self, num_questions, weight, categories=None, difficulty=None, max_draws_per_question=50):
+        """
+        Generate a quiz that favors the questions a user most needs to see.
+        
+        Candidates are drawn uniformly from the matching pools and accepted
+        with probability weight(question id) (rejection sampling), so
+        selection costs O(num_questions / mean weight) whatever the bank size.
+        Slots still open after the draw budget are filled uniformly.
+        
+        Args:
+            num_questions (int): Number of questions to include
+            weight (callable): Question id -> selection weight in (0, 1]
+            categories (list, optional): Filter by specific categories
+            difficulty (str, optional): Filter by difficulty level
+            max_draws_per_question (int): Draw budget per question before filling uniformly
             
+        Returns:
+            list: Selected quiz questions
+        """
+        pools, total = self._matching_pools(num_questions, categories, difficulty)
+        if total <= num_questions:
+            # Every matching question, in bank order
+            return sorted((q for pool in pools for q in pool), key=lambda q: self._positions[q['id']])
+        
+        bounds = self._bounds(pools)
+        chosen = {}
+        for _ in range(num_questions * max_draws_per_question):
+            if len(chosen) >= num_questions:
+                break
+            q = self._question_at(pools, bounds, random.randrange(total))
+            if q['id'] not in chosen and random.random() < weight(q['id']):
+                chosen[q['id']] = q
+        
+        if len(chosen) < num_questions:
+            rest = [q for pool in pools for q in pool if q['id'] not in chosen]
+            for q in random.sample(rest, num_questions - len(chosen)):
+                chosen[q['id']] = q
+        return list(chosen.values())
+    
+    @staticmethod
+    def _bounds(pools):
+        """Cumulative pool sizes, for mapping a position to its pool."""
+        bounds = []
+        for pool in pools:
+            bounds.append((bounds[-1] if bounds else 0) + len(pool))
+        return bounds
+    
+    @staticmethod
+    def _question_at(pools, bounds, position):
+        p = bisect_right(bounds, position)
+        return pools[p][position - (bounds[p - 1] if p else 0)]
+    
+    def _matching_pools(self, num_questions, categories, difficulty):
+        """Pools of the questions matching the filters, and their total size."""
+        pools = self._pools(categories, difficulty)
+        total = sum(len(pool) for pool in pools)
+        
         # Ensure we have enough questions
-        if len(filtered_questions) < num_questions:
+        if total < num_questions:
             # Fall back to all questions if filters are too restrictive
-            filtered_questions = self.question_bank.copy()
-            
-        # Select random subset up to num_questions
-        import random
-        if len(filtered_questions) > num_questions:
-            quiz_questions = random.sample(filtered_questions, num_questions)
-        else:
-            quiz_questions = filtered_questions
+            pools = [self.question_bank]
+            total = len(self.question_bank)
+        return pools, total
+    
+    def _pools(self, categories, difficulty):
+        """Precomputed pools whose union is the questions matching the filters."""
+        if not categories:
+            if difficulty:
+                return [self.by_difficulty.get(difficulty, [])]
+            return [self.question_bank]
+        categories = dict.fromkeys(categories)
+        if difficulty:
+            return [self.by_category_difficulty.get((category, difficulty), []) for category in categories]
+        return [self.by_category.get(category, []) for category in categories]
+    
+    def get_questions(self, question_ids):
+        """
+        Look up questions by id.
+        
+        Args:
+            question_ids (list): Question ids
             
-        # For API/route consumption, include all question data
-        # This will be used by the backend to score the quiz
-        return quiz_questions
+        Returns:
+            list: The questions in the given order, skipping unknown ids
+        """
+        return [self.questions_by_id[qid] for qid in question_ids if qid in self.questions_by_id]
     
     def score_quiz(self, user_answers):
         """
@@ -241,8 +397,7 @@ class SustainabilityQuiz:
         Returns:
             dict: Quiz results with score, feedback, and explanations
         """
-        # Map questions by ID for easy lookup
-        questions_by_id = {q['id']: q for q in self.question_bank}
+        questions_by_id = self.questions_by_id
         
         # Calculate score
         correct_count = 0
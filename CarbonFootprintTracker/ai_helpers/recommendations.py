@@ -69,11 +69,18 @@ class RecommendationEngine:
                 ]
             }
         }
+        
+        # (profile signature, limit) -> recommendations
+        self._signature_cache = {}
     
     def get_personalized_recommendations(self, user_data, limit=3):
         """
         Generate personalized recommendations based on user profile.
         
+        Results are memoized by profile signature (see profile_signature), so
+        users with equivalent profiles share one computation. The returned
+        dicts are shared and must not be modified.
+        
         Args:
             user_data (dict): User's carbon footprint data
             limit (int): Maximum number of recommendations to return
@@ -81,8 +88,81 @@ class RecommendationEngine:
         Returns:
             list: Personalized sustainability recommendations
         """
+        return list(self._recommendations_for_signature(self.profile_signature(user_data), limit))
+    
+    def get_batch_recommendations(self, users_data, limit=3):
+        """
+        Generate recommendations for many users at once.
+        
+        Users are bucketed by profile signature and each distinct signature
+        is computed once.
+        
+        Args:
+            users_data (iterable): User data dicts, as for get_personalized_recommendations
+            limit (int): Maximum number of recommendations per user
+            
+        Returns:
+            list: One recommendation list per user, in input order
+        """
+        signatures = [self.profile_signature(user_data) for user_data in users_data]
+        by_signature = {signature: self._recommendations_for_signature(signature, limit) for signature in set(signatures)}
+        return [list(by_signature[signature]) for signature in signatures]
+    
+    def profile_signature(self, user_data):
+        """
+        Discretize a user profile into the inputs recommendations depend on.
+        
+        Args:
+            user_data (dict): User's carbon footprint data
+            
+        Returns:
+            tuple: Impact level (or None) of the commute, diet and office categories
+        """
+        # Commute
+        if user_data.get('commute_mode') == 'car' and user_data.get('car_type') == 'gas':
+            commute = 'high'
+        elif user_data.get('commute_mode') == 'car':
+            commute = 'medium'
+        elif user_data.get('commute_distance', 0) > 20:
+            commute = 'medium'
+        elif user_data.get('commute_distance', 0) > 5:
+            commute = 'low'
+        else:
+            commute = None
+        
+        # Diet
+        if user_data.get('diet_type') == 'omnivore':
+            diet = 'high'
+        elif user_data.get('diet_type') == 'pescatarian':
+            diet = 'medium'
+        elif user_data.get('local_food_percentage', 0) < 30:
+            diet = 'medium'
+        else:
+            diet = 'low'
+        
+        # Office
+        if user_data.get('paper_usage') == 'high' or user_data.get('energy_usage') == 'high':
+            office = 'high'
+        elif user_data.get('paper_usage') == 'medium' or user_data.get('energy_usage') == 'medium':
+            office = 'medium'
+        else:
+            office = 'low'
+        
+        return (commute, diet, office)
+    
+    def _recommendations_for_signature(self, signature, limit):
+        """Recommendations of a profile signature, computed once per (signature, limit)."""
+        key = (signature, limit)
+        recommendations = self._signature_cache.get(key)
+        if recommendations is None:
+            recommendations = tuple(self._build_recommendations(self._areas_for_signature(signature), limit))
+            # At most 36 signatures per limit, so the cache stays small
+            self._signature_cache[key] = recommendations
+        return recommendations
+    
+    def _build_recommendations(self, categories_to_improve, limit):
+        """Pick recommendations for prioritized improvement areas, then fill with general ones."""
         recommendations = []
-        categories_to_improve = self._identify_improvement_areas(user_data)
         
         # Get recommendations for top categories to improve
         for category, impact in categories_to_improve[:limit]:
@@ -102,26 +182,18 @@ class RecommendationEngine:
                         'text': self.recommendations[category][impact][1]
                     })
         
-        # Fill remaining slots with general recommendations if needed
-        while len(recommendations) < limit:
-            for category in ['commute', 'diet', 'office']:
-                if len(recommendations) < limit:
-                    for impact in ['medium', 'low']:
-                        if len(recommendations) < limit and self.recommendations[category][impact]:
-                            # Check if this recommendation is already included
-                            new_rec = {
-                                'category': category.capitalize(),
-                                'impact_level': impact,
-                                'text': self.recommendations[category][impact][0]
-                            }
-                            if new_rec not in recommendations:
-                                recommendations.append(new_rec)
-                            
-                            if len(recommendations) >= limit:
-                                break
-                    
+        # Fill remaining slots with general recommendations, skipping ones already included
+        included = {(rec['category'], rec['impact_level'], rec['text']) for rec in recommendations}
+        for category in ['commute', 'diet', 'office']:
+            for impact in ['medium', 'low']:
                 if len(recommendations) >= limit:
                     break
+                if not self.recommendations[category][impact]:
+                    continue
+                new_rec = (category.capitalize(), impact, self.recommendations[category][impact][0])
+                if new_rec not in included:
+                    included.add(new_rec)
+                    recommendations.append(dict(zip(('category', 'impact_level', 'text'), new_rec)))
         
         return recommendations[:limit]
     
@@ -135,35 +207,15 @@ class RecommendationEngine:
         Returns:
             list: Categories to improve with impact levels, ordered by priority
         """
-        improvement_areas = []
-        
-        # Check commute data
-        if user_data.get('commute_mode') == 'car' and user_data.get('car_type') == 'gas':
-            improvement_areas.append(('commute', 'high'))
-        elif user_data.get('commute_mode') == 'car':
-            improvement_areas.append(('commute', 'medium'))
-        elif user_data.get('commute_distance', 0) > 20:
-            improvement_areas.append(('commute', 'medium'))
-        elif user_data.get('commute_distance', 0) > 5:
-            improvement_areas.append(('commute', 'low'))
-            
-        # Check diet data
-        if user_data.get('diet_type') == 'omnivore':
-            improvement_areas.append(('diet', 'high'))
-        elif user_data.get('diet_type') == 'pescatarian':
-            improvement_areas.append(('diet', 'medium'))
-        elif user_data.get('local_food_percentage', 0) < 30:
-            improvement_areas.append(('diet', 'medium'))
-        else:
-            improvement_areas.append(('diet', 'low'))
-            
-        # Check office data
-        if user_data.get('paper_usage') == 'high' or user_data.get('energy_usage') == 'high':
-            improvement_areas.append(('office', 'high'))
-        elif user_data.get('paper_usage') == 'medium' or user_data.get('energy_usage') == 'medium':
-            improvement_areas.append(('office', 'medium'))
-        else:
-            improvement_areas.append(('office', 'low'))
+        return self._areas_for_signature(self.profile_signature(user_data))
+    
+    def _areas_for_signature(self, signature):
+        """Improvement areas of a profile signature, ordered by priority."""
+        improvement_areas = [
+            (category, impact)
+            for category, impact in zip(('commute', 'diet', 'office'), signature)
+            if impact is not None
+        ]
             
         # Sort by impact level (high, medium, low)
         impact_priority = {'high': 0, 'medium': 1, 'low': 2}
@@ -36,10 +36,37 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["TEMPLATES_AUTO_RELOAD"] = os.getenv("TEMPLATES_AUTO_RELOAD", "True").lower() == "true"
+# Per-request SQL statistics (query count, DB time, rows); off by default
+app.config["SQL_INSTRUMENTATION"] = os.getenv("SQL_INSTRUMENTATION", "False").lower() == "true"
+# JSON API response cache: 'memory' (per process) or 'redis' (shared by all workers)
+app.config["CACHE_BACKEND"] = os.getenv("CACHE_BACKEND", "memory")
+app.config["CACHE_REDIS_URL"] = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+app.config["CACHE_TTL"] = int(os.getenv("CACHE_TTL", "60"))  # seconds
+app.config["CACHE_MAX_ENTRIES"] = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+# Session storage: 'cookie' (Flask's signed cookie), 'sql' or 'filesystem' (server-side)
+app.config["SESSION_BACKEND"] = os.getenv("SESSION_BACKEND", "cookie")
+app.config["SESSION_FILE_DIR"] = os.getenv("SESSION_FILE_DIR", os.path.join(app.instance_path, "sessions"))
+app.config["SESSION_GC_INTERVAL"] = int(os.getenv("SESSION_GC_INTERVAL", "300"))  # seconds
+app.config["SESSION_GC_BATCH_SIZE"] = int(os.getenv("SESSION_GC_BATCH_SIZE", "1000"))
+# Password hashing pool: method/cost (werkzeug spec, e.g. "scrypt:32768:8:1"), workers, waiting slots
+app.config["PASSWORD_HASH_METHOD"] = os.getenv("PASSWORD_HASH_METHOD")  # None = werkzeug's default
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+app.config["PASSWORD_HASH_QUEUE"] = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+app.config["PASSWORD_HASH_TIMEOUT"] = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))  # seconds
+# Optional JSON file of quiz questions added to the built-in bank
+app.config["QUIZ_QUESTION_FILE"] = os.getenv("QUIZ_QUESTION_FILE")
 
 # Initialize the app with the extension
 db.init_app(app)
 
+# Cache versioned by committed writes to each table
+from services.cache import response_cache
+response_cache.init_app(app, db.session)
+
+# Hash passwords on a bounded worker pool
+from services.passwords import password_hasher
+password_hasher.init_app(app)
+
 # Initialize login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -50,6 +77,15 @@ with app.app_context():
     # Import models first to register them with SQLAlchemy
     import models
 
+    # Hook SQL instrumentation into the engine only when enabled
+    if app.config["SQL_INSTRUMENTATION"]:
+        from services.instrumentation import SQLInstrumentation
+        SQLInstrumentation().init_app(app, db.engine)
+
+    # Keep sessions server-side when configured
+    from services.sessions import init_session_interface
+    init_session_interface(app, db.engine)
+
     # Register blueprints
     from routes.auth import auth_bp
     from routes.employee import employee_bp
@@ -59,9 +95,36 @@ with app.app_context():
     app.register_blueprint(employee_bp)
     app.register_blueprint(company_bp)
 
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
+
     # Create all database tables
     db.create_all()
 
+    # create_all does not add columns to existing tables; add the ones introduced since
+    from sqlalchemy import inspect, text
+    footprint_columns = {column['name'] for column in inspect(db.engine).get_columns('carbon_footprint')}
+    if 'factor_version' not in footprint_columns:
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text('ALTER TABLE carbon_footprint ADD COLUMN factor_version VARCHAR(20)'))
+        except Exception as e:
+            # Another worker may have added it at the same time
+            logging.error(f"Error adding carbon_footprint.factor_version: {str(e)}")
+
+    # Backfill the monthly rollups the first time they are deployed
+    from models import CarbonFootprint, MonthlyFootprintRollup
+    if MonthlyFootprintRollup.query.first() is None and CarbonFootprint.query.first() is not None:
+        from services.rollups import rebuild_rollups
+        try:
+            rebuild_rollups()
+            db.session.commit()
+        except Exception as e:
+            # Another worker may be backfilling at the same time
+            logging.error(f"Error backfilling monthly rollups: {str(e)}")
+            db.session.rollback()
+
     # Add seed data for events only if the table is empty
     from models import CompanyEvent
     from datetime import datetime, timedelta
@@ -9,10 +9,33 @@ This module calculates carbon footprints based on various lifestyle factors incl
 It uses standardized emission factors to convert activities into CO2 equivalent emissions.
 """
 
-from carbon_calculator.emission_factors import (
-    COMMUTE_FACTORS, 
-    DIET_FACTORS, 
-    OFFICE_FACTORS
+import numpy as np
+
+from carbon_calculator.factor_registry import (
+    factor_registry,
+    encode_labels,
+    CAR_TYPE_CODES,
+    COMMUTE_MODE_CODES,
+    DIET_TYPE_CODES,
+    USAGE_LEVEL_CODES,
+    GAS,
+    OMNIVORE,
+    MEDIUM,
+    CAR,
+    MODE,
+    BUS,
+    ELECTRIC_CAR,
+    DIET,
+    PAPER,
+    ENERGY,
+    HVAC,
+    VIDEO_HOUR,
+    COMPUTER_HOUR,
+    PRINTER_PAGE,
+    REMOTE_DAY_SAVINGS,
+    AIR_MILE,
+    HOTEL_NIGHT,
+    RENTAL_CAR_DAY
 )
 
 class CarbonFootprintCalculator:
@@ -23,9 +46,17 @@ class CarbonFootprintCalculator:
     generates an overall carbon footprint score on a 0-100 scale.
     """
     
-    def __init__(self):
-        """Initialize the calculator with default values."""
-        pass
+    def __init__(self, factor_version=None, registry=None):
+        """
+        Initialize the calculator with a compiled emission factor set.
+        
+        Args:
+            factor_version (str, optional): Factor set version (defaults to the
+                                            registry's default version)
+            registry (FactorRegistry, optional): Registry to resolve the version from
+        """
+        self.factors = (registry or factor_registry).get(factor_version)
+        self.factor_version = self.factors.version
         
     def calculate_commute_emissions(self, distance, mode, car_type=None):
         """
@@ -48,15 +79,10 @@ class CarbonFootprintCalculator:
         
         # Calculate based on mode of transportation
         if mode == 'car':
-            # Different emission factors for different car types
-            if car_type == 'electric':
-                factor = COMMUTE_FACTORS['car']['electric']
-            elif car_type == 'hybrid':
-                factor = COMMUTE_FACTORS['car']['hybrid']
-            else:  # Default to gas
-                factor = COMMUTE_FACTORS['car']['gas']
-        elif mode in COMMUTE_FACTORS:
-            factor = COMMUTE_FACTORS[mode]
+            # Different emission factors for different car types (default to gas)
+            factor = self.factors.values[CAR + CAR_TYPE_CODES.get(car_type, GAS)]
+        elif mode in COMMUTE_MODE_CODES:
+            factor = self.factors.values[MODE + COMMUTE_MODE_CODES[mode]]
         else:
             # Default for unknown modes (walking, biking, etc.)
             return 0
@@ -74,11 +100,8 @@ class CarbonFootprintCalculator:
         Returns:
             float: CO2 emissions in kg per week
         """
-        if diet_type not in DIET_FACTORS:
-            diet_type = 'omnivore'  # Default to omnivore if type not recognized
-            
-        # Get base emissions for diet type
-        base_emissions = DIET_FACTORS[diet_type]
+        # Get base emissions for diet type (default to omnivore if not recognized)
+        base_emissions = self.factors.values[DIET + DIET_TYPE_CODES.get(diet_type, OMNIVORE)]
         
         # Adjust for local food percentage (reduce emissions by up to 20% for local food)
         local_adjustment = 1 - (local_food_percentage / 100 * 0.2)
@@ -100,14 +123,11 @@ class CarbonFootprintCalculator:
         # Default values if None is provided
         if days_per_week is None:
             days_per_week = 0
-        if paper_usage not in OFFICE_FACTORS['paper']:
-            paper_usage = 'medium'
-        if energy_usage not in OFFICE_FACTORS['energy']:
-            energy_usage = 'medium'
             
-        # Calculate emissions from paper and energy usage
-        paper_emissions = OFFICE_FACTORS['paper'][paper_usage]
-        energy_emissions = OFFICE_FACTORS['energy'][energy_usage]
+        # Calculate emissions from paper and energy usage (default to medium)
+        factors = self.factors.values
+        paper_emissions = factors[PAPER + USAGE_LEVEL_CODES.get(paper_usage, MEDIUM)]
+        energy_emissions = factors[ENERGY + USAGE_LEVEL_CODES.get(energy_usage, MEDIUM)]
         
         # Scale by number of days in office
         total_office_emissions = (paper_emissions + energy_emissions) * days_per_week / 5
@@ -131,20 +151,17 @@ class CarbonFootprintCalculator:
         days_ev = commute_data.get('days_ev', 0)
         car_type = commute_data.get('car_type', 'gas')
         
-        # Calculate car emissions
-        car_factor = COMMUTE_FACTORS['car']['gas']  # default
-        if car_type == 'hybrid':
-            car_factor = COMMUTE_FACTORS['car']['hybrid']
-        elif car_type == 'electric':
-            car_factor = COMMUTE_FACTORS['car']['electric']
-            
+        factors = self.factors.values
+        
+        # Calculate car emissions (unknown car types count as gas)
+        car_factor = factors[CAR + CAR_TYPE_CODES.get(car_type, GAS)]
         car_emissions = distance * days_by_car * car_factor
         
         # Calculate EV emissions
-        ev_emissions = distance * days_ev * COMMUTE_FACTORS['car']['electric']
+        ev_emissions = distance * days_ev * factors[ELECTRIC_CAR]
         
         # Calculate public transit emissions
-        transit_emissions = distance * days_public_transit * COMMUTE_FACTORS['bus']
+        transit_emissions = distance * days_public_transit * factors[BUS]
         
         # Total weekly emissions (assuming round trip)
         total_emissions = (car_emissions + ev_emissions + transit_emissions) * 2
@@ -168,27 +185,19 @@ class CarbonFootprintCalculator:
         printer_pages = office_data.get('printer_pages', 0)
         hvac_usage = office_data.get('hvac_usage', 'medium')
         
-        # Calculate emissions from video conferencing
-        # Assume 1 hour of video = 0.5 kg CO2
-        video_emissions = video_hours * 0.5
-        
-        # Calculate emissions from computer usage
-        # Assume 1 hour of computer = 0.1 kg CO2
-        computer_emissions = computer_hours * 0.1
+        factors = self.factors.values
         
-        # Calculate emissions from printing
-        # Assume 1 page = 0.05 kg CO2
-        printer_emissions = printer_pages * 0.05
+        # Calculate emissions from video conferencing, computer usage and printing
+        video_emissions = video_hours * factors[VIDEO_HOUR]
+        computer_emissions = computer_hours * factors[COMPUTER_HOUR]
+        printer_emissions = printer_pages * factors[PRINTER_PAGE]
         
-        # Calculate emissions from HVAC
-        hvac_factors = {'low': 1.0, 'medium': 2.0, 'high': 3.0}
-        hvac_factor = hvac_factors.get(hvac_usage, 2.0)
-        # Assume baseline of 2.0 kg CO2 per day for HVAC at medium setting
+        # Calculate emissions from HVAC for each office day (default to medium)
+        hvac_factor = factors[HVAC + USAGE_LEVEL_CODES.get(hvac_usage, MEDIUM)]
         hvac_emissions = (5 - remote_days) * hvac_factor
         
         # Calculate remote work savings
-        # Assume 30% reduction in emissions for each remote day
-        remote_savings = remote_days * 1.5
+        remote_savings = remote_days * factors[REMOTE_DAY_SAVINGS]
         
         total_emissions = video_emissions + computer_emissions + printer_emissions + hvac_emissions - remote_savings
         
@@ -209,17 +218,12 @@ class CarbonFootprintCalculator:
         hotel_nights = travel_data.get('hotel_nights', 0)
         rental_car_days = travel_data.get('rental_car_days', 0)
         
-        # Calculate air travel emissions 
-        # Assume 0.2 kg CO2 per mile
-        air_emissions = air_miles * 0.2
+        factors = self.factors.values
         
-        # Calculate hotel stay emissions
-        # Assume 15 kg CO2 per night
-        hotel_emissions = hotel_nights * 15
-        
-        # Calculate rental car emissions
-        # Assume 10 kg CO2 per day (average usage)
-        car_emissions = rental_car_days * 10
+        # Calculate air travel, hotel stay and rental car emissions
+        air_emissions = air_miles * factors[AIR_MILE]
+        hotel_emissions = hotel_nights * factors[HOTEL_NIGHT]
+        car_emissions = rental_car_days * factors[RENTAL_CAR_DAY]
         
         return air_emissions + hotel_emissions + car_emissions
     
@@ -286,3 +290,94 @@ class CarbonFootprintCalculator:
             'total_emissions': round(total_emissions, 2),
             'footprint_score': score
         }
+
+    def calculate_batch_footprints(self, columns):
+        """
+        Calculate footprints for many submissions in one vectorized pass.
+        
+        Mirrors calculate_commute_footprint, calculate_office_footprint,
+        calculate_travel_footprint and calculate_footprint_score operation by
+        operation, so every element matches the scalar methods exactly.
+        
+        Args:
+            columns (dict): Column name to array-like of equal length. Accepts the
+                            keys of the commute_data, office_data and travel_data
+                            dicts (distance, days_by_car, days_public_transit,
+                            days_ev, car_type, remote_days, video_hours,
+                            computer_hours, printer_pages, hvac_usage, air_miles,
+                            hotel_nights, rental_car_days). car_type and hvac_usage
+                            may be labels or codes from factor_registry. Missing
+                            numeric columns default to 0, car_type to gas and
+                            hvac_usage to medium.
+            
+        Returns:
+            dict: NumPy arrays for commute_footprint, office_footprint,
+                  travel_footprint, total_footprint and footprint_score
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        
+        def numeric(name):
+            if name not in columns:
+                return np.zeros(size)
+            return np.asarray(columns[name], dtype=float)
+        
+        def codes(name, label_codes, default):
+            if name not in columns:
+                return np.full(size, default, dtype=np.intp)
+            return encode_labels(columns[name], label_codes, default)
+        
+        factors = self.factors.array
+        
+        # Commute emissions (round trip, weekly)
+        distance = numeric('distance')
+        car_factor = factors[CAR + codes('car_type', CAR_TYPE_CODES, GAS)]
+        car_emissions = distance * numeric('days_by_car') * car_factor
+        ev_emissions = distance * numeric('days_ev') * factors[ELECTRIC_CAR]
+        transit_emissions = distance * numeric('days_public_transit') * factors[BUS]
+        commute = (car_emissions + ev_emissions + transit_emissions) * 2
+        
+        # Office and remote work emissions (weekly, never negative)
+        remote_days = numeric('remote_days')
+        hvac_factor = factors[HVAC + codes('hvac_usage', USAGE_LEVEL_CODES, MEDIUM)]
+        office = (
+            numeric('video_hours') * factors[VIDEO_HOUR]
+            + numeric('computer_hours') * factors[COMPUTER_HOUR]
+            + numeric('printer_pages') * factors[PRINTER_PAGE]
+            + (5 - remote_days) * hvac_factor
+            - remote_days * factors[REMOTE_DAY_SAVINGS]
+        )
+        office = np.maximum(0, office)
+        
+        # Business travel emissions (monthly)
+        travel = (
+            numeric('air_miles') * factors[AIR_MILE]
+            + numeric('hotel_nights') * factors[HOTEL_NIGHT]
+            + numeric('rental_car_days') * factors[RENTAL_CAR_DAY]
+        )
+        
+        total = commute + office + travel
+        
+        return {
+            'commute_footprint': commute,
+            'office_footprint': office,
+            'travel_footprint': travel,
+            'total_footprint': total,
+            'footprint_score': self.calculate_batch_scores(total)
+        }
+    
+    def calculate_batch_scores(self, total_emissions):
+        """
+        Vectorized counterpart of calculate_footprint_score.
+        
+        Args:
+            total_emissions (array-like): Total carbon emissions in kg CO2
+            
+        Returns:
+            numpy.ndarray: Integer scores from 0-100 (100 is best)
+        """
+        total_emissions = np.asarray(total_emissions, dtype=float)
+        baseline = 100
+        # np.rint rounds half to even, like the built-in round()
+        linear = np.rint(np.clip(100 - (total_emissions / baseline * 50), 0, 100))
+        score = np.where(total_emissions <= 0, 100, np.where(total_emissions >= 200, 0, linear))
+        return score.astype(int)
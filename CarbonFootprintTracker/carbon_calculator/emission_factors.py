@@ -40,3 +40,42 @@ OFFICE_FACTORS = {
         'high': 30        # High energy consumption
     }
 }
+
+# HVAC emission factors (kg CO2 per office day)
+HVAC_FACTORS = {
+    'low': 1.0,           # Efficient settings
+    'medium': 2.0,        # Baseline setting
+    'high': 3.0           # Heavy heating or cooling
+}
+
+# Office activity emission factors (kg CO2 per unit)
+OFFICE_ACTIVITY_FACTORS = {
+    'video_hour': 0.5,          # One hour of video conferencing
+    'computer_hour': 0.1,       # One hour of computer use
+    'printer_page': 0.05,       # One printed page
+    'remote_day_savings': 1.5   # Office emissions avoided per remote day
+}
+
+# Business travel emission factors (kg CO2 per unit)
+TRAVEL_FACTORS = {
+    'air_mile': 0.2,      # One mile of air travel
+    'hotel_night': 15,    # One hotel night
+    'rental_car_day': 10  # One day of rental car use (average usage)
+}
+
+# Versioned factor sets. Add a new version here (rather than editing an
+# existing one) so stored footprints stay traceable to the factors used.
+DEFAULT_FACTOR_VERSION = '2025.1'
+# Version used for footprints saved before factor_version was recorded
+LEGACY_FACTOR_VERSION = '2025.1'
+
+FACTOR_SETS = {
+    '2025.1': {
+        'commute': COMMUTE_FACTORS,
+        'diet': DIET_FACTORS,
+        'office': OFFICE_FACTORS,
+        'hvac': HVAC_FACTORS,
+        'office_activity': OFFICE_ACTIVITY_FACTORS,
+        'travel': TRAVEL_FACTORS
+    }
+}
@@ -0,0 +1,266 @@
+"""
+Emission Factor Registry
+
+Loads versioned emission factor sets and compiles each one into a flat,
+immutable lookup table addressed by integer slot. Calculators resolve factors
+through these slots instead of nested dict lookups and string comparisons.
+"""
+
+import json
+from types import MappingProxyType
+
+import numpy as np
+
+from carbon_calculator.emission_factors import FACTOR_SETS, DEFAULT_FACTOR_VERSION
+
+# Category codes shared by scalar and batch calculations
+CAR_TYPES = ('gas', 'hybrid', 'electric')
+COMMUTE_MODES = ('bus', 'train', 'motorcycle', 'bike', 'walk')  # 'car' uses CAR_TYPES
+DIET_TYPES = ('omnivore', 'pescatarian', 'vegetarian', 'vegan')
+USAGE_LEVELS = ('low', 'medium', 'high')
+
+CAR_TYPE_CODES = MappingProxyType({name: code for code, name in enumerate(CAR_TYPES)})
+COMMUTE_MODE_CODES = MappingProxyType({name: code for code, name in enumerate(COMMUTE_MODES)})
+DIET_TYPE_CODES = MappingProxyType({name: code for code, name in enumerate(DIET_TYPES)})
+USAGE_LEVEL_CODES = MappingProxyType({name: code for code, name in enumerate(USAGE_LEVELS)})
+
+GAS = CAR_TYPE_CODES['gas']
+OMNIVORE = DIET_TYPE_CODES['omnivore']
+MEDIUM = USAGE_LEVEL_CODES['medium']
+
+# Flat layout of every compiled factor set. Each category occupies a contiguous
+# block, so a factor is found at the block's slot plus the category code.
+FACTOR_KEYS = tuple(
+    [f'commute.car.{name}' for name in CAR_TYPES]
+    + [f'commute.{name}' for name in COMMUTE_MODES]
+    + [f'diet.{name}' for name in DIET_TYPES]
+    + [f'office.paper.{name}' for name in USAGE_LEVELS]
+    + [f'office.energy.{name}' for name in USAGE_LEVELS]
+    + [f'hvac.{name}' for name in USAGE_LEVELS]
+    + [
+        'office_activity.video_hour',
+        'office_activity.computer_hour',
+        'office_activity.printer_page',
+        'office_activity.remote_day_savings',
+        'travel.air_mile',
+        'travel.hotel_night',
+        'travel.rental_car_day'
+    ]
+)
+FACTOR_INDEX = MappingProxyType({name: slot for slot, name in enumerate(FACTOR_KEYS)})
+
+CAR = FACTOR_INDEX['commute.car.gas']
+MODE = FACTOR_INDEX['commute.bus']
+BUS = FACTOR_INDEX['commute.bus']
+ELECTRIC_CAR = FACTOR_INDEX['commute.car.electric']
+DIET = FACTOR_INDEX['diet.omnivore']
+PAPER = FACTOR_INDEX['office.paper.low']
+ENERGY = FACTOR_INDEX['office.energy.low']
+HVAC = FACTOR_INDEX['hvac.low']
+VIDEO_HOUR = FACTOR_INDEX['office_activity.video_hour']
+COMPUTER_HOUR = FACTOR_INDEX['office_activity.computer_hour']
+PRINTER_PAGE = FACTOR_INDEX['office_activity.printer_page']
+REMOTE_DAY_SAVINGS = FACTOR_INDEX['office_activity.remote_day_savings']
+AIR_MILE = FACTOR_INDEX['travel.air_mile']
+HOTEL_NIGHT = FACTOR_INDEX['travel.hotel_night']
+RENTAL_CAR_DAY = FACTOR_INDEX['travel.rental_car_day']
+
+
+def encode_labels(values, codes, default):
+    """
+    Convert a column of category labels into integer codes.
+    
+    Only the distinct labels are looked up, so the cost per row is a NumPy
+    gather rather than a dict lookup. Integer columns are treated as codes
+    already and returned unchanged after a range check.
+    
+    Args:
+        values (array-like): Category labels (unknown labels and None allowed)
+        codes (Mapping): Label to code mapping, e.g. CAR_TYPE_CODES
+        default (int): Code used for unknown labels
+        
+    Returns:
+        numpy.ndarray: Integer codes
+        
+    Raises:
+        ValueError: If an integer column holds a code outside the mapping
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        # An out-of-range code would silently select the next category's factor
+        if values.size and (values.min() < 0 or values.max() >= len(codes)):
+            raise ValueError(f'Category codes must be between 0 and {len(codes) - 1}')
+        return values
+    uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+    lookup = np.array([codes.get(label, default) for label in uniques], dtype=np.intp)
+    return lookup[inverse.reshape(-1)]
+
+
+class CompiledFactorSet:
+    """
+    An immutable, flat view of one emission factor set version.
+    
+    Factors are stored in a tuple (for scalar code) and a read-only NumPy array
+    (for batch code), both laid out according to FACTOR_KEYS.
+    """
+    
+    __slots__ = ('version', 'values', 'array')
+    
+    def __init__(self, version, values):
+        """
+        Initialize the compiled set.
+        
+        Args:
+            version (str): Factor set version identifier
+            values (sequence): Factor values in FACTOR_KEYS order
+        """
+        array = np.array(values, dtype=float)
+        array.flags.writeable = False
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'values', tuple(float(value) for value in values))
+        object.__setattr__(self, 'array', array)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('Compiled factor sets are immutable')
+    
+    def __getitem__(self, name):
+        return self.values[FACTOR_INDEX[name]]
+    
+    def as_dict(self):
+        """Return the factors as a flat {dotted name: value} dict."""
+        return dict(zip(FACTOR_KEYS, self.values))
+    
+    def changed_factors(self, other):
+        """
+        List the factors whose values differ from another compiled set.
+        
+        Args:
+            other (CompiledFactorSet): Set to compare against
+            
+        Returns:
+            list: Dotted factor names that differ
+        """
+        return [name for name, a, b in zip(FACTOR_KEYS, self.values, other.values) if a != b]
+
+
+def _flatten(factor_set, prefix=''):
+    """Flatten a nested factor dict into {dotted name: value}."""
+    flat = {}
+    for key, value in factor_set.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{name}.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compile_factor_set(version, factor_set):
+    """
+    Compile a nested factor set (the FACTOR_SETS format) into a CompiledFactorSet.
+    
+    Args:
+        version (str): Factor set version identifier
+        factor_set (dict): Nested factors keyed by section, e.g. {'commute': {...}}
+        
+    Returns:
+        CompiledFactorSet: The compiled, immutable set
+        
+    Raises:
+        ValueError: If factors are missing or unknown
+    """
+    flat = _flatten(factor_set)
+    missing = [name for name in FACTOR_KEYS if name not in flat]
+    unknown = [name for name in flat if name not in FACTOR_INDEX]
+    if missing or unknown:
+        raise ValueError(
+            f"Invalid factor set '{version}': missing {missing or 'none'}, unknown {unknown or 'none'}"
+        )
+    return CompiledFactorSet(version, [flat[name] for name in FACTOR_KEYS])
+
+
+class FactorRegistry:
+    """
+    Registry of versioned emission factor sets.
+    
+    Each version is compiled once on registration; lookups return the shared
+    compiled set.
+    """
+    
+    def __init__(self, factor_sets=None, default_version=None):
+        """
+        Initialize the registry.
+        
+        Args:
+            factor_sets (dict, optional): {version: nested factor set} to register
+            default_version (str, optional): Version returned when none is requested
+        """
+        self._compiled = {}
+        self.default_version = None
+        for version, factor_set in (factor_sets or {}).items():
+            self.register(version, factor_set)
+        if default_version is not None:
+            self.get(default_version)
+            self.default_version = default_version
+    
+    @property
+    def versions(self):
+        """Registered versions in registration order."""
+        return list(self._compiled)
+    
+    def register(self, version, factor_set, make_default=False):
+        """
+        Compile and register a factor set version.
+        
+        Args:
+            version (str): Version identifier (must be new)
+            factor_set (dict): Nested factors in the FACTOR_SETS format
+            make_default (bool): Whether this version becomes the default
+            
+        Returns:
+            CompiledFactorSet: The compiled set
+        """
+        if version in self._compiled:
+            raise ValueError(f"Factor set version '{version}' is already registered")
+        compiled = compile_factor_set(version, factor_set)
+        self._compiled[version] = compiled
+        if make_default or self.default_version is None:
+            self.default_version = version
+        return compiled
+    
+    def load_file(self, path, make_default=False):
+        """
+        Register a factor set from a JSON file.
+        
+        The file holds {"version": "...", "factors": {...}} where factors uses
+        the same nested layout as FACTOR_SETS.
+        
+        Args:
+            path (str): Path to the JSON file
+            make_default (bool): Whether the loaded version becomes the default
+            
+        Returns:
+            CompiledFactorSet: The compiled set
+        """
+        with open(path) as f:
+            data = json.load(f)
+        return self.register(data['version'], data['factors'], make_default=make_default)
+    
+    def get(self, version=None):
+        """
+        Get a compiled factor set.
+        
+        Args:
+            version (str, optional): Version to fetch (defaults to the default version)
+            
+        Returns:
+            CompiledFactorSet: The compiled set
+        """
+        version = version or self.default_version
+        if version not in self._compiled:
+            raise KeyError(f"Unknown emission factor version '{version}'")
+        return self._compiled[version]
+
+
+# Shared registry preloaded with the built-in factor sets
+factor_registry = FactorRegistry(FACTOR_SETS, DEFAULT_FACTOR_VERSION)
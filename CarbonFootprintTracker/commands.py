@@ -0,0 +1,152 @@
+"""
+CLI Commands
+
+Maintenance commands registered on the Flask CLI (run with `flask <command>`).
+"""
+
+import click
+
+
+@click.command('recompute-footprints')
+@click.option('--version', 'to_version', default=None, help='Emission factor version to apply (defaults to the current default).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows updated per committed batch.')
+@click.option('--restart', is_flag=True, help='Start a new job instead of resuming an unfinished one.')
+def recompute_footprints_command(to_version, chunk_size, restart):
+    """Recompute stored footprints affected by an emission factor change."""
+    from services.recompute import recompute_footprints
+
+    job = recompute_footprints(to_version=to_version, chunk_size=chunk_size, resume=not restart)
+    click.echo(f"Recomputed {job.rows_processed} footprints with factors {job.to_version}.")
+
+
+@click.command('create-indexes')
+def create_indexes_command():
+    """Create model indexes missing from existing tables."""
+    from app import db
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    click.echo('Indexes are up to date.')
+
+
+@click.command('explain-queries')
+@click.option('--min-rows', default=1000, show_default=True, help='Row count from which a table counts as large.')
+def explain_queries_command(min_rows):
+    """EXPLAIN the queries issued by the blueprints and fail on sequential scans of large tables.
+
+    Only GET routes are replayed, as the first employee and the first
+    executive, and parameterized routes only with id 1; POST handlers and
+    other ids are not audited.
+    """
+    from flask import current_app
+    from services.query_audit import audit_query_plans
+
+    report = audit_query_plans(current_app, min_rows=min_rows)
+    for violation in report['violations']:
+        click.echo(f"[{violation['endpoint']}] sequential scan on {violation['table']} "
+                   f"({violation['rows']} rows):\n    {violation['statement']}")
+    click.echo(f"Explained {report['queries']} queries, {len(report['violations'])} sequential scans on large tables.")
+    if report['violations']:
+        raise SystemExit(1)
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the monthly footprint rollups from all stored footprints."""
+    from app import db
+    from services.rollups import rebuild_rollups
+
+    rebuild_rollups()
+    db.session.commit()
+    click.echo('Monthly rollups rebuilt.')
+
+
+@click.command('purge-sessions')
+@click.option('--batch-size', default=1000, show_default=True, help='Sessions deleted per batch.')
+def purge_sessions_command(batch_size):
+    """Delete expired server-side sessions."""
+    from flask import current_app
+    from services.sessions import ServerSideSessionInterface
+
+    interface = current_app.session_interface
+    if not isinstance(interface, ServerSideSessionInterface):
+        raise click.ClickException('SESSION_BACKEND is not a server-side backend.')
+    deleted = interface.store.purge_expired(batch_size)
+    click.echo(f'Deleted {deleted} expired sessions.')
+
+
+@click.command('refresh-rankings')
+def refresh_rankings_command():
+    """Rebuild the peer ranking table from everyone's latest footprint."""
+    from app import db
+    from services.rankings import refresh_rankings
+
+    refresh_rankings()
+    db.session.commit()
+    click.echo('Rankings refreshed.')
+
+
+@click.command('import-footprints')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default=None, help='Input format (defaults to the file extension, else csv).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Records inserted per committed batch.')
+@click.option('--company', default=None, help='Only match users of this company (without it, only users with no company).')
+def import_footprints_command(source, file_format, chunk_size, company):
+    """Bulk import office footprints from a CSV or NDJSON file ('-' for stdin)."""
+    from services.ingest import import_footprints
+
+    if file_format is None:
+        file_format = 'ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    report = import_footprints(source, file_format=file_format, chunk_size=chunk_size, company=company)
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Read {report['rows']} rows, imported {report['inserted']}, {report['error_count']} errors.")
+    if report['inserted']:
+        # Store the dashboard forecasts for every worker, as the import API does
+        from ai_helpers.forecasting import CarbonForecaster
+        from services.forecast_cache import precompute_latest_forecasts
+
+        stored = precompute_latest_forecasts(CarbonForecaster())
+        click.echo(f"Precomputed {stored} dashboard forecasts.")
+
+
+@click.command('export-data')
+@click.argument('dataset', type=click.Choice(['footprints', 'transactions', 'events']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson', 'arrow']), default='csv', show_default=True)
+@click.option('--output', default='-', show_default=True, help='File to write (- for stdout).')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), default=None, help='First day included (YYYY-MM-DD).')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), default=None, help='Last day included (YYYY-MM-DD).')
+@click.option('--department', default=None, help='Only rows of users in this department.')
+@click.option('--company', default=None, help='Only rows of users in this company.')
+@click.option('--since-id', type=int, default=None, help='Only rows with a greater id, or (with --since-updated) a greater (last_updated, id).')
+@click.option('--since-updated', type=click.DateTime(['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']), default=None, help='last_updated of the last row already exported (footprints only).')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows fetched per server-side cursor batch.')
+def export_data_command(dataset, file_format, output, start, end, department, company, since_id, since_updated, batch_size):
+    """Stream a dataset to a CSV, NDJSON or Arrow IPC file."""
+    from services.export import export_chunks, ExportError
+
+    try:
+        chunks = export_chunks(
+            dataset, file_format=file_format, batch_size=batch_size,
+            start=start.date() if start else None, end=end.date() if end else None,
+            department=department, company=company, since_id=since_id, since_updated=since_updated
+        )
+    except ExportError as e:
+        raise click.UsageError(str(e))
+
+    with click.open_file(output, 'wb' if file_format == 'arrow' else 'w') as target:
+        for chunk in chunks:
+            target.write(chunk)
+
+
+def register_commands(app):
+    """Register the CLI commands on the app."""
+    app.cli.add_command(recompute_footprints_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(refresh_rankings_command)
+    app.cli.add_command(purge_sessions_command)
+    app.cli.add_command(import_footprints_command)
+    app.cli.add_command(export_data_command)
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(explain_queries_command)
@@ -21,26 +21,7 @@ except ImportError:
         def get_id(self):
             return str(self.id)
 
-try:
-    from werkzeug.security import generate_password_hash, check_password_hash
-except ImportError:
-    # Fallback implementations if werkzeug not available
-    import hashlib
-    import secrets
-    
-    def generate_password_hash(password):
-        """Simple password hashing for fallback."""
-        salt = secrets.token_hex(8)
-        pwdhash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-        return f"{salt}${pwdhash.hex()}"
-    
-    def check_password_hash(pwhash, password):
-        """Simple password checking for fallback."""
-        if not pwhash or '$' not in pwhash:
-            return False
-        salt, stored_hash = pwhash.split('$', 1)
-        calculated_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
-        return secrets.compare_digest(calculated_hash, stored_hash)
+from services.passwords import password_hasher, HasherBusy
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -48,23 +29,34 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     company = db.Column(db.String(128), nullable=True)
-    department = db.Column(db.String(64), nullable=True)
-    role = db.Column(db.String(20), default='employee')  # 'employee' or 'executive'
+    department = db.Column(db.String(64), nullable=True, index=True)
+    role = db.Column(db.String(20), default='employee', index=True)  # 'employee' or 'executive'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     footprints = db.relationship('CarbonFootprint', backref='user', lazy=True)
     quiz_scores = db.relationship('QuizScore', backref='user', lazy=True)
     training_progress = db.relationship('TrainingProgress', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # Raises HasherBusy when the hashing pool is saturated
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Check a password, upgrading the stored hash if its method or cost changed (raises HasherBusy)."""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            try:
+                self.password_hash = password_hasher.hash(password)
+                password_hasher.record_rehash()
+            except HasherBusy:
+                # Keep the old hash; the next login upgrades it
+                pass
+        return True
 
 class CarbonFootprint(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    date = db.Column(db.Date, default=datetime.utcnow().date)
+    date = db.Column(db.Date, default=datetime.utcnow().date, index=True)
     
     # Commute data
     commute_days_by_car = db.Column(db.Integer, default=0)  # days per week
@@ -105,15 +97,21 @@ class CarbonFootprint(db.Model):
     office_footprint = db.Column(db.Float, default=0.0)  # kg CO2
     transaction_footprint = db.Column(db.Float, default=0.0)  # kg CO2
     total_footprint = db.Column(db.Float, default=0.0)  # kg CO2
-    footprint_score = db.Column(db.Integer, default=0)  # 0-100 scale
+    footprint_score = db.Column(db.Integer, default=0, index=True)  # 0-100 scale
     footprint_change = db.Column(db.Float, default=0.0)  # % change from last period
+    factor_version = db.Column(db.String(20), nullable=True)  # Emission factor set used for the calculated values
     
-    rank_in_company = db.Column(db.Integer, nullable=True)  # Rank among all employees
-    rank_in_department = db.Column(db.Integer, nullable=True)  # Rank within department
+    rank_in_company = db.Column(db.Integer, nullable=True)  # Rank among the company's employees
+    rank_in_department = db.Column(db.Integer, nullable=True)  # Rank within the department
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
+# Serves "latest footprints for a user" (filter by user_id, order by date desc)
+db.Index('ix_carbon_footprint_user_id_date', CarbonFootprint.user_id, CarbonFootprint.date.desc())
+# Serves incremental exports (order by last_updated, id past a watermark)
+db.Index('ix_carbon_footprint_last_updated_id', CarbonFootprint.last_updated, CarbonFootprint.id)
+
 class QuizScore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -122,6 +120,8 @@ class QuizScore(db.Model):
     percentage = db.Column(db.Float)  # Score as percentage
     quiz_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+db.Index('ix_quiz_score_user_id_quiz_date', QuizScore.user_id, QuizScore.quiz_date.desc())
+
 class SustainabilityTip(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50))  # commute, diet, office, etc.
@@ -140,7 +140,7 @@ class CompanyGoal(db.Model):
 
 class TrainingProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     module_id = db.Column(db.Integer)
     module_name = db.Column(db.String(128))
     completion_percentage = db.Column(db.Float, default=0.0)  # 0-100
@@ -198,3 +198,143 @@ class TransactionData(db.Model):
     carbon_impact = db.Column(db.Float)  # Calculated carbon impact in kg CO2
     description = db.Column(db.Text, nullable=True)
     source = db.Column(db.String(50))  # e.g., 'card', 'expense_report', 'manual'
+
+class RecomputeJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    to_version = db.Column(db.String(20), nullable=False)  # Emission factor version being applied
+    status = db.Column(db.String(20), default='running')  # 'running', 'completed', 'failed'
+    last_footprint_id = db.Column(db.Integer, default=0)  # Highest CarbonFootprint.id already processed
+    rows_processed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+class MonthlyFootprintRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    department = db.Column(db.String(64), nullable=False, default='')  # '' when the user has no department
+    company = db.Column(db.String(128), nullable=False, default='')  # '' when the user has no company
+    
+    footprint_count = db.Column(db.Integer, default=0)
+    employee_count = db.Column(db.Integer, default=0)  # Distinct users with a footprint that month
+    commute_sum = db.Column(db.Float, default=0.0)  # kg CO2
+    office_sum = db.Column(db.Float, default=0.0)  # kg CO2
+    travel_sum = db.Column(db.Float, default=0.0)  # kg CO2
+    transaction_sum = db.Column(db.Float, default=0.0)  # kg CO2
+    total_sum = db.Column(db.Float, default=0.0)  # kg CO2
+    score_sum = db.Column(db.Integer, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('month', 'department', 'company', name='uq_monthly_footprint_rollup_key'),
+    )
+    
+    def _average(self, total):
+        return total / self.footprint_count if self.footprint_count else 0
+    
+    @property
+    def avg_commute(self):
+        return self._average(self.commute_sum)
+    
+    @property
+    def avg_office(self):
+        return self._average(self.office_sum)
+    
+    @property
+    def avg_travel(self):
+        return self._average(self.travel_sum)
+    
+    @property
+    def avg_transaction(self):
+        return self._average(self.transaction_sum)
+    
+    @property
+    def avg_total(self):
+        return self._average(self.total_sum)
+    
+    @property
+    def avg_score(self):
+        return self._average(self.score_sum)
+
+class FootprintRanking(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    footprint_id = db.Column(db.Integer, db.ForeignKey('carbon_footprint.id'), nullable=False)  # User's latest footprint
+    company = db.Column(db.String(128), nullable=False, default='')  # '' when the user has no company
+    department = db.Column(db.String(64), nullable=False, default='')  # '' when the user has no department
+    footprint_score = db.Column(db.Integer, default=0)
+    total_footprint = db.Column(db.Float, default=0.0)  # kg CO2
+    
+    rank_in_company = db.Column(db.Integer)  # Within the company; 1 = best score, ties share a rank
+    rank_in_department = db.Column(db.Integer)
+    lower_in_company = db.Column(db.Integer)  # Users with a strictly lower score
+    lower_in_department = db.Column(db.Integer)
+    company_size = db.Column(db.Integer)  # Ranked users
+    department_size = db.Column(db.Integer)
+    
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    footprint = db.relationship('CarbonFootprint')
+
+# Serve the company and department leaderboards in (score, user id) order
+db.Index(
+    'ix_footprint_ranking_company_score',
+    FootprintRanking.company, FootprintRanking.footprint_score.desc(), FootprintRanking.user_id
+)
+db.Index(
+    'ix_footprint_ranking_department_score',
+    FootprintRanking.company, FootprintRanking.department,
+    FootprintRanking.footprint_score.desc(), FootprintRanking.user_id
+)
+
+class ForecastState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    series_key = db.Column(db.String(32), unique=True, nullable=False)  # 'user:<id>' or 'company'
+    
+    # Fitted Holt-Winters state up to the last closed month
+    level = db.Column(db.Float, default=0.0)
+    trend = db.Column(db.Float, default=0.0)
+    seasonal = db.Column(db.Text)  # JSON list, one additive term per calendar month
+    last_month = db.Column(db.Integer, nullable=True)  # Month index (year * 12 + month - 1)
+    observations = db.Column(db.Integer, default=0)  # Closed months fitted
+    
+    # Month still receiving submissions, folded in once a later month starts
+    open_month = db.Column(db.Integer, nullable=True)
+    open_sum = db.Column(db.Float, default=0.0)  # Sum of weekly kg CO2 submitted
+    open_count = db.Column(db.Integer, default=0)
+    
+    needs_refit = db.Column(db.Boolean, default=False)  # History changed out of order
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DashboardForecast(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    months = db.Column(db.Integer, primary_key=True)  # Forecast length
+    
+    # Inputs the forecast was made from; it is only served while they still hold
+    footprint_id = db.Column(db.Integer, nullable=False)  # User's latest footprint
+    total_footprint = db.Column(db.Float, default=0.0)  # kg CO2 (changes on recompute)
+    month = db.Column(db.Integer, nullable=False)  # Month index of the first forecast month
+    
+    data = db.Column(db.Text, nullable=False)  # JSON forecast
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class QuizHistory(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_count = db.Column(db.Integer, default=0)  # Quizzes submitted
+    # Packed per question id (see services.quiz_history)
+    correct = db.Column(db.LargeBinary)  # Bitset: last answer was correct
+    last_seen = db.Column(db.LargeBinary)  # uint16 array: quiz_count when last answered, 0 = never
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class QuizQuestionStat(db.Model):
+    question_id = db.Column(db.Integer, primary_key=True)
+    attempts = db.Column(db.Integer, default=0)
+    correct_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ServerSession(db.Model):
+    sid = db.Column(db.String(64), primary_key=True)  # Random id, sent to the client signed
+    data = db.Column(db.LargeBinary)  # Session data (Flask's tagged JSON)
+    expires_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+# Batched garbage collection deletes expired sessions oldest first
+db.Index('ix_server_session_expires_at', ServerSession.expires_at)
@@ -7,6 +7,8 @@ Handles user authentication, registration, and login/logout functionality.
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from models import User
+from services.passwords import HasherBusy
+from services.sessions import rotate_session
 from app import db
 import logging
 
@@ -39,7 +41,17 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password):
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except HasherBusy:
+            flash('Too many sign-in attempts right now. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
+        
+        if authenticated:
+            # Store a hash upgraded to the configured method
+            if user in db.session.dirty:
+                db.session.commit()
+            rotate_session()
             login_user(user)
             
             # Redirect based on role
@@ -94,6 +106,10 @@ def register():
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
             
+        except HasherBusy:
+            db.session.rollback()
+            flash('Registration is busy right now. Please try again in a moment.', 'warning')
+            return render_template('register.html'), 503
         except Exception as e:
             logging.error(f"Error registering user: {str(e)}")
             db.session.rollback()
@@ -106,5 +122,6 @@ def register():
 def logout():
     """Handle user logout."""
     logout_user()
+    rotate_session()
     flash('You have been logged out', 'info')
     return redirect(url_for('auth.login'))
@@ -4,16 +4,26 @@ Company Routes
 Handles routes for the company sustainability dashboard and executive views.
 """
 
+import io
 import os
 import stripe
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from carbon_calculator.calculator import CarbonFootprintCalculator
 from ai_helpers.forecasting import CarbonForecaster
-from models import User, CarbonFootprint, CompanyGoal, CompanyEvent
+from models import User, CarbonFootprint, CompanyGoal, CompanyEvent, MonthlyFootprintRollup
+from services.queries import add_months, latest_footprints
+from services.rollups import month_key
+from services.cache import response_cache
+from services.ingest import import_footprints, FORMATS as IMPORT_FORMATS
+from services.export import export_chunks, ExportError, FORMATS as EXPORT_FORMATS
+from services.forecasts import company_forecast
+from services.dashboard import start_dashboard_precompute
+from services.quiz_history import quiz, question_stats
+from services.passwords import password_hasher
 from app import db
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from datetime import date, datetime, timedelta
 import json
 import logging
 
@@ -27,6 +37,13 @@ company_bp = Blueprint('company', __name__, url_prefix='/company')
 calculator = CarbonFootprintCalculator()
 forecaster = CarbonForecaster()
 
+# Longest trend window the API will aggregate
+MAX_TREND_MONTHS = 60
+
+# Bounds of the Monte Carlo scenario API
+MAX_SCENARIO_TRIALS = 50000
+MAX_SCENARIO_MONTHS = 120
+
 @company_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -61,58 +78,54 @@ def dashboard():
 
 def get_company_metrics():
     """Get overall company carbon metrics."""
-    # Get current month data
+    # Get current and previous month boundaries
     current_month = datetime.now().month
     current_year = datetime.now().year
-    start_of_month = datetime(current_year, current_month, 1)
-    
-    # Get all footprints for current month
-    current_footprints = CarbonFootprint.query.filter(
-        CarbonFootprint.date >= start_of_month
-    ).all()
-    
-    # Calculate total and average emissions
-    total_emissions = sum(fp.total_footprint for fp in current_footprints) if current_footprints else 0
-    avg_score = sum(fp.footprint_score for fp in current_footprints) / len(current_footprints) if current_footprints else 0
+    start_of_month = date(current_year, current_month, 1)
+    prev_month = current_month - 1 if current_month > 1 else 12
+    prev_year = current_year if current_month > 1 else current_year - 1
+    start_of_prev_month = date(prev_year, prev_month, 1)
+    
+    # Aggregate both months from the monthly rollups
+    is_current_month = MonthlyFootprintRollup.month == month_key(start_of_month)
+    monthly_totals = db.session.query(
+        func.sum(case((is_current_month, MonthlyFootprintRollup.total_sum))).label('total_emissions'),
+        func.sum(case((is_current_month, MonthlyFootprintRollup.score_sum))).label('score_sum'),
+        func.sum(case((is_current_month, MonthlyFootprintRollup.footprint_count))).label('footprint_count'),
+        func.sum(case((~is_current_month, MonthlyFootprintRollup.total_sum))).label('prev_total')
+    ).filter(
+        MonthlyFootprintRollup.month.in_([month_key(start_of_month), month_key(start_of_prev_month)])
+    ).one()
+    
+    total_emissions = monthly_totals.total_emissions or 0
+    footprint_count = monthly_totals.footprint_count or 0
+    avg_score = monthly_totals.score_sum / footprint_count if footprint_count else 0
+    prev_total = monthly_totals.prev_total or 0
     
     # Get total employee count
     employee_count = User.query.filter_by(role='employee').count()
     
     # Get employees with footprint data
-    employees_with_data = db.session.query(CarbonFootprint.user_id).distinct().count()
+    employees_with_data = db.session.query(func.count(func.distinct(CarbonFootprint.user_id))).scalar()
     
     # Calculate per-employee average
     per_employee = total_emissions / employees_with_data if employees_with_data > 0 else 0
     
-    # Get previous month data for comparison
-    prev_month = current_month - 1 if current_month > 1 else 12
-    prev_year = current_year if current_month > 1 else current_year - 1
-    start_of_prev_month = datetime(prev_year, prev_month, 1)
-    end_of_prev_month = start_of_month - timedelta(days=1)
-    
-    prev_footprints = CarbonFootprint.query.filter(
-        CarbonFootprint.date >= start_of_prev_month,
-        CarbonFootprint.date <= end_of_prev_month
-    ).all()
-    
-    prev_total = sum(fp.total_footprint for fp in prev_footprints) if prev_footprints else 0
-    
     # Calculate change percentage
     if prev_total > 0:
         change_percentage = ((total_emissions - prev_total) / prev_total) * 100
     else:
         change_percentage = 0
     
-    # Prepare footprint data for forecasting
-    footprint_data = []
-    for fp in current_footprints:
-        user = User.query.get(fp.user_id)
-        if user:
-            footprint_data.append({
-                'user_id': fp.user_id,
-                'total_footprint': fp.total_footprint,
-                'footprint_score': fp.footprint_score
-            })
+    # Prepare forecast input: each employee's latest footprint, if submitted this month
+    latest = latest_footprints()
+    forecast_rows = db.session.query(
+        latest.user_id,
+        latest.total_footprint,
+        latest.footprint_score,
+        User.department
+    ).join(User, User.id == latest.user_id).filter(latest.date >= start_of_month).all()
+    footprint_data = [row._asdict() for row in forecast_rows]
     
     return {
         'total_emissions': round(total_emissions, 2),
@@ -129,113 +142,77 @@ def get_department_breakdown():
     """
     Get carbon footprint breakdown by department.
     
-    Note: This is a simplified version assuming all users are in a single department.
-    In a real application, you would have department data in the User model.
+    Aggregates each user's latest footprint by User.department in a single
+    GROUP BY query, so every figure is per employee and employees who submit
+    often do not weigh more. (The monthly rollups sum every submission and
+    cannot give latest-per-employee values.) Users without a department are
+    reported under 'Other'.
     """
-    # Simulate departments
-    departments = ['Engineering', 'Marketing', 'Sales', 'Operations', 'HR']
-    
-    # Get all users with footprints
-    users_with_footprints = db.session.query(CarbonFootprint.user_id).distinct().all()
-    user_ids = [u[0] for u in users_with_footprints]
+    latest = latest_footprints()
+    department = func.coalesce(User.department, 'Other')
     
-    # Assign users to random departments for this demo
-    import random
-    user_departments = {user_id: random.choice(departments) for user_id in user_ids}
+    rows = db.session.query(
+        department.label('department'),
+        func.count(latest.id).label('count'),
+        func.sum(latest.total_footprint).label('total_emissions'),
+        func.avg(latest.footprint_score).label('avg_score')
+    ).join(latest, latest.user_id == User.id).group_by(department).order_by(department).all()
     
-    # Get latest footprint for each user
-    latest_footprints = {}
-    for user_id in user_ids:
-        fp = CarbonFootprint.query.filter_by(user_id=user_id).order_by(CarbonFootprint.date.desc()).first()
-        if fp:
-            latest_footprints[user_id] = fp
-    
-    # Compile department data
+    # Compile department data (ordered by department name)
     department_data = {}
-    for dept in departments:
-        department_data[dept] = {
-            'count': 0,
-            'total_emissions': 0,
-            'avg_score': 0
+    for row in rows:
+        total_emissions = row.total_emissions or 0
+        department_data[row.department] = {
+            'count': row.count,
+            'total_emissions': round(total_emissions, 2),
+            'avg_score': round(row.avg_score or 0, 1),
+            'avg_emissions': round(total_emissions / row.count, 2)
         }
     
-    # Aggregate data by department
-    for user_id, footprint in latest_footprints.items():
-        dept = user_departments.get(user_id, 'Other')
-        department_data[dept]['count'] += 1
-        department_data[dept]['total_emissions'] += footprint.total_footprint
-        department_data[dept]['avg_score'] += footprint.footprint_score
-    
-    # Calculate averages
-    for dept in department_data:
-        if department_data[dept]['count'] > 0:
-            department_data[dept]['avg_score'] = round(
-                department_data[dept]['avg_score'] / department_data[dept]['count'], 1
-            )
-            department_data[dept]['avg_emissions'] = round(
-                department_data[dept]['total_emissions'] / department_data[dept]['count'], 2
-            )
-    
     return department_data
 
-def get_historical_trends():
-    """Get historical carbon data trends for the past 6 months."""
+def get_historical_trends(months=6):
+    """
+    Get monthly carbon data trends for the current month and the months before it.
+    
+    Args:
+        months (int): Number of full months to include before the current one
+    """
     # Calculate date range
     end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=180)  # Approximately 6 months
-    
-    # Get monthly aggregates
+    first_month = add_months(end_date.replace(day=1), -months)
+    
+    # Aggregate every month from the monthly rollups
+    rows = db.session.query(
+        MonthlyFootprintRollup.month,
+        func.sum(MonthlyFootprintRollup.total_sum).label('emissions'),
+        func.sum(MonthlyFootprintRollup.score_sum).label('score_sum'),
+        func.sum(MonthlyFootprintRollup.footprint_count).label('footprint_count')
+    ).filter(
+        MonthlyFootprintRollup.month >= month_key(first_month),
+        MonthlyFootprintRollup.month <= month_key(end_date)
+    ).group_by(MonthlyFootprintRollup.month).all()
+    totals_by_month = {row.month: row for row in rows}
+    
+    # Fill months without footprints with zeros
     monthly_data = []
-    
-    # Go through each month
-    current_date = start_date
-    while current_date <= end_date:
-        month = current_date.month
-        year = current_date.year
-        
-        # Get start and end of month
-        start_of_month = datetime(year, month, 1).date()
-        if month == 12:
-            next_month = 1
-            next_year = year + 1
-        else:
-            next_month = month + 1
-            next_year = year
-        end_of_month = datetime(next_year, next_month, 1).date() - timedelta(days=1)
-        
-        # If end_of_month is beyond our range, cap it
-        if end_of_month > end_date:
-            end_of_month = end_date
-        
-        # Query footprints for this month
-        footprints = CarbonFootprint.query.filter(
-            CarbonFootprint.date >= start_of_month,
-            CarbonFootprint.date <= end_of_month
-        ).all()
-        
-        # Calculate totals
-        total_emissions = sum(fp.total_footprint for fp in footprints) if footprints else 0
-        avg_score = sum(fp.footprint_score for fp in footprints) / len(footprints) if footprints else 0
-        
-        # Add to monthly data
+    for offset in range(months + 1):
+        month_start = add_months(first_month, offset)
+        row = totals_by_month.get(month_key(month_start))
         monthly_data.append({
-            'month': start_of_month.strftime('%b %Y'),
-            'emissions': round(total_emissions, 2),
-            'score': round(avg_score, 1)
+            'month': month_start.strftime('%b %Y'),
+            'emissions': round(row.emissions, 2) if row else 0,
+            'score': round(row.score_sum / row.footprint_count, 1) if row else 0
         })
-        
-        # Move to next month
-        if month == 12:
-            current_date = datetime(year + 1, 1, 1).date()
-        else:
-            current_date = datetime(year, month + 1, 1).date()
     
     return monthly_data
 
 def generate_company_forecast(employee_data):
     """Generate company-wide carbon forecast."""
-    # Use forecasting module to get projections
-    forecast = forecaster.forecast_company_emissions(employee_data, months=12)
+    # Project along the fitted company history, or the flat reduction model without enough of it
+    forecast = company_forecast(employee_data, forecaster, months=12)
+    if forecast is None:
+        forecast = forecaster.forecast_company_emissions(employee_data, months=12)
     
     # Prepare visualization-friendly data
     chart_data = {
@@ -268,6 +245,7 @@ def generate_company_forecast(employee_data):
         'percent_reduction': percent_reduction,
         'employee_count': forecast['employee_count'],
         'avg_employee_emissions': forecast['average_employee_emissions'],
+        'department_forecast': forecast.get('department_forecast', {}),
         'impact_equivalents': {
             'trees_planted': trees_planted,
             'car_miles': car_miles
@@ -281,18 +259,178 @@ def api_department_data():
     if current_user.role != 'executive':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    department_data = get_department_breakdown()
-    return jsonify(department_data)
+    return response_cache.json_response(('carbon_footprint', 'user'), get_department_breakdown)
 
 @company_bp.route('/api/trend_data')
 @login_required
 def api_trend_data():
-    """API endpoint to get trend data for charts."""
+    """API endpoint to get trend data for charts (optional ?months=N window)."""
     if current_user.role != 'executive':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    trend_data = get_historical_trends()
-    return jsonify(trend_data)
+    months = request.args.get('months', 6, type=int)
+    months = max(1, min(months, MAX_TREND_MONTHS))
+    return response_cache.json_response(('monthly_footprint_rollup',), lambda: get_historical_trends(months))
+
+@company_bp.route('/api/scenarios')
+@login_required
+def api_scenarios():
+    """
+    API endpoint to get Monte Carlo reduction scenario bands.
+    
+    Optional parameters: trials, months, seed, rate (mean annual reduction
+    rate), rate_sd, ev_share_min and ev_share_max (range of car commuters
+    switching to electric cars). A fixed seed makes results reproducible.
+    """
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    trials = max(100, min(request.args.get('trials', 10000, type=int), MAX_SCENARIO_TRIALS))
+    months = max(12, min(request.args.get('months', 60, type=int), MAX_SCENARIO_MONTHS))
+    seed = request.args.get('seed', 0, type=int)
+    rate = max(0.0, min(request.args.get('rate', forecaster.reduction_rate, type=float), 0.95))
+    rate_sd = max(0.0, min(request.args.get('rate_sd', 0.05, type=float), 0.5))
+    ev_share_min = max(0.0, min(request.args.get('ev_share_min', 0.1, type=float), 1.0))
+    ev_share_max = max(ev_share_min, min(request.args.get('ev_share_max', 0.5, type=float), 1.0))
+    
+    def build():
+        inputs = get_scenario_inputs()
+        result = forecaster.simulate_reduction_scenarios(
+            inputs['current_emissions'],
+            switchable_emissions=inputs['switchable_emissions'],
+            switched_emissions=inputs['switched_emissions'],
+            trials=trials,
+            months=months,
+            rate_mean=rate,
+            rate_sd=rate_sd,
+            adoption_share=(ev_share_min, ev_share_max),
+            seed=seed
+        )
+        result['inputs'] = inputs
+        return result
+    
+    # The seed is part of the request, so identical requests give identical bands
+    return response_cache.json_response(('carbon_footprint',), build)
+
+@company_bp.route('/api/quiz_stats')
+@login_required
+def api_quiz_stats():
+    """API endpoint to get per-question quiz statistics."""
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return response_cache.json_response(('quiz_question_stat',), get_quiz_stats)
+
+@company_bp.route('/api/import_footprints', methods=['POST'])
+@login_required
+def api_import_footprints():
+    """
+    API endpoint to bulk import office footprints for the executive's company.
+    
+    Accepts a CSV or NDJSON upload (multipart field 'file') or raw request
+    body; ?format= overrides detection from the file name or content type.
+    Executives without a company cannot import.
+    """
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+    if current_user.company is None:
+        return jsonify({'error': 'Your account is not assigned to a company'}), 403
+    
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    file_format = request.args.get('format')
+    if file_format is None:
+        name = upload.filename if upload else ''
+        content_type = upload.content_type if upload else request.content_type
+        is_ndjson = name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or '')
+        file_format = 'ndjson' if is_ndjson else 'csv'
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format '{file_format}'"}), 400
+    
+    try:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        report = import_footprints(text, file_format=file_format, company=current_user.company)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'The file must be UTF-8 encoded'}), 400
+    
+    if report['inserted']:
+        # Warm the dashboard forecasts and recommendations of the imported footprints
+        start_dashboard_precompute(current_app._get_current_object(), forecaster)
+    
+    return jsonify(report)
+
+@company_bp.route('/api/export/<dataset>')
+@login_required
+def api_export(dataset):
+    """
+    API endpoint streaming footprints, transactions or events for BI tools.
+    
+    Query parameters: format (csv, ndjson, arrow), start and end
+    (YYYY-MM-DD, inclusive), department, and the watermark since_id plus,
+    for footprints, since_updated (ISO date and time; only rows inserted or
+    changed since). Per-user data is limited to the executive's company, so
+    executives without a company cannot export it.
+    """
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+    if current_user.company is None and dataset != 'events':
+        return jsonify({'error': 'Your account is not assigned to a company'}), 403
+    
+    file_format = request.args.get('format', 'csv')
+    try:
+        since_updated = request.args.get('since_updated')
+        since_updated = datetime.fromisoformat(since_updated) if since_updated else None
+    except ValueError:
+        return jsonify({'error': 'since_updated must be an ISO date and time'}), 400
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        chunks = export_chunks(
+            dataset,
+            file_format=file_format,
+            start=datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+            end=datetime.strptime(end, '%Y-%m-%d').date() if end else None,
+            department=request.args.get('department'),
+            company=current_user.company if dataset != 'events' else None,
+            since_id=request.args.get('since_id', type=int),
+            since_updated=since_updated
+        )
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400
+    
+    extension = 'arrows' if file_format == 'arrow' else file_format
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[file_format],
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{extension}'}
+    )
+
+@company_bp.route('/api/sql_stats')
+@login_required
+def api_sql_stats():
+    """API endpoint with per-endpoint SQL statistics (optional ?reset=1)."""
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    instrumentation = current_app.extensions.get('sql_instrumentation')
+    if instrumentation is None:
+        return jsonify({'enabled': False, 'endpoints': []})
+
+    endpoints = instrumentation.endpoint_stats()
+    if request.args.get('reset') == '1':
+        instrumentation.reset()
+    return jsonify({'enabled': True, 'endpoints': endpoints})
+
+@company_bp.route('/api/auth_stats')
+@login_required
+def api_auth_stats():
+    """API endpoint to get this worker's password hashing latency and backpressure metrics."""
+    if current_user.role != 'executive':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(password_hasher.stats())
 
 @company_bp.route('/compliance')
 @login_required
@@ -323,27 +461,7 @@ def api_compliance_data():
     if current_user.role != 'executive':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    from models import ComplianceStandard
-    
-    # Get compliance standards
-    standards = ComplianceStandard.query.all()
-    
-    # Format data for frontend
-    standards_data = []
-    for standard in standards:
-        standards_data.append({
-            'id': standard.id,
-            'name': standard.name,
-            'description': standard.description,
-            'category': standard.category,
-            'requirements': standard.requirements,
-            'progress': standard.company_progress,
-            'last_updated': standard.last_updated.strftime('%Y-%m-%d'),
-            'icon': standard.icon,
-            'status': 'Met' if standard.company_progress >= 80 else 'Action Needed'
-        })
-    
-    return jsonify(standards_data)
+    return response_cache.json_response(('compliance_standard',), get_compliance_data)
 
 @company_bp.route('/events')
 @login_required
@@ -470,6 +588,79 @@ def api_event_detail(event_id):
     if current_user.role != 'executive':
         return jsonify({'error': 'Unauthorized'}), 403
     
+    return response_cache.json_response(('company_event',), lambda: get_event_detail(event_id))
+
+def get_scenario_inputs():
+    """
+    Get the company's current weekly emissions and its electric car lever.
+    
+    Sums every employee's latest footprint, and the weekly emissions of their
+    gas and hybrid car commutes both as submitted and as they would be by
+    electric car (at the current emission factors).
+    """
+    factors = calculator.factors
+    latest = latest_footprints()
+    car_miles = func.coalesce(latest.commute_distance, 0) * func.coalesce(latest.commute_days_by_car, 0) * 2
+    is_electric = latest.car_type == 'electric'
+    car_factor = case(
+        (latest.car_type == 'hybrid', factors['commute.car.hybrid']),
+        else_=factors['commute.car.gas']
+    )
+    totals = db.session.query(
+        func.sum(latest.total_footprint).label('current_emissions'),
+        func.sum(case((is_electric, 0.0), else_=car_miles * car_factor)).label('switchable_emissions'),
+        func.sum(case((is_electric, 0.0), else_=car_miles * factors['commute.car.electric'])).label('switched_emissions'),
+        func.count(latest.id).label('employee_count')
+    ).one()
+    
+    return {
+        'current_emissions': round(totals.current_emissions or 0.0, 2),
+        'switchable_emissions': round(totals.switchable_emissions or 0.0, 2),
+        'switched_emissions': round(totals.switched_emissions or 0.0, 2),
+        'employee_count': totals.employee_count
+    }
+
+def get_quiz_stats():
+    """Get observed statistics for every answered quiz question."""
+    questions = quiz.questions_by_id
+    stats = []
+    for question_id, stat in question_stats().items():
+        question = questions.get(question_id)
+        stat.update(
+            question_id=question_id,
+            question=question['question'] if question else None,
+            category=question['category'] if question else None,
+            difficulty=question['difficulty'] if question else None
+        )
+        stats.append(stat)
+    return {'questions': stats}
+
+def get_compliance_data():
+    """Get compliance standards with their progress for the frontend."""
+    from models import ComplianceStandard
+    
+    # Get compliance standards
+    standards = ComplianceStandard.query.all()
+    
+    # Format data for frontend
+    standards_data = []
+    for standard in standards:
+        standards_data.append({
+            'id': standard.id,
+            'name': standard.name,
+            'description': standard.description,
+            'category': standard.category,
+            'requirements': standard.requirements,
+            'progress': standard.company_progress,
+            'last_updated': standard.last_updated.strftime('%Y-%m-%d'),
+            'icon': standard.icon,
+            'status': 'Met' if standard.company_progress >= 80 else 'Action Needed'
+        })
+    
+    return standards_data
+
+def get_event_detail(event_id):
+    """Get an event's emission breakdown and impact metrics (404 if missing)."""
     event = CompanyEvent.query.get_or_404(event_id)
     
     # Create detailed emission breakdown for this event
@@ -523,7 +714,7 @@ def api_event_detail(event_id):
         }
     }
     
-    return jsonify(event_data)
+    return event_data
 
 @company_bp.route('/create-checkout-session', methods=['POST'])
 @login_required
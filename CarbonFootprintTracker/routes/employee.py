@@ -6,12 +6,17 @@ Handles routes for the employee dashboard and carbon footprint tracking.
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
 from flask_login import login_required, current_user
-from sqlalchemy import func
 from carbon_calculator.calculator import CarbonFootprintCalculator
-from ai_helpers.recommendations import RecommendationEngine
 from ai_helpers.forecasting import CarbonForecaster
-from ai_helpers.quiz import SustainabilityQuiz
 from models import User, CarbonFootprint, TrainingProgress, SustainabilityTip, TransactionData, QuizScore
+from services.dashboard import load_employee_dashboard, build_recommendation_input, recommendation_engine
+from services.rollups import record_footprint
+from services.rankings import ensure_rankings, get_user_ranking, peer_averages, ranking_percentile
+from services.leaderboard import leaderboard, rank_window, users_ahead
+from services.forecasts import record_footprint as record_forecast_footprint
+from services.forecast_cache import employee_forecast, refresh_employee_forecasts
+from services.quiz_tokens import issue_quiz_token, load_quiz_token, QuizTokenError
+from services.quiz_history import quiz, load_history, record_quiz
 from app import db
 from datetime import datetime, timedelta
 import json
@@ -22,20 +27,24 @@ employee_bp = Blueprint('employee', __name__, url_prefix='/employee')
 
 # Initialize modules
 calculator = CarbonFootprintCalculator()
-recommendation_engine = RecommendationEngine()
 forecaster = CarbonForecaster()
-quiz = SustainabilityQuiz()
+
+@employee_bp.record_once
+def load_quiz_questions(state):
+    """Add the configured question file to the quiz bank when the blueprint is registered."""
+    question_file = state.app.config.get('QUIZ_QUESTION_FILE')
+    if question_file:
+        quiz.load_file(question_file)
 
 @employee_bp.route('/dashboard')
 @login_required
 def dashboard():
     """Render the employee dashboard."""
-    # Get the user's most recent carbon footprint
-    latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc()).first()
-    
-    # Get historical footprints for charts (last 6 entries)
-    footprint_history = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc()).limit(6).all()
-    footprint_history = list(reversed(footprint_history))  # Reverse to get chronological order
+    # Get the recent footprints (newest first is the latest) and latest quiz in one round trip
+    dashboard_data = load_employee_dashboard(current_user.id, history_size=6)
+    latest_footprint = dashboard_data.latest_footprint
+    footprint_history = dashboard_data.history
+    latest_quiz = dashboard_data.latest_quiz
     
     # Format data for charts
     dates = [fp.date.strftime('%m/%d') for fp in footprint_history]
@@ -45,61 +54,17 @@ def dashboard():
     # Get personalized recommendations if we have footprint data
     recommendations = []
     if latest_footprint:
-        # Prepare user data for recommendation engine - handle old and new model fields
         try:
-            user_data = {
-                'commute_distance': latest_footprint.commute_distance or 0,
-                'car_type': latest_footprint.car_type or 'gas', 
-            }
-            
-            # Add new model fields if they exist
-            if hasattr(latest_footprint, 'commute_days_by_car'):
-                user_data['commute_days_by_car'] = latest_footprint.commute_days_by_car or 0
-            if hasattr(latest_footprint, 'commute_days_public_transit'):
-                user_data['commute_days_public_transit'] = latest_footprint.commute_days_public_transit or 0
-            if hasattr(latest_footprint, 'commute_days_ev'):
-                user_data['commute_days_ev'] = latest_footprint.commute_days_ev or 0
-            if hasattr(latest_footprint, 'remote_work_days'):
-                user_data['remote_work_days'] = latest_footprint.remote_work_days or 0
-            if hasattr(latest_footprint, 'video_conference_hours'):
-                user_data['video_conference_hours'] = latest_footprint.video_conference_hours or 0
-            if hasattr(latest_footprint, 'air_travel_miles'):
-                user_data['air_travel_miles'] = latest_footprint.air_travel_miles or 0
-            if hasattr(latest_footprint, 'hotel_nights'):
-                user_data['hotel_nights'] = latest_footprint.hotel_nights or 0
-            if hasattr(latest_footprint, 'computer_hours'):
-                user_data['computer_hours'] = latest_footprint.computer_hours or 0
-            if hasattr(latest_footprint, 'printer_pages'):
-                user_data['printer_pages'] = latest_footprint.printer_pages or 0
-            if hasattr(latest_footprint, 'hvac_usage'):
-                user_data['hvac_usage'] = latest_footprint.hvac_usage or 'medium'
-            if hasattr(latest_footprint, 'has_transaction_data'):
-                user_data['has_transaction_data'] = latest_footprint.has_transaction_data or False
-            
-            # For backward compatibility
-            if hasattr(latest_footprint, 'diet_type'):
-                user_data['diet_type'] = latest_footprint.diet_type
-            if hasattr(latest_footprint, 'local_food_percentage'):
-                user_data['local_food_percentage'] = latest_footprint.local_food_percentage
-            if hasattr(latest_footprint, 'office_days_per_week'):
-                user_data['office_days_per_week'] = latest_footprint.office_days_per_week
-            if hasattr(latest_footprint, 'paper_usage'):
-                user_data['paper_usage'] = latest_footprint.paper_usage
-            if hasattr(latest_footprint, 'energy_usage'):
-                user_data['energy_usage'] = latest_footprint.energy_usage
-            
+            user_data = build_recommendation_input(latest_footprint)
             recommendations = recommendation_engine.get_personalized_recommendations(user_data, limit=3)
         except Exception as e:
             logging.error(f"Error generating recommendations: {str(e)}")
             recommendations = []
     
-    # Get latest quiz score
-    latest_quiz = QuizScore.query.filter_by(user_id=current_user.id).order_by(QuizScore.quiz_date.desc()).first()
-    
-    # Get forecast data if we have footprint data
+    # Get forecast data if we have footprint data (the same model as the forecast API)
     forecast_data = None
     if latest_footprint:
-        forecast_data = forecaster.forecast_individual_emissions(latest_footprint.total_footprint, months=6)
+        forecast_data = employee_forecast(latest_footprint, forecaster, months=6)
     
     return render_template('employee/dashboard.html', 
                           user=current_user,
@@ -263,6 +228,7 @@ def carbon_form():
                 travel_footprint=travel_footprint,
                 total_footprint=total_footprint,
                 footprint_score=footprint_score,
+                factor_version=calculator.factor_version,
                 
                 # For backward compatibility
                 diet_type="mixed",
@@ -270,7 +236,15 @@ def carbon_form():
             )
             
             db.session.add(footprint)
+            db.session.flush()
+            
+            # Keep the executive monthly rollups in step, in the same transaction
+            record_footprint(footprint, current_user)
+            record_forecast_footprint(footprint)
             db.session.commit()
+            leaderboard.record(current_user, footprint)
+            # Keep the dashboard forecasts served from storage
+            refresh_employee_forecasts(current_user.id, forecaster)
             
             flash(flash_message, 'success')
             return redirect(url_for('employee.dashboard'))
@@ -446,31 +420,14 @@ def update_training_progress():
 @login_required
 def take_quiz():
     """Take a sustainability quiz."""
-    # Generate a new quiz with 10 questions
-    questions_with_answers = quiz.generate_quiz(num_questions=10)
-    
     if request.method == 'POST':
-        # Get the quiz key from session
-        session_key = session.get('current_quiz_key')
-        if not session_key:
-            flash('Quiz session expired. Please start a new quiz.', 'warning')
-            return redirect(url_for('employee.take_quiz'))
-            
-        # Get questions JSON using the session key
-        questions_json = session.get(session_key, '')
-        if not questions_json:
-            flash('Quiz data not found. Please start a new quiz.', 'warning')
-            return redirect(url_for('employee.take_quiz'))
-            
-        # Deserialize questions from JSON
+        # Resolve the quiz from its signed token and the question bank
         try:
-            questions_with_answers = json.loads(questions_json)
-            # Clean up session after use
-            session.pop(session_key, None)
-            session.pop('current_quiz_key', None)
-        except json.JSONDecodeError:
-            flash('Error loading quiz data. Please start a new quiz.', 'warning')
+            question_ids = load_quiz_token(request.form.get('quiz_token'), current_user.id)
+        except QuizTokenError as e:
+            flash(str(e), 'warning')
             return redirect(url_for('employee.take_quiz'))
+        questions_with_answers = quiz.get_questions(question_ids)
             
         # Handle quiz submission
         user_answers = []
@@ -504,6 +461,10 @@ def take_quiz():
                     'explanation': q['explanation']
                 })
         
+        # Update the question history; unanswered questions count as wrong
+        selected = {answer['question_id']: answer['selected_answer'] for answer in user_answers}
+        record_quiz(current_user.id, [(q['id'], selected.get(q['id']) == q['correct_answer']) for q in questions_with_answers])
+        
         # Calculate percentage
         percentage = (score / total_possible) * 100 if total_possible > 0 else 0
         
@@ -535,6 +496,9 @@ def take_quiz():
                               results=quiz_results, 
                               user=current_user)
     
+    # Generate a new quiz with 10 questions, favoring unseen and due ones
+    questions_with_answers = quiz.generate_adaptive_quiz(10, load_history(current_user.id).weight)
+    
     # For GET request, prepare the quiz questions by removing answers
     display_questions = []
     for q in questions_with_answers:
@@ -544,16 +508,18 @@ def take_quiz():
         question_copy.pop('explanation', None)
         display_questions.append(question_copy)
     
-    # Store the full questions with answers in session for validation on POST
-    # Use a unique session key for each quiz to prevent conflicts
-    session_key = f'quiz_{datetime.now().timestamp()}'
-    session['current_quiz_key'] = session_key
-    session[session_key] = json.dumps(questions_with_answers)
+    # Sign the question ids so answers can be checked on POST without storing the quiz
+    quiz_token = issue_quiz_token(current_user.id, questions_with_answers)
+    
+    # Drop quiz data that earlier versions left in the session cookie
+    for key in [key for key in session if key.startswith('quiz_') or key == 'current_quiz_key']:
+        session.pop(key, None)
     
     # For GET request, render the quiz form
     return render_template('employee/quiz.html', 
                           completed=False, 
                           questions=display_questions, 
+                          quiz_token=quiz_token,
                           user=current_user)
 
 @employee_bp.route('/peer_comparison')
@@ -561,48 +527,29 @@ def take_quiz():
 def peer_comparison():
     """Render the peer comparison dashboard."""
     # Get the user's latest carbon footprint
-    latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc()).first()
+    latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc(), CarbonFootprint.id.desc()).first()
     
     if not latest_footprint:
         flash('Please submit your carbon footprint data first.', 'info')
         return redirect(url_for('employee.carbon_form'))
     
-    # Get company and department averages
-    company_avg = db.session.query(
-        func.avg(CarbonFootprint.total_footprint).label('avg_footprint'),
-        func.avg(CarbonFootprint.footprint_score).label('avg_score')
-    ).first()
+    # Rank the user's latest footprint (refreshed in the background when stale)
+    ensure_rankings(latest_footprint)
+    ranking = get_user_ranking(current_user.id)
     
-    # Get department average if user has a department
-    dept_avg = None
-    if current_user.department:
-        # Get all users in the department
-        dept_users = User.query.filter_by(department=current_user.department).all()
-        dept_user_ids = [user.id for user in dept_users]
-        
-        # Get average footprint for department members
-        dept_avg = db.session.query(
-            func.avg(CarbonFootprint.total_footprint).label('avg_footprint'),
-            func.avg(CarbonFootprint.footprint_score).label('avg_score')
-        ).filter(CarbonFootprint.user_id.in_(dept_user_ids)).first()
+    # Get company and department averages over the latest footprints of the user's company
+    company_avg, dept_avg = peer_averages(current_user.company, current_user.department)
     
     # Get top performers in company and department
-    top_company = CarbonFootprint.query.order_by(CarbonFootprint.footprint_score.desc()).limit(5).all()
+    top_company = leaderboard.top(current_user.company, limit=5)
     
     # Get department leaderboard if user has a department
     top_department = []
     if current_user.department:
-        top_department = CarbonFootprint.query.join(User).filter(
-            User.department == current_user.department
-        ).order_by(CarbonFootprint.footprint_score.desc()).limit(5).all()
-    
-    # Get user's percentile
-    # This is simplified - in a real app you'd need more complex calculation
-    better_than_count = CarbonFootprint.query.filter(
-        CarbonFootprint.footprint_score < latest_footprint.footprint_score
-    ).count()
-    total_users = CarbonFootprint.query.distinct(CarbonFootprint.user_id).count()
-    percentile = int((better_than_count / total_users * 100) if total_users > 0 else 0)
+        top_department = leaderboard.top(current_user.company, department=current_user.department, limit=5)
+    
+    # Get user's percentile among the latest scores of their company
+    percentile = ranking_percentile(ranking) if ranking else 0
     
     return render_template('employee/peer_comparison.html',
                           user=current_user,
@@ -613,17 +560,72 @@ def peer_comparison():
                           top_department=top_department,
                           percentile=percentile)
 
+@employee_bp.route('/api/leaderboard')
+@login_required
+def api_leaderboard():
+    """
+    API endpoint for leaderboard pages.
+    
+    Query parameters: scope ('company' or 'department'), around ('me' to
+    center the window on the current user), page (window offset, may be
+    negative around the user) and size (users per page).
+    
+    Boards only hold users of the current user's company. Every page is
+    read from the rank table by position, so pages of one refresh never
+    overlap or skip users, and tied users never make a page longer than
+    its size. (The in-memory top-K is updated between refreshes and would
+    not line up with the later pages.)
+    """
+    scope = request.args.get('scope', 'company')
+    around = request.args.get('around')
+    page = request.args.get('page', 0 if around == 'me' else 1, type=int)
+    size = max(1, min(request.args.get('size', 10, type=int), 100))
+    
+    department = None
+    if scope == 'department':
+        if not current_user.department:
+            return jsonify({'error': 'You are not assigned to a department'}), 404
+        department = current_user.department
+    
+    if around == 'me':
+        latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc(), CarbonFootprint.id.desc()).first()
+        if not latest_footprint:
+            return jsonify({'error': 'No carbon footprint data available'}), 404
+        ensure_rankings(latest_footprint)
+        ranking = get_user_ranking(current_user.id)
+        if ranking is None:
+            # Submitted since the last refresh; ranked once the background refresh ends
+            return jsonify({'error': 'Your footprint has not been ranked yet'}), 404
+        offset = users_ahead(ranking, department) - size // 2 + page * size
+    else:
+        offset = (page - 1) * size
+    offset = max(offset, 0)
+    
+    ensure_rankings()
+    entries = rank_window(current_user.company, department=department, offset=offset, limit=size)
+    
+    return jsonify({
+        'scope': scope,
+        'page': page,
+        'first_position': offset + 1,
+        'last_position': offset + len(entries),
+        'entries': [
+            dict(entry._asdict(), position=offset + index, is_me=entry.user_id == current_user.id)
+            for index, entry in enumerate(entries, 1)
+        ]
+    })
+
 @employee_bp.route('/api/forecast')
 @login_required
 def get_forecast_data():
     """API endpoint to get forecast data for charts."""
     # Get the user's most recent carbon footprint
-    latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc()).first()
+    latest_footprint = CarbonFootprint.query.filter_by(user_id=current_user.id).order_by(CarbonFootprint.date.desc(), CarbonFootprint.id.desc()).first()
     
     if not latest_footprint:
         return jsonify({'error': 'No carbon footprint data available'}), 404
     
-    # Generate forecast data
-    forecast_data = forecaster.forecast_individual_emissions(latest_footprint.total_footprint, months=12)
+    # Forecast from the user's fitted history, or the flat reduction model without enough of it
+    forecast_data = employee_forecast(latest_footprint, forecaster, months=12)
     
     return jsonify(forecast_data)
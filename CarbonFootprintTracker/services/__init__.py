@@ -0,0 +1 @@
+# Package initialization for services
@@ -0,0 +1,224 @@
+"""
+Response Cache Module
+
+Caches JSON API responses keyed by endpoint, parameters and the data version
+of every table the response reads. Committed writes bump the versions of the
+tables they touched (through SQLAlchemy session hooks), so cached responses
+are never served after their data changed. Responses carry a content-hash
+ETag, and clients revalidating with If-None-Match get a 304.
+
+The default backend is an in-process LRU with TTL and size bounds. Each
+worker process then has its own versions, so writes made by another worker
+only become visible once the TTL expires. A shared backend (Redis) keeps one
+cache and one set of versions for all workers.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, jsonify, request
+from sqlalchemy import event
+
+try:
+    import redis
+except ImportError:
+    # Only needed for the shared backend
+    redis = None
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL and table versions."""
+
+    def __init__(self, max_entries=512):
+        """
+        Initialize the backend.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tables):
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class RedisCacheBackend:
+    """Cache and table versions shared by all workers through Redis."""
+
+    def __init__(self, url, prefix='ecopulse:cache:'):
+        """
+        Initialize the backend.
+
+        Args:
+            url (str): Redis connection URL
+            prefix (str): Key prefix for cache entries and versions
+        """
+        if redis is None:
+            raise RuntimeError("The redis package is required for CACHE_BACKEND=redis")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def versions(self, tables):
+        values = self.client.mget([f'{self.prefix}version:{table}' for table in tables])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tables):
+        pipeline = self.client.pipeline()
+        for table in tables:
+            pipeline.incr(f'{self.prefix}version:{table}')
+        pipeline.execute()
+
+
+class ResponseCache:
+    """Versioned JSON response cache with ETag revalidation."""
+
+    def __init__(self):
+        """Initialize an unconfigured cache (see init_app)."""
+        self.backend = None
+        self.ttl = 60
+
+    def init_app(self, app, session):
+        """
+        Configure the backend and hook write tracking into the session.
+
+        Args:
+            app (Flask): The application (CACHE_BACKEND, CACHE_TTL,
+                         CACHE_MAX_ENTRIES, CACHE_REDIS_URL config)
+            session (scoped_session): Session whose commits bump versions
+        """
+        self.ttl = app.config.get('CACHE_TTL', 60)
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            self.backend = RedisCacheBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryCacheBackend(app.config.get('CACHE_MAX_ENTRIES', 512))
+
+        event.listen(session, 'after_flush', self._after_flush)
+        event.listen(session, 'do_orm_execute', self._do_orm_execute)
+        event.listen(session, 'after_commit', self._after_commit)
+        event.listen(session, 'after_rollback', self._after_rollback)
+
+    # Written tables are collected per session and bumped once committed
+
+    def _after_flush(self, session, flush_context):
+        written = session.info.setdefault('cache_written_tables', set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            table = getattr(instance, '__tablename__', None)
+            if table:
+                written.add(table)
+
+    def _do_orm_execute(self, orm_execute_state):
+        # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if table is not None:
+                orm_execute_state.session.info.setdefault('cache_written_tables', set()).add(table.name)
+
+    def _after_commit(self, session):
+        written = session.info.pop('cache_written_tables', None)
+        if written and self.backend is not None:
+            try:
+                self.backend.bump(sorted(written))
+            except Exception as e:
+                logging.error(f"Error bumping cache versions: {str(e)}")
+
+    def _after_rollback(self, session):
+        session.info.pop('cache_written_tables', None)
+
+    def _key(self, tables):
+        """Cache key of the current request for the given table versions."""
+        versions = self.backend.versions(tables)
+        parts = [
+            request.endpoint,
+            sorted((request.view_args or {}).items()),
+            sorted(request.args.items(multi=True)),
+            list(zip(tables, versions))
+        ]
+        return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+    def json_response(self, tables, build):
+        """
+        Serve build()'s JSON from the cache, computing it on a miss.
+
+        Call after any authorization check: cached responses are shared by
+        every user allowed to reach the endpoint.
+
+        Args:
+            tables (tuple): Names of the tables the data is read from
+            build (callable): Returns the JSON-serializable data
+
+        Returns:
+            Response: The JSON response, or an empty 304 if the client's
+                      If-None-Match already holds the current ETag
+        """
+        if self.backend is None:
+            return jsonify(build())
+
+        key = None
+        cached = None
+        try:
+            key = self._key(tables)
+            cached = self.backend.get(key)
+        except Exception as e:
+            # A failing shared backend must not take the API down
+            logging.error(f"Error reading response cache: {str(e)}")
+
+        if cached is not None:
+            etag, body = cached.split(b'\n', 1)
+            etag = etag.decode()
+        else:
+            body = jsonify(build()).get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            if key is not None:
+                try:
+                    self.backend.set(key, etag.encode() + b'\n' + body, self.ttl)
+                except Exception as e:
+                    logging.error(f"Error writing response cache: {str(e)}")
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Private data: browsers may keep it but must revalidate each time
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+response_cache = ResponseCache()
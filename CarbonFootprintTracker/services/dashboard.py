@@ -0,0 +1,185 @@
+"""
+Dashboard Data Module
+
+Loads everything the employee dashboard needs in a single database round trip
+and maps a footprint onto the recommendation engine's input. After bulk
+imports, the dashboards' forecasts and recommendations can be precomputed for
+the whole company in a background pass. Forecasts are stored for every
+worker (see services.forecast_cache); recommendations are memoized in the
+worker that ran the pass.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from app import db
+from models import CarbonFootprint, QuizScore
+from ai_helpers.recommendations import RecommendationEngine
+from services.queries import latest_footprints
+from services.forecast_cache import precompute_latest_forecasts
+
+DashboardData = namedtuple('DashboardData', ['latest_footprint', 'history', 'latest_quiz'])
+
+# Background precompute of this process: whether one runs, and whether another was requested meanwhile
+_precompute_lock = threading.Lock()
+_precompute_running = False
+_precompute_pending = False
+
+# Recommendation input fields read from CarbonFootprint, with the value used
+# when the stored one is empty
+RECOMMENDATION_INPUT_COLUMNS = (
+    ('commute_distance', 0),
+    ('car_type', 'gas'),
+    ('commute_days_by_car', 0),
+    ('commute_days_public_transit', 0),
+    ('commute_days_ev', 0),
+    ('remote_work_days', 0),
+    ('video_conference_hours', 0),
+    ('air_travel_miles', 0),
+    ('hotel_nights', 0),
+    ('computer_hours', 0),
+    ('printer_pages', 0),
+    ('hvac_usage', 'medium'),
+    ('has_transaction_data', False)
+)
+
+# Legacy fields, passed through as stored for backward compatibility
+LEGACY_RECOMMENDATION_COLUMNS = (
+    'diet_type',
+    'local_food_percentage',
+    'office_days_per_week',
+    'paper_usage',
+    'energy_usage'
+)
+
+
+def build_recommendation_input(footprint):
+    """
+    Build the recommendation engine's user_data from a footprint.
+
+    Args:
+        footprint (CarbonFootprint): The footprint to describe
+
+    Returns:
+        dict: User data for RecommendationEngine
+    """
+    user_data = {name: getattr(footprint, name) or default for name, default in RECOMMENDATION_INPUT_COLUMNS}
+    for name in LEGACY_RECOMMENDATION_COLUMNS:
+        user_data[name] = getattr(footprint, name)
+    return user_data
+
+
+def load_employee_dashboard(user_id, history_size=6):
+    """
+    Load a user's recent footprints and latest quiz score in one query.
+
+    The newest footprint rows are fetched with the latest quiz score joined
+    onto each of them; the first row doubles as the latest footprint. Users
+    without footprints need a second query for their quiz score.
+
+    Args:
+        user_id (int): The user's id
+        history_size (int): Number of recent footprints to load
+
+    Returns:
+        DashboardData: latest_footprint, history (oldest first) and latest_quiz
+    """
+    latest_quiz_id = select(QuizScore.id).where(
+        QuizScore.user_id == user_id
+    ).order_by(QuizScore.quiz_date.desc()).limit(1).scalar_subquery()
+
+    rows = db.session.execute(
+        select(CarbonFootprint, QuizScore)
+        .outerjoin(QuizScore, QuizScore.id == latest_quiz_id)
+        .where(CarbonFootprint.user_id == user_id)
+        .order_by(CarbonFootprint.date.desc(), CarbonFootprint.id.desc())
+        .limit(history_size)
+    ).all()
+
+    if not rows:
+        latest_quiz = QuizScore.query.filter_by(user_id=user_id).order_by(QuizScore.quiz_date.desc()).first()
+        return DashboardData(None, [], latest_quiz)
+
+    history = [footprint for footprint, _ in rows]
+    return DashboardData(history[0], list(reversed(history)), rows[0][1])
+
+
+def materialize_recommendations(engine=None, limit=3):
+    """
+    Compute the recommendations of every user's latest footprint in one pass.
+
+    Users are bucketed by profile signature, so each distinct profile is
+    computed once and stays memoized in the engine for dashboard reads.
+
+    Args:
+        engine (RecommendationEngine, optional): Engine to use (defaults to
+                                                 the shared recommendation_engine)
+        limit (int): Recommendations per user
+
+    Returns:
+        dict: user_id -> list of recommendations
+    """
+    engine = engine or recommendation_engine
+    latest = latest_footprints()
+    footprints = db.session.execute(select(latest)).scalars().all()
+    recommendations = engine.get_batch_recommendations(
+        [build_recommendation_input(footprint) for footprint in footprints], limit=limit
+    )
+    return {footprint.user_id: recs for footprint, recs in zip(footprints, recommendations)}
+
+
+def start_dashboard_precompute(app, forecaster):
+    """
+    Precompute every user's dashboard forecasts and recommendations in a background thread.
+
+    At most one pass runs per process. A request made while one runs is
+    served by running one more pass after it, so imports that finish
+    meanwhile are included without starting a thread per import.
+
+    Args:
+        app (Flask): The application (the thread pushes its own context)
+        forecaster (CarbonForecaster): The forecaster the routes use
+
+    Returns:
+        Thread: The started daemon thread, or None if a pass was already running
+    """
+    global _precompute_running, _precompute_pending
+
+    with _precompute_lock:
+        if _precompute_running:
+            _precompute_pending = True
+            return None
+        _precompute_running = True
+
+    def run():
+        global _precompute_running, _precompute_pending
+        while True:
+            with app.app_context():
+                try:
+                    precompute_latest_forecasts(forecaster)
+                    materialize_recommendations()
+                except Exception as e:
+                    logging.error(f"Error precomputing dashboards: {str(e)}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            with _precompute_lock:
+                if not _precompute_pending:
+                    _precompute_running = False
+                    return
+                _precompute_pending = False
+
+    thread = threading.Thread(target=run, name='dashboard-precompute', daemon=True)
+    try:
+        thread.start()
+    except Exception:
+        with _precompute_lock:
+            _precompute_running = False
+        raise
+    return thread
+
+
+recommendation_engine = RecommendationEngine()
@@ -0,0 +1,241 @@
+"""
+Data Export Module
+
+Streams footprints, transactions and company events to BI tools as CSV,
+NDJSON or Arrow IPC. Rows are read through a server-side cursor with
+yield_per and written out one batch at a time, so an export never holds more
+than a batch in memory.
+
+Incremental pulls use a watermark. Footprints are exported in
+(last_updated, id) order; a client passes the last_updated and id of the
+last row it received back as since_updated and since_id, and gets every row
+inserted or changed since, including rows recomputed in place. Datasets
+without an update timestamp (transactions, events) are exported in id
+order and take since_id alone, which only finds newly inserted rows.
+"""
+
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from sqlalchemy import select, and_, or_, Boolean, Date, DateTime, Float, Integer
+
+from app import db
+from models import User, CarbonFootprint, TransactionData, CompanyEvent
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    # Only needed for the Arrow format
+    pyarrow = None
+
+# model, date column for start/end filters, whether rows belong to a user,
+# column bumped when a row changes (None if rows are never updated in place)
+ExportDataset = namedtuple('ExportDataset', ['model', 'date_column', 'per_user', 'updated_column'])
+
+DATASETS = {
+    'footprints': ExportDataset(CarbonFootprint, CarbonFootprint.date, True, CarbonFootprint.last_updated),
+    'transactions': ExportDataset(TransactionData, TransactionData.transaction_date, True, None),
+    'events': ExportDataset(CompanyEvent, CompanyEvent.start_date, False, None)
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+
+class ExportError(ValueError):
+    """An export request that cannot be served."""
+
+
+def _columns(dataset):
+    """Selected columns: the model's own, plus username and department for per-user data."""
+    columns = list(dataset.model.__table__.columns)
+    if dataset.per_user:
+        columns += [User.username, User.department]
+    return columns
+
+
+def build_export_query(name, start=None, end=None, department=None, company=None, since_id=None,
+                       since_updated=None):
+    """
+    Build the ordered SELECT of an export.
+
+    Args:
+        name (str): Dataset name (footprints, transactions, events)
+        start (date, optional): First day included
+        end (date, optional): Last day included
+        department (str, optional): Only rows of users in this department
+        company (str, optional): Only rows of users in this company
+        since_id (int, optional): Only rows with a greater id, or with a
+                                  greater (last_updated, id) when
+                                  since_updated is given (watermark)
+        since_updated (datetime, optional): last_updated part of the watermark
+
+    Returns:
+        tuple: (ExportDataset, Select)
+
+    Raises:
+        ExportError: For an unknown dataset or a filter it does not support
+    """
+    dataset = DATASETS.get(name)
+    if dataset is None:
+        raise ExportError(f"Unknown dataset '{name}', expected one of {', '.join(DATASETS)}")
+
+    model = dataset.model
+    query = select(*_columns(dataset))
+    if dataset.per_user:
+        query = query.join(User, User.id == model.user_id)
+        if department is not None:
+            query = query.where(User.department == department)
+        if company is not None:
+            query = query.where(User.company == company)
+    elif department is not None:
+        raise ExportError(f"The {name} dataset cannot be filtered by department")
+
+    # DateTime columns compare against the start of the day
+    is_datetime = isinstance(dataset.date_column.type, DateTime)
+    if start is not None:
+        query = query.where(dataset.date_column >= (datetime.combine(start, time.min) if is_datetime else start))
+    if end is not None:
+        if is_datetime:
+            query = query.where(dataset.date_column <= datetime.combine(end, time.max))
+        else:
+            query = query.where(dataset.date_column <= end)
+    updated = dataset.updated_column
+    if since_updated is not None:
+        if updated is None:
+            raise ExportError(f"The {name} dataset cannot be filtered by update time")
+        query = query.where(or_(
+            updated > since_updated,
+            and_(updated == since_updated, model.id > (since_id or 0))
+        ))
+    elif since_id is not None:
+        query = query.where(model.id > since_id)
+
+    if updated is not None:
+        return dataset, query.order_by(updated, model.id)
+    return dataset, query.order_by(model.id)
+
+
+def _stream_batches(query, batch_size):
+    """Execute with a server-side cursor and yield lists of rows."""
+    result = db.session.execute(query, execution_options={'yield_per': batch_size})
+    for partition in result.partitions():
+        yield partition
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(names, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(names, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({name: _json_value(value) for name, value in zip(names, row)}) + '\n'
+            for row in rows
+        )
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, Float):
+        return pyarrow.float64()
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp('us')
+    if isinstance(column.type, Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+class _ChunkSink:
+    """File-like target collecting what the Arrow writer emits."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_chunks(columns, batches):
+    schema = pyarrow.schema([(column.key, _arrow_type(column)) for column in columns])
+    sink = _ChunkSink()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+    for rows in batches:
+        arrays = [
+            pyarrow.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(schema)
+        ]
+        writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(name, file_format='csv', batch_size=5000, **filters):
+    """
+    Stream an export as encoded chunks.
+
+    Args:
+        name (str): Dataset name (footprints, transactions, events)
+        file_format (str): 'csv', 'ndjson' or 'arrow'
+        batch_size (int): Rows fetched and encoded per chunk
+        **filters: start, end, department, company, since_id and
+                   since_updated (see build_export_query)
+
+    Returns:
+        iterator: str chunks (csv, ndjson) or bytes chunks (arrow)
+
+    Raises:
+        ExportError: For an unknown dataset or format, or a missing pyarrow
+    """
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown format '{file_format}', expected one of {', '.join(FORMATS)}")
+    if file_format == 'arrow' and pyarrow is None:
+        raise ExportError("The pyarrow package is required for Arrow exports")
+
+    dataset, query = build_export_query(name, **filters)
+    columns = _columns(dataset)
+    names = [column.key for column in columns]
+    batches = _stream_batches(query, batch_size)
+
+    if file_format == 'csv':
+        return _csv_chunks(names, batches)
+    if file_format == 'ndjson':
+        return _ndjson_chunks(names, batches)
+    return _arrow_chunks(columns, batches)
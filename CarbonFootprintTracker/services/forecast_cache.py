@@ -0,0 +1,266 @@
+"""
+Forecast Cache Module
+
+Serves the employee forecasts (dashboard and forecast API) without computing
+them on the read path.
+
+Forecasts are stored in DashboardForecast, which every worker reads: the
+Holt-Winters forecast of the user's fitted history, or the flat reduction
+forecast for users with too little history. A submission refreshes its
+user's rows, and after a bulk import every user's rows are precomputed in
+a background pass (refitting the states the import flagged). A stored
+forecast is served only while the user's latest footprint, its total and
+the current month are the ones it was made from; otherwise it is computed
+once and stored for the next read.
+
+The flat forecasts computed on a miss are memoized in a bounded in-process
+LRU keyed by their inputs (latest weekly footprint, reduction rate, number
+of months, current month). Entries are dropped when the month rolls over.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from models import CarbonFootprint, DashboardForecast, ForecastState
+from services.queries import latest_footprints
+from services.forecasts import user_key, month_index, fit_series, forecast_from_state, user_forecast
+
+# Months forecast by the employee dashboard and the forecast API
+PRECOMPUTED_MONTHS = (6, 12)
+
+
+class ForecastCache:
+    """Bounded LRU of forecast_individual_emissions results for the current month."""
+
+    def __init__(self, max_entries=4096):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._month = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_month(self):
+        """Drop every entry once the month has rolled over (call with the lock held)."""
+        now = datetime.now()
+        month = (now.year, now.month)
+        if month != self._month:
+            self._entries.clear()
+            self._month = month
+
+    @staticmethod
+    def _key(forecaster, current_emissions, months):
+        return (float(current_emissions or 0.0), forecaster.reduction_rate, months)
+
+    def individual_forecast(self, forecaster, current_emissions, months=12):
+        """
+        Get forecaster.forecast_individual_emissions(current_emissions, months), cached.
+
+        The result is shared between callers and must not be modified.
+
+        Args:
+            forecaster (CarbonForecaster): The forecaster
+            current_emissions (float): Current weekly emissions in kg CO2
+            months (int): Number of months to forecast
+
+        Returns:
+            dict: The forecast
+        """
+        key = self._key(forecaster, current_emissions, months)
+        with self._lock:
+            self._check_month()
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        # Compute outside the lock; a concurrent miss on the same key just computes it twice
+        result = forecaster.forecast_individual_emissions(key[0], months)
+        with self._lock:
+            self._check_month()
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+def employee_forecast(footprint, forecaster, months=12):
+    """
+    Get a user's forecast from their latest footprint.
+
+    Serves the stored forecast when it was made from this footprint in the
+    current month; otherwise forecasts from the fitted history, falling
+    back to the flat reduction forecast with too little history, and
+    stores the result (committing the session).
+
+    Args:
+        footprint (CarbonFootprint): The user's latest footprint
+        forecaster (CarbonForecaster): The forecaster the routes use
+        months (int): Number of months to forecast
+
+    Returns:
+        dict: The forecast (shared; must not be modified)
+    """
+    month = month_index(datetime.now().date())
+    stored = db.session.get(DashboardForecast, (footprint.user_id, months))
+    if (stored is not None and stored.footprint_id == footprint.id
+            and stored.total_footprint == footprint.total_footprint
+            and stored.month == month):
+        return json.loads(stored.data)
+
+    forecast = _compute_forecast(footprint, forecaster, months)
+    _save_forecasts([_forecast_row(footprint, months, month, forecast)])
+    return forecast
+
+
+def refresh_employee_forecasts(user_id, forecaster, months=PRECOMPUTED_MONTHS):
+    """
+    Store a user's forecasts from their latest footprint, after a submission.
+
+    Call once the submission is committed; commits the session.
+
+    Args:
+        user_id (int): The user's id
+        forecaster (CarbonForecaster): The forecaster the routes use
+        months (tuple): Forecast lengths to store
+    """
+    footprint = CarbonFootprint.query.filter_by(user_id=user_id).order_by(
+        CarbonFootprint.date.desc(), CarbonFootprint.id.desc()
+    ).first()
+    if footprint is None:
+        return
+    month = month_index(datetime.now().date())
+    _save_forecasts([
+        _forecast_row(footprint, length, month, _compute_forecast(footprint, forecaster, length))
+        for length in months
+    ])
+
+
+def _compute_forecast(footprint, forecaster, months):
+    """Forecast from the user's fitted history, or the flat forecast without enough of it."""
+    forecast = user_forecast(footprint.user_id, footprint.total_footprint, forecaster, months)
+    if forecast is None:
+        forecast = forecast_cache.individual_forecast(forecaster, footprint.total_footprint, months)
+    return forecast
+
+
+def _forecast_row(footprint, months, month, forecast):
+    return {
+        'user_id': footprint.user_id, 'months': months, 'footprint_id': footprint.id,
+        'total_footprint': footprint.total_footprint, 'month': month,
+        'data': json.dumps(forecast), 'computed_at': datetime.utcnow()
+    }
+
+
+def _save_forecasts(rows):
+    """Store forecasts and commit; a failure only costs a recomputation later."""
+    try:
+        _store_forecasts(rows)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        logging.error(f"Error storing employee forecasts: {str(e)}")
+        db.session.rollback()
+
+
+def _store_forecasts(rows):
+    """Insert or replace DashboardForecast rows."""
+    table = DashboardForecast.__table__
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'months'],
+        set_={
+            column: statement.excluded[column]
+            for column in ('footprint_id', 'total_footprint', 'month', 'data', 'computed_at')
+        }
+    )
+    db.session.execute(statement)
+
+
+def precompute_latest_forecasts(forecaster, months=PRECOMPUTED_MONTHS, chunk_size=500):
+    """
+    Precompute and store the forecasts of every user's latest footprint.
+
+    Users are processed in chunks, one transaction each. Missing or flagged
+    history states are refitted first; users with too little history get
+    the flat forecast, computed in one vectorized pass per chunk.
+
+    Args:
+        forecaster (CarbonForecaster): The forecaster the routes use
+        months (tuple): Forecast lengths to compute
+        chunk_size (int): Users per committed chunk
+
+    Returns:
+        int: Number of forecasts stored
+    """
+    latest = latest_footprints()
+    footprints = db.session.execute(
+        select(latest.user_id, latest.id, latest.total_footprint).order_by(latest.user_id)
+    ).all()
+    month = month_index(datetime.now().date())
+
+    stored = 0
+    for start in range(0, len(footprints), chunk_size):
+        chunk = footprints[start:start + chunk_size]
+        keys = [user_key(user_id) for user_id, _, _ in chunk]
+        states = {
+            row.series_key: row
+            for row in db.session.execute(select(ForecastState).where(ForecastState.series_key.in_(keys))).scalars()
+        }
+        for key in keys:
+            if key not in states or states[key].needs_refit:
+                states[key] = fit_series(key)
+
+        now = datetime.utcnow()
+        rows = []
+        for length in months:
+            flat = []
+            for user_id, footprint_id, total in chunk:
+                forecast = forecast_from_state(states[user_key(user_id)], total, forecaster, length)
+                if forecast is None:
+                    flat.append((user_id, footprint_id, total))
+                    continue
+                rows.append((user_id, length, footprint_id, total, forecast))
+            if flat:
+                forecasts = forecaster.forecast_individual_batch([float(total or 0.0) for _, _, total in flat], length)
+                rows.extend(
+                    (user_id, length, footprint_id, total, forecast)
+                    for (user_id, footprint_id, total), forecast in zip(flat, forecasts)
+                )
+
+        if rows:
+            _store_forecasts([
+                {
+                    'user_id': user_id, 'months': length, 'footprint_id': footprint_id,
+                    'total_footprint': total, 'month': month, 'data': json.dumps(forecast), 'computed_at': now
+                }
+                for user_id, length, footprint_id, total, forecast in rows
+            ])
+        db.session.commit()
+        stored += len(rows)
+    return stored
+
+
+forecast_cache = ForecastCache()
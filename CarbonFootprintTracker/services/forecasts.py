@@ -0,0 +1,364 @@
+"""
+History Forecast Module
+
+Keeps a Holt-Winters model of each user's and the company's monthly
+footprint history in ForecastState. A submission updates its user's stored
+state in O(1): it is added to the open month, and the open month is folded
+into the fit once a later month starts. States are fitted from the full
+history only when missing or when history changed out of order (backdated
+imports, recomputes).
+
+The company series is kept out of the submission path, so submissions never
+contend for one shared row. Its state holds the fit of the closed months,
+refitted from the monthly rollups once a month (or when flagged), and the
+current month is read from the rollups when forecasting.
+
+The series value of a month is the mean weekly footprint submitted in it.
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import CarbonFootprint, ForecastState, MonthlyFootprintRollup, DashboardForecast
+from ai_helpers.forecasting import HoltWintersModel
+from services.queries import month_bucket
+
+COMPANY_KEY = 'company'
+MIN_OBSERVATIONS = 2  # Months of history needed before the model is used
+
+model = HoltWintersModel()
+
+
+def user_key(user_id):
+    """Series key of a user's history."""
+    return f'user:{user_id}'
+
+
+def month_index(day):
+    """Month index (year * 12 + month - 1) of a date."""
+    return day.year * 12 + day.month - 1
+
+
+def _model_state(row):
+    return {
+        'level': row.level or 0.0,
+        'trend': row.trend or 0.0,
+        'seasonal': json.loads(row.seasonal) if row.seasonal else [0.0] * model.period,
+        'month': row.last_month,
+        'observations': row.observations or 0
+    }
+
+
+def _store_model_state(row, state):
+    row.level = state['level']
+    row.trend = state['trend']
+    row.seasonal = json.dumps(state['seasonal'])
+    row.last_month = state['month']
+    row.observations = state['observations']
+
+
+def _advance(row, month):
+    """Start a later open month, folding the current one into the fit."""
+    if row.open_month is not None and month <= row.open_month:
+        return
+    if row.open_month is not None and row.open_count:
+        state = model.update(_model_state(row), row.open_month, row.open_sum / row.open_count)
+        _store_model_state(row, state)
+    row.open_month = month
+    row.open_sum = 0.0
+    row.open_count = 0
+
+
+def _add_observation(row, month, value):
+    """Add a weekly footprint to a state row; False if it predates the open month."""
+    if row.open_month is not None and month < row.open_month:
+        return False
+    _advance(row, month)
+    row.open_sum += value
+    row.open_count += 1
+    row.updated_at = datetime.utcnow()
+    return True
+
+
+def record_footprint(footprint):
+    """
+    Update the user's forecast state with a new footprint.
+
+    Call after the footprint is flushed and before committing. A series
+    without a state is fitted from history when first read, which then
+    includes it. The company series reads the monthly rollups instead.
+
+    Args:
+        footprint (CarbonFootprint): The new footprint
+    """
+    row = db.session.execute(
+        select(ForecastState).where(ForecastState.series_key == user_key(footprint.user_id)).with_for_update()
+    ).scalar()
+    if row is None or row.needs_refit:
+        return
+    if not _add_observation(row, month_index(footprint.date), footprint.total_footprint or 0.0):
+        # Backdated: cannot be folded in incrementally
+        row.needs_refit = True
+
+
+def mark_for_refit(user_ids=None):
+    """
+    Flag forecast states whose history changed for a refit on next read.
+
+    The users' precomputed dashboard forecasts are dropped as well.
+
+    Args:
+        user_ids (iterable, optional): Users whose history changed (the
+                                       company series is always flagged);
+                                       every state if omitted
+    """
+    statement = update(ForecastState).values(needs_refit=True)
+    stored = delete(DashboardForecast)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        keys = [user_key(user_id) for user_id in user_ids] + [COMPANY_KEY]
+        statement = statement.where(ForecastState.series_key.in_(keys))
+        stored = stored.where(DashboardForecast.user_id.in_(user_ids))
+    db.session.execute(statement)
+    db.session.execute(stored)
+
+
+def _company_history(before=None, month=None):
+    """(month 'YYYY-MM', total, count) of the company from the monthly rollups."""
+    query = select(
+        MonthlyFootprintRollup.month,
+        func.sum(MonthlyFootprintRollup.total_sum),
+        func.sum(MonthlyFootprintRollup.footprint_count)
+    )
+    if before is not None:
+        query = query.where(MonthlyFootprintRollup.month < before)
+    if month is not None:
+        query = query.where(MonthlyFootprintRollup.month == month)
+    return db.session.execute(
+        query.group_by(MonthlyFootprintRollup.month).order_by(MonthlyFootprintRollup.month)
+    ).all()
+
+
+def _month_key(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def fit_series(series_key):
+    """
+    Fit a series from its full monthly history and store the state.
+
+    A user series is fitted from their footprints, including the current
+    month as its open month. The company series is fitted from the monthly
+    rollups of the closed months only; its open month marks the month the
+    fit was made in and holds no values.
+
+    Args:
+        series_key (str): user_key(id) or COMPANY_KEY
+
+    Returns:
+        ForecastState: The refreshed state row (not committed)
+    """
+    current = month_index(datetime.now().date())
+    if series_key == COMPANY_KEY:
+        history = _company_history(before=_month_key(current))
+    else:
+        month = month_bucket(CarbonFootprint.date)
+        query = select(month, func.sum(CarbonFootprint.total_footprint), func.count(CarbonFootprint.id)).where(
+            CarbonFootprint.user_id == int(series_key.split(':', 1)[1])
+        )
+        history = db.session.execute(query.group_by(month).order_by(month)).all()
+
+    row = db.session.execute(
+        select(ForecastState).where(ForecastState.series_key == series_key).with_for_update()
+    ).scalar()
+    if row is None:
+        row = ForecastState(series_key=series_key)
+        db.session.add(row)
+
+    _store_model_state(row, model.new_state())
+    row.open_month = None
+    row.open_sum = 0.0
+    row.open_count = 0
+    row.needs_refit = False
+    for bucket, total, count in history:
+        year, month_number = bucket.split('-')
+        _advance(row, int(year) * 12 + int(month_number) - 1)
+        row.open_sum = total or 0.0
+        row.open_count = count
+    if series_key == COMPANY_KEY:
+        # Fold the last closed month in; the current month comes from the rollups
+        _advance(row, current)
+    row.updated_at = datetime.utcnow()
+    return row
+
+
+def get_series_state(series_key):
+    """
+    Read a series state, fitting it from history if missing or stale.
+
+    The company state is also refitted once a new month has started.
+
+    Args:
+        series_key (str): user_key(id) or COMPANY_KEY
+
+    Returns:
+        ForecastState: The state row
+    """
+    query = select(ForecastState).where(ForecastState.series_key == series_key)
+    row = db.session.execute(query).scalar()
+    stale = row is None or row.needs_refit
+    if not stale and series_key == COMPANY_KEY:
+        stale = row.open_month != month_index(datetime.now().date())
+    if stale:
+        try:
+            row = fit_series(series_key)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request created the state first
+            db.session.rollback()
+            row = db.session.execute(query).scalar()
+    return row
+
+
+def forecast_series(row, months=12, open_values=None):
+    """
+    Forecast a series from the current month on.
+
+    The open month is folded into a copy of the state first, so the newest
+    submissions count even before their month is complete.
+
+    Args:
+        row (ForecastState): The series state
+        months (int): Number of months to forecast
+        open_values (tuple, optional): (sum, count) of the open month, instead
+                                       of the ones stored in the row
+
+    Returns:
+        numpy.ndarray: Mean weekly kg CO2 per month, or None with too little history
+    """
+    state = _model_state(row)
+    open_sum, open_count = open_values if open_values is not None else (row.open_sum, row.open_count)
+    if row.open_month is not None and open_count:
+        state = model.update(state, row.open_month, (open_sum or 0.0) / open_count)
+    if state['observations'] < MIN_OBSERVATIONS:
+        return None
+    return model.forecast(state, month_index(datetime.now().date()), months)
+
+
+def _forecast_rows(emissions, baseline, forecaster):
+    """Format monthly emissions and baseline arrays like CarbonForecaster."""
+    savings = baseline - emissions
+    cumulative = np.cumsum(savings)
+    return [
+        {
+            'month': month_num,
+            'year': year,
+            'emissions': round(float(emissions[i]), 2),
+            'baseline': round(float(baseline[i]), 2),
+            'savings': round(float(savings[i]), 2),
+            'cumulative_savings': round(float(cumulative[i]), 2)
+        }
+        for i, (month_num, year) in enumerate(forecaster.forecast_months(len(emissions)))
+    ]
+
+
+def _reduction_percentage(emissions, baseline):
+    total_baseline = float(baseline.sum())
+    return round((total_baseline - float(emissions.sum())) / total_baseline * 100, 1) if total_baseline > 0 else 0.0
+
+
+def user_forecast(user_id, current_emissions, forecaster, months=12):
+    """
+    Forecast a user's emissions from their fitted history.
+
+    Args:
+        user_id (int): The user's id
+        current_emissions (float): Latest weekly emissions in kg CO2 (the baseline)
+        forecaster (CarbonForecaster): Supplies the month labels
+        months (int): Number of months to forecast
+
+    Returns:
+        dict: Same shape as CarbonForecaster.forecast_individual_emissions,
+              or None if the user has too little history
+    """
+    return forecast_from_state(get_series_state(user_key(user_id)), current_emissions, forecaster, months)
+
+
+def forecast_from_state(row, current_emissions, forecaster, months=12):
+    """
+    Forecast a user's emissions from their series state (see user_forecast).
+
+    Args:
+        row (ForecastState): The user's state
+        current_emissions (float): Latest weekly emissions in kg CO2 (the baseline)
+        forecaster (CarbonForecaster): Supplies the month labels
+        months (int): Number of months to forecast
+
+    Returns:
+        dict: The forecast, or None if the user has too little history
+    """
+    weekly = forecast_series(row, months)
+    if weekly is None:
+        return None
+
+    emissions = weekly * 52 / 12
+    baseline = np.full(months, (current_emissions or 0.0) * 52 / 12)
+    forecast = _forecast_rows(emissions, baseline, forecaster)
+    return {
+        'forecast': forecast,
+        'total_annual_savings': forecast[-1]['cumulative_savings'] if forecast else 0,
+        'reduction_percentage': _reduction_percentage(emissions, baseline),
+        'model': 'holt_winters'
+    }
+
+
+def company_forecast(employee_data, forecaster, months=12):
+    """
+    Forecast company emissions from the fitted company history.
+
+    The company's current emissions (every employee's latest footprint) are
+    projected along the trajectory of the company model relative to its
+    current month, per department as well.
+
+    Args:
+        employee_data (list): Dicts with 'total_footprint' and optionally 'department'
+        forecaster (CarbonForecaster): Supplies the month labels and baseline
+        months (int): Number of months to forecast
+
+    Returns:
+        dict: Same shape as CarbonForecaster.forecast_company_emissions, or
+              None if the company has too little history
+    """
+    row = get_series_state(COMPANY_KEY)
+    current = _company_history(month=_month_key(row.open_month)) if row.open_month is not None else []
+    open_values = (current[0][1], current[0][2]) if current else (0.0, 0)
+    weekly = forecast_series(row, months, open_values)
+    if weekly is None or not employee_data:
+        return None
+    ratio = weekly / weekly[0] if weekly[0] > 0 else np.ones(months)
+
+    current = np.array([emp['total_footprint'] or 0 for emp in employee_data], dtype=float)
+    groups = [emp.get('department') or 'Other' for emp in employee_data]
+    # A zero reduction rate makes the batch forecast the flat baseline
+    projection = forecaster.forecast_batch(current, months, reduction_rates=0.0, groups=groups)
+    baseline = projection['baseline'].sum(axis=0)
+    emissions = baseline * ratio
+    forecast = _forecast_rows(emissions, baseline, forecaster)
+
+    return {
+        'forecast': forecast,
+        'total_annual_savings': forecast[-1]['cumulative_savings'] if forecast else 0,
+        'reduction_percentage': _reduction_percentage(emissions, baseline),
+        'employee_count': len(employee_data),
+        'average_employee_emissions': round(float(current.mean()), 2),
+        'department_forecast': {
+            group: [round(float(value), 2) for value in projection['group_baseline'][g] * ratio]
+            for g, group in enumerate(projection['groups'])
+        },
+        'model': 'holt_winters'
+    }
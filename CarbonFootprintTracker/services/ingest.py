@@ -0,0 +1,375 @@
+"""
+Bulk Footprint Ingestion Module
+
+Imports office footprints (commute, office and travel inputs) from CSV or
+NDJSON exports. Records are parsed as a stream and handled in fixed-size
+chunks: each chunk is validated, its users are looked up in one query, its
+footprints are computed with the batch calculator and inserted with a single
+executemany INSERT, and the chunk is committed with its monthly rollups.
+Memory use depends on the chunk size, not on the file size.
+
+Invalid rows are reported with their line number and skipped; they do not
+abort the import.
+"""
+
+import csv
+import json
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy import select, insert, or_
+
+from app import db
+from models import User, CarbonFootprint
+from carbon_calculator.calculator import CarbonFootprintCalculator
+from carbon_calculator.factor_registry import CAR_TYPES, USAGE_LEVELS
+from services.queries import month_bucket, add_months
+from services.recompute import BATCH_INPUT_COLUMNS, LABEL_INPUTS
+from services.rollups import record_footprints, month_key
+from services.leaderboard import leaderboard
+from services.forecasts import mark_for_refit
+
+# Record field (same names as the carbon form) -> (type, upper bound)
+NUMERIC_FIELDS = {
+    'commute_distance': (float, None),
+    'commute_days_by_car': (int, 7),
+    'commute_days_public_transit': (int, 7),
+    'commute_days_ev': (int, 7),
+    'remote_work_days': (int, 7),
+    'video_conference_hours': (float, None),
+    'air_travel_miles': (float, None),
+    'hotel_nights': (int, None),
+    'rental_car_days': (int, None),
+    'computer_hours': (float, 24),
+    'printer_pages': (int, None)
+}
+
+FORMATS = ('csv', 'ndjson')
+
+
+class RowError(ValueError):
+    """A record that cannot be imported."""
+
+
+def iter_csv_records(stream):
+    """
+    Stream records from CSV text with a header row.
+
+    Args:
+        stream (file): Text stream
+
+    Yields:
+        tuple: (line number, dict of fields)
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def iter_ndjson_records(stream):
+    """
+    Stream records from newline-delimited JSON text.
+
+    Lines that are not JSON objects are yielded as RowError instances so the
+    caller reports them in order.
+
+    Args:
+        stream (file): Text stream
+
+    Yields:
+        tuple: (line number, dict of fields or RowError)
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, RowError("Expected a JSON object")
+            continue
+        yield line_number, record
+
+
+def iter_records(stream, file_format):
+    """
+    Stream records from a CSV or NDJSON text stream.
+
+    Args:
+        stream (file): Text stream
+        file_format (str): 'csv' or 'ndjson'
+
+    Returns:
+        iterator: (line number, record) tuples
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}', expected one of {', '.join(FORMATS)}")
+    return iter_csv_records(stream) if file_format == 'csv' else iter_ndjson_records(stream)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_record(record):
+    """
+    Validate a record and convert its fields.
+
+    Args:
+        record (dict): Raw fields; 'username' or 'email' identifies the user,
+                       'date' (YYYY-MM-DD) defaults to today and missing
+                       inputs default like the carbon form
+
+    Returns:
+        dict: Typed CarbonFootprint input values plus 'username'/'email'
+
+    Raises:
+        RowError: If a field is missing or invalid
+    """
+    username = record.get('username')
+    email = record.get('email')
+    if _blank(username) and _blank(email):
+        raise RowError("Missing username or email")
+
+    values = {
+        'username': None if _blank(username) else str(username).strip(),
+        'email': None if _blank(email) else str(email).strip()
+    }
+
+    date_value = record.get('date')
+    if _blank(date_value):
+        values['date'] = datetime.now().date()
+    else:
+        try:
+            values['date'] = datetime.strptime(str(date_value).strip(), '%Y-%m-%d').date()
+        except ValueError:
+            raise RowError(f"Invalid date '{date_value}', expected YYYY-MM-DD")
+
+    for field, (cast, upper) in NUMERIC_FIELDS.items():
+        raw = record.get(field)
+        if _blank(raw):
+            values[field] = cast(0)
+            continue
+        try:
+            value = float(raw)
+            if cast is int:
+                if not value.is_integer():
+                    raise ValueError
+                value = int(value)
+        except (TypeError, ValueError):
+            raise RowError(f"Invalid {field} '{raw}'")
+        if not np.isfinite(value) or value < 0 or (upper is not None and value > upper):
+            raise RowError(f"{field} out of range: {raw}")
+        values[field] = value
+
+    car_type = record.get('car_type')
+    values['car_type'] = None if _blank(car_type) else str(car_type).strip().lower()
+    if values['car_type'] is not None and values['car_type'] not in CAR_TYPES:
+        raise RowError(f"Invalid car_type '{car_type}'")
+
+    hvac_usage = record.get('hvac_usage')
+    values['hvac_usage'] = 'medium' if _blank(hvac_usage) else str(hvac_usage).strip().lower()
+    if values['hvac_usage'] not in USAGE_LEVELS:
+        raise RowError(f"Invalid hvac_usage '{hvac_usage}'")
+
+    return values
+
+
+class FootprintImporter:
+    """Imports streamed records chunk by chunk and collects a report."""
+
+    def __init__(self, chunk_size=1000, company=None, max_errors=1000, calculator=None):
+        """
+        Initialize the importer.
+
+        Args:
+            chunk_size (int): Records validated, inserted and committed together
+            company (str, optional): Only match users of this company; None
+                                     matches only users without a company
+            max_errors (int): Row errors kept in the report (all are counted)
+            calculator (CarbonFootprintCalculator, optional): Calculator to use
+        """
+        self.chunk_size = chunk_size
+        self.company = company
+        self.max_errors = max_errors
+        self.calculator = calculator or CarbonFootprintCalculator()
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'error': message})
+
+    def _lookup_users(self, parsed):
+        """Map the chunk's usernames and emails to users in one query."""
+        usernames = {values['username'] for _, values in parsed if values['username']}
+        emails = {values['email'] for _, values in parsed if values['email']}
+        # Always scoped: a company of None compiles to IS NULL, never to "everyone"
+        query = select(User).where(
+            or_(User.username.in_(usernames), User.email.in_(emails)),
+            User.company == self.company
+        )
+
+        by_username, by_email = {}, {}
+        for user in db.session.execute(query).scalars():
+            by_username[user.username] = user
+            by_email[user.email] = user
+        return by_username, by_email
+
+    def _months_with_data(self, user_ids, dates):
+        """(user_id, 'YYYY-MM') pairs that already have a footprint."""
+        month = month_bucket(CarbonFootprint.date)
+        first = min(dates).replace(day=1)
+        end = add_months(max(dates).replace(day=1), 1)
+        rows = db.session.execute(select(CarbonFootprint.user_id, month).where(
+            CarbonFootprint.user_id.in_(user_ids),
+            CarbonFootprint.date >= first,
+            CarbonFootprint.date < end
+        ).distinct())
+        return {tuple(row) for row in rows}
+
+    def import_chunk(self, chunk):
+        """
+        Validate, compute, insert and commit one chunk of records.
+
+        Args:
+            chunk (list): (line number, record) tuples
+        """
+        parsed = []
+        for line_number, record in chunk:
+            self.rows += 1
+            if isinstance(record, RowError):
+                self._error(line_number, str(record))
+                continue
+            try:
+                parsed.append((line_number, parse_record(record)))
+            except RowError as e:
+                self._error(line_number, str(e))
+        if not parsed:
+            return
+
+        by_username, by_email = self._lookup_users(parsed)
+        rows = []
+        for line_number, values in parsed:
+            user = by_username.get(values['username']) if values['username'] else by_email.get(values['email'])
+            if user is None:
+                self._error(line_number, f"Unknown user '{values['username'] or values['email']}'")
+                continue
+            rows.append((line_number, user, values))
+        if not rows:
+            return
+
+        columns = {}
+        for name, column in BATCH_INPUT_COLUMNS.items():
+            data = [values[column.key] for _, _, values in rows]
+            columns[name] = data if name in LABEL_INPUTS else np.array(data, dtype=float)
+        results = self.calculator.calculate_batch_footprints(columns)
+
+        now = datetime.utcnow()
+        footprints = []
+        for i, (_, user, values) in enumerate(rows):
+            footprint = {field: values[field] for field in NUMERIC_FIELDS}
+            footprint.update(
+                user_id=user.id,
+                date=values['date'],
+                car_type=values['car_type'],
+                hvac_usage=values['hvac_usage'],
+                has_transaction_data=False,
+                transaction_footprint=0.0,
+                commute_footprint=float(results['commute_footprint'][i]),
+                office_footprint=float(results['office_footprint'][i]),
+                travel_footprint=float(results['travel_footprint'][i]),
+                total_footprint=float(results['total_footprint'][i]),
+                footprint_score=int(results['footprint_score'][i]),
+                factor_version=self.calculator.factor_version,
+                diet_type='mixed',
+                local_food_percentage=50,
+                created_at=now,
+                last_updated=now
+            )
+            footprints.append(footprint)
+
+        try:
+            # Months already covered before this chunk decide the rollups' employee counts
+            seen = self._months_with_data({user.id for _, user, _ in rows}, [values['date'] for _, _, values in rows])
+            entries = []
+            for (_, user, _), footprint in zip(rows, footprints):
+                key = (user.id, month_key(footprint['date']))
+                entries.append((SimpleNamespace(**footprint), user, key not in seen))
+                seen.add(key)
+
+            db.session.execute(insert(CarbonFootprint), footprints)
+            record_footprints(entries)
+            # Imported months may predate the forecast states' open months
+            mark_for_refit({user.id for _, user, _ in rows})
+            db.session.commit()
+            self.inserted += len(footprints)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error importing footprint chunk: {str(e)}")
+            # Lines already reported (unknown users) keep their own error
+            for line_number, _, _ in rows:
+                self._error(line_number, "Chunk failed to insert")
+
+    def run(self, records):
+        """
+        Import every record of a stream.
+
+        Args:
+            records (iterable): (line number, record) tuples, e.g. from iter_records
+
+        Returns:
+            dict: Import report (see report)
+        """
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        if self.inserted:
+            # Imported scores may enter this process's top-K heaps
+            leaderboard.clear()
+        return self.report()
+
+    def report(self):
+        """
+        Summarize the import.
+
+        Returns:
+            dict: rows read, rows inserted, error_count and the first errors
+        """
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
+
+
+def import_footprints(stream, file_format='csv', chunk_size=1000, company=None, max_errors=1000):
+    """
+    Import footprints from a CSV or NDJSON text stream.
+
+    Args:
+        stream (file): Text stream
+        file_format (str): 'csv' or 'ndjson'
+        chunk_size (int): Records per committed chunk
+        company (str, optional): Only match users of this company; None
+                                 matches only users without a company
+        max_errors (int): Row errors kept in the report
+
+    Returns:
+        dict: Import report with rows, inserted, error_count and errors
+    """
+    importer = FootprintImporter(chunk_size=chunk_size, company=company, max_errors=max_errors)
+    return importer.run(iter_records(stream, file_format))
@@ -0,0 +1,120 @@
+"""
+SQL Instrumentation Module
+
+Counts the queries, database time and rows of every request. The totals are
+sent back in a Server-Timing header and aggregated per endpoint in process.
+
+Rows are taken from cursor.rowcount, which sqlite3 leaves at -1 for SELECTs.
+On SQLite the row count is therefore reported as unavailable (None) rather
+than as 0.
+
+Instrumentation is opt-in (SQL_INSTRUMENTATION=true). When it is disabled no
+engine listeners or request hooks are installed, so it costs nothing.
+"""
+
+import logging
+import threading
+import time
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+
+class SQLInstrumentation:
+    """Per-request and per-endpoint SQL statistics for a Flask app."""
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self._lock = threading.Lock()
+        self._endpoints = {}  # endpoint -> [requests, queries, seconds, rows, max_queries]
+        self.counts_rows = True
+
+    def init_app(self, app, engine):
+        """
+        Hook the engine's cursor events and the app's request cycle.
+
+        Args:
+            app (Flask): The application
+            engine (Engine): Engine whose queries are measured
+        """
+        # sqlite3 does not report rows for SELECTs
+        self.counts_rows = engine.dialect.name != 'sqlite'
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['sql_instrumentation'] = self
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._sql_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Queries outside a request (CLI commands, app startup) are not counted
+        if not has_app_context():
+            return
+        stats = g.get('_sql_stats')
+        if stats is None or context is None:
+            return
+        stats[0] += 1
+        stats[1] += time.perf_counter() - getattr(context, '_sql_started', time.perf_counter())
+        if self.counts_rows and cursor.rowcount > 0:
+            stats[2] += cursor.rowcount
+
+    def _start_request(self):
+        g._sql_stats = [0, 0.0, 0]
+
+    def _finish_request(self, response):
+        stats = g.pop('_sql_stats', None)
+        if stats is None:
+            return response
+        queries, seconds, rows = stats
+        rows_text = f'{rows} rows' if self.counts_rows else 'rows n/a'
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={seconds * 1000:.2f};desc="{queries} queries, {rows_text}"'
+        )
+
+        endpoint = request.endpoint or '<unmatched>'
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, [0, 0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += queries
+            totals[2] += seconds
+            totals[3] += rows
+            totals[4] = max(totals[4], queries)
+
+        logging.debug(f"SQL {endpoint}: {queries} queries, {seconds * 1000:.1f} ms, {rows_text}")
+        return response
+
+    def endpoint_stats(self):
+        """
+        Get the aggregated statistics of every endpoint seen so far.
+
+        Returns:
+            list: Dicts with totals and per-request averages, most queries
+                  first (rows is None when the driver does not report them)
+        """
+        with self._lock:
+            snapshot = {endpoint: list(totals) for endpoint, totals in self._endpoints.items()}
+
+        stats = []
+        for endpoint, (requests, queries, seconds, rows, max_queries) in snapshot.items():
+            stats.append({
+                'endpoint': endpoint,
+                'requests': requests,
+                'queries': queries,
+                'db_time_ms': round(seconds * 1000, 2),
+                'rows': rows if self.counts_rows else None,
+                'avg_queries': round(queries / requests, 2),
+                'avg_db_time_ms': round(seconds * 1000 / requests, 2),
+                'max_queries': max_queries
+            })
+        stats.sort(key=lambda item: item['queries'], reverse=True)
+        return stats
+
+    def reset(self):
+        """Clear the aggregated statistics."""
+        with self._lock:
+            self._endpoints.clear()
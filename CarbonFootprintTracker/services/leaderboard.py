@@ -0,0 +1,218 @@
+"""
+Leaderboard Module
+
+Keeps the top-K users by latest footprint score in memory, one min-heap per
+scope: a company, or one department of a company. Users only ever see
+boards of their own company. A heap is loaded from the rank table the first
+time it is read, then updated in place as footprints are saved. Each heap
+expires after a TTL, because saves handled by other worker processes do not
+reach it.
+
+Paged windows (the leaderboard API, including its first page) are read from
+the rank table by row position in (score, user id) order, so every page
+holds at most its size even when many users share a score, and all pages
+come from the same refresh.
+"""
+
+import heapq
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import select, func, or_, and_
+
+from app import db
+from models import User, FootprintRanking
+from services.rankings import ensure_rankings, DEFAULT_MAX_AGE
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', ['rank', 'user_id', 'username', 'footprint_score', 'total_footprint'])
+
+
+class _ScopeBoard:
+    """Top-K heap of one scope; the heap root is the weakest entry."""
+
+    def __init__(self, rows, size):
+        self.members = {}  # user_id -> (username, footprint_score, total_footprint)
+        self.heap = []  # (footprint_score, -user_id)
+        for user_id, username, score, total in rows:
+            self.members[user_id] = (username, score, total)
+            self.heap.append((score, -user_id))
+        heapq.heapify(self.heap)
+        # Fewer rows than K means every ranked user of the scope is here
+        self.complete = len(rows) < size
+        self.loaded_at = time.monotonic()
+
+    def update(self, user_id, username, score, total, size):
+        """
+        Apply a user's new latest score.
+
+        Returns:
+            bool: False if the heap can no longer be kept exact and must be reloaded
+        """
+        key = (score, -user_id)
+        if user_id in self.members:
+            old_key = (self.members[user_id][1], -user_id)
+            if key < old_key and not self.complete:
+                # A user outside the heap may now outrank this one
+                return False
+            self.members[user_id] = (username, score, total)
+            self.heap.remove(old_key)
+            self.heap.append(key)
+            heapq.heapify(self.heap)
+        elif len(self.heap) < size:
+            if self.complete:
+                self.members[user_id] = (username, score, total)
+                heapq.heappush(self.heap, key)
+        else:
+            if key > self.heap[0]:
+                _, weakest_id = heapq.heapreplace(self.heap, key)
+                del self.members[-weakest_id]
+                self.members[user_id] = (username, score, total)
+            # Either way one ranked user of the scope is now outside the heap
+            self.complete = False
+        return True
+
+    def top(self, limit):
+        """Entries of the best `limit` users, ranked with ties sharing a rank."""
+        entries = []
+        for position, (score, negative_id) in enumerate(sorted(self.heap, reverse=True)[:limit], 1):
+            rank = entries[-1].rank if entries and entries[-1].footprint_score == score else position
+            username, _, total = self.members[-negative_id]
+            entries.append(LeaderboardEntry(rank, -negative_id, username, score, total))
+        return entries
+
+
+def _scope(company, department=None):
+    """Board key of a company (department None) or one of its departments."""
+    return (company or '', department or None)
+
+
+class Leaderboard:
+    """Per-process top-K leaderboards for each company and each of its departments."""
+
+    def __init__(self, size=50, ttl=DEFAULT_MAX_AGE.total_seconds()):
+        """
+        Initialize the leaderboard.
+
+        Args:
+            size (int): Users kept per scope (K)
+            ttl (float): Seconds before a scope is reloaded from the rank table
+        """
+        self.size = size
+        self.ttl = ttl
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def _load(self, scope):
+        """Read the top K rows of a scope from the rank table."""
+        ensure_rankings()
+        query = select(
+            FootprintRanking.user_id, User.username,
+            FootprintRanking.footprint_score, FootprintRanking.total_footprint
+        ).join(User, User.id == FootprintRanking.user_id)
+        query = _in_scope(query, *scope).order_by(FootprintRanking.footprint_score.desc(), FootprintRanking.user_id)
+        return _ScopeBoard([tuple(row) for row in db.session.execute(query.limit(self.size))], self.size)
+
+    def top(self, company, department=None, limit=5):
+        """
+        Get the best ranked users of a scope.
+
+        Args:
+            company (str): The company (None for users without one)
+            department (str, optional): Department scope; the whole company if omitted
+            limit (int): Number of entries, at most the heap size
+
+        Returns:
+            list: LeaderboardEntry tuples, best first
+        """
+        scope = _scope(company, department)
+        with self._lock:
+            board = self._boards.get(scope)
+        if board is None or time.monotonic() - board.loaded_at > self.ttl:
+            # Load outside the lock so other scopes are not held up by the query
+            board = self._load(scope)
+            with self._lock:
+                self._boards[scope] = board
+        with self._lock:
+            return board.top(min(limit, self.size))
+
+    def record(self, user, footprint):
+        """
+        Apply a newly saved footprint as its user's latest score.
+
+        Args:
+            user (User): Owner of the footprint
+            footprint (CarbonFootprint): The committed footprint
+        """
+        score = footprint.footprint_score or 0
+        total = footprint.total_footprint or 0.0
+        scopes = [_scope(user.company)] + ([_scope(user.company, user.department)] if user.department else [])
+        with self._lock:
+            for scope in scopes:
+                board = self._boards.get(scope)
+                if board is not None and not board.update(user.id, user.username, score, total, self.size):
+                    del self._boards[scope]
+
+    def clear(self):
+        """Drop every loaded scope."""
+        with self._lock:
+            self._boards.clear()
+
+
+def _in_scope(query, company, department=None):
+    """Limit a FootprintRanking query to a company, or one of its departments."""
+    query = query.where(FootprintRanking.company == (company or ''))
+    if department:
+        query = query.where(FootprintRanking.department == department)
+    return query
+
+
+def users_ahead(ranking, department=None):
+    """
+    Count the users placed before a ranked user on a board.
+
+    Users are placed by score, best first, then by user id.
+
+    Args:
+        ranking (FootprintRanking): The user's ranking
+        department (str, optional): Department scope; the whole company if omitted
+
+    Returns:
+        int: The user's 0-based position
+    """
+    ahead = or_(
+        FootprintRanking.footprint_score > ranking.footprint_score,
+        and_(FootprintRanking.footprint_score == ranking.footprint_score, FootprintRanking.user_id < ranking.user_id)
+    )
+    query = _in_scope(select(func.count()).select_from(FootprintRanking), ranking.company, department)
+    return db.session.execute(query.where(ahead)).scalar()
+
+
+def rank_window(company, department=None, offset=0, limit=10):
+    """
+    Read a page of a board from the rank table.
+
+    Pages are cut by position (score, then user id), so a page holds at
+    most `limit` users however many share a rank.
+
+    Args:
+        company (str): The company (None for users without one)
+        department (str, optional): Department scope; the whole company if omitted
+        offset (int): Users skipped from the top
+        limit (int): Users returned
+
+    Returns:
+        list: LeaderboardEntry tuples, best first
+    """
+    rank = FootprintRanking.rank_in_department if department else FootprintRanking.rank_in_company
+    query = select(
+        rank, FootprintRanking.user_id, User.username,
+        FootprintRanking.footprint_score, FootprintRanking.total_footprint
+    ).join(User, User.id == FootprintRanking.user_id)
+    query = _in_scope(query, company, department).order_by(
+        FootprintRanking.footprint_score.desc(), FootprintRanking.user_id
+    ).offset(offset).limit(limit)
+    return [LeaderboardEntry(*row) for row in db.session.execute(query)]
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,260 @@
+"""
+Password Hashing Module
+
+Runs password hashing and verification on a bounded pool of worker
+threads. The hash functions release the GIL, so up to PASSWORD_HASH_WORKERS
+hashes run in parallel while request threads wait. At most
+PASSWORD_HASH_QUEUE more may wait for a worker; beyond that, requests are
+turned away at once with HasherBusy (backpressure) instead of piling up.
+A login storm then cannot tie up every web worker.
+
+Hashes made with a different method or cost than PASSWORD_HASH_METHOD are
+replaced on the next successful login. Hash latencies (queue wait included)
+are kept in histograms.
+"""
+
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+    HAS_WERKZEUG = True
+except ImportError:
+    HAS_WERKZEUG = False
+    # Fallback implementations if werkzeug not available
+    import hashlib
+    import secrets
+
+    def generate_password_hash(password):
+        """Simple password hashing for fallback."""
+        salt = secrets.token_hex(8)
+        pwdhash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
+        return f"{salt}${pwdhash.hex()}"
+
+    def check_password_hash(pwhash, password):
+        """Simple password checking for fallback."""
+        if not pwhash or '$' not in pwhash:
+            return False
+        salt, stored_hash = pwhash.split('$', 1)
+        calculated_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
+        return secrets.compare_digest(calculated_hash, stored_hash)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def method_prefix(method=None):
+    """
+    Spell a werkzeug hash method the way werkzeug stores it, with its defaults filled in.
+
+    Args:
+        method (str, optional): Method as configured, e.g. 'scrypt' or
+                                'pbkdf2:sha256'; None for werkzeug's default
+
+    Returns:
+        str: The stored prefix, e.g. 'scrypt:32768:8:1'
+
+    Raises:
+        ValueError: If the method is not one werkzeug supports
+    """
+    if method is None:
+        method = inspect.signature(generate_password_hash).parameters['method'].default
+    name, *args = method.split(':')
+    if name == 'scrypt' and len(args) in (0, 3):
+        n, r, p = map(int, args) if args else (2**15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2' and len(args) <= 2:
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Invalid PASSWORD_HASH_METHOD '{method}'")
+
+
+class HasherBusy(RuntimeError):
+    """The hashing pool is saturated; the caller should retry later."""
+
+
+class LatencyHistogram:
+    """Thread-safe cumulative latency histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets (tuple): Ascending bucket upper bounds in seconds
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is unbounded
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def _quantile(self, counts, count, q):
+        """Upper bound of the bucket holding the q-quantile (None if empty or unbounded)."""
+        if not count:
+            return None
+        target = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        """
+        Read the histogram.
+
+        Returns:
+            dict: count, mean_ms, p50_ms and p95_ms (bucket upper bounds) and
+                  buckets (cumulative counts by upper bound in ms, None = unbounded)
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            total = self.total
+
+        cumulative = 0
+        buckets = []
+        for bound, bucket_count in zip([*self.buckets, None], counts):
+            cumulative += bucket_count
+            buckets.append({'le_ms': None if bound is None else bound * 1000, 'count': cumulative})
+        p50 = self._quantile(counts, count, 0.5)
+        p95 = self._quantile(counts, count, 0.95)
+        return {
+            'count': count,
+            'mean_ms': round(total / count * 1000, 2) if count else None,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p95_ms': None if p95 is None else p95 * 1000,
+            'buckets': buckets
+        }
+
+
+class PasswordHasher:
+    """Bounded worker pool for password hashing, with latency metrics."""
+
+    def __init__(self):
+        """Initialize an unconfigured hasher that hashes inline (see init_app)."""
+        self.method = None
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = None
+        self._method_prefix = None
+        self.latency = {'hash': LatencyHistogram(), 'verify': LatencyHistogram()}
+        self.rejected = 0
+        self.rehashed = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Start the worker pool.
+
+        Args:
+            app (Flask): The application (PASSWORD_HASH_METHOD,
+                         PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE and
+                         PASSWORD_HASH_TIMEOUT config)
+        """
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or None
+        if HAS_WERKZEUG:
+            self._method_prefix = method_prefix(self.method)
+        elif self.method:
+            logging.warning('PASSWORD_HASH_METHOD is ignored without werkzeug')
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10.0)
+        workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        queue = app.config.get('PASSWORD_HASH_QUEUE', 32)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def _run(self, operation, function, *args):
+        """Run a hash function on the pool (inline without one) and time it."""
+        started = time.perf_counter()
+        if self._executor is None:
+            result = function(*args)
+        else:
+            if not self._slots.acquire(blocking=False):
+                with self._lock:
+                    self.rejected += 1
+                raise HasherBusy('Password hashing is at capacity')
+            try:
+                future = self._executor.submit(function, *args)
+            except Exception:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self.rejected += 1
+                raise HasherBusy('Password hashing timed out')
+        self.latency[operation].observe(time.perf_counter() - started)
+        return result
+
+    def _generate(self, password):
+        if self.method and HAS_WERKZEUG:
+            return generate_password_hash(password, method=self.method)
+        return generate_password_hash(password)
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method.
+
+        Raises:
+            HasherBusy: If the pool and its queue are full, or the hash times out
+        """
+        return self._run('hash', self._generate, password)
+
+    def verify(self, pwhash, password):
+        """
+        Check a password against a stored hash.
+
+        Raises:
+            HasherBusy: If the pool and its queue are full, or the check times out
+        """
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        Whether a stored hash was made with another method or cost than configured.
+
+        Only werkzeug hashes ("method$salt$hash") can be compared; others
+        never need a rehash.
+        """
+        if not HAS_WERKZEUG or not pwhash or pwhash.count('$') != 2:
+            return False
+        if self._method_prefix is None:
+            self._method_prefix = method_prefix(self.method)
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def record_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self):
+        """
+        Read the hashing metrics.
+
+        Returns:
+            dict: method, rejected and rehashed counts and a latency
+                  histogram per operation (hash, verify)
+        """
+        return {
+            'method': self.method or 'default',
+            'rejected': self.rejected,
+            'rehashed': self.rehashed,
+            'latency': {operation: histogram.snapshot() for operation, histogram in self.latency.items()}
+        }
+
+
+password_hasher = PasswordHasher()
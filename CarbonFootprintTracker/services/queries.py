@@ -0,0 +1,79 @@
+"""
+Shared Query Module
+
+Reusable, dialect-aware query building blocks for analytics over
+CarbonFootprint.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+
+from app import db
+from models import CarbonFootprint
+
+try:
+    from sqlalchemy.dialects.postgresql import distinct_on
+except ImportError:
+    # SQLAlchemy < 2.1 spells DISTINCT ON as select().distinct(*columns)
+    distinct_on = None
+
+
+def latest_footprints():
+    """
+    Build an entity over each user's latest footprint (newest date, then id).
+
+    PostgreSQL uses DISTINCT ON (user_id); other databases (SQLite) rank rows
+    with a ROW_NUMBER() window per user and keep the first.
+
+    Returns:
+        AliasedClass: CarbonFootprint alias usable like the model in queries,
+                      e.g. db.session.query(latest.user_id, latest.total_footprint)
+    """
+    newest_first = (CarbonFootprint.date.desc(), CarbonFootprint.id.desc())
+
+    if db.engine.dialect.name == 'postgresql':
+        query = select(CarbonFootprint)
+        if distinct_on is not None:
+            query = query.ext(distinct_on(CarbonFootprint.user_id))
+        else:
+            query = query.distinct(CarbonFootprint.user_id)
+        subquery = query.order_by(CarbonFootprint.user_id, *newest_first).subquery('latest_footprint')
+    else:
+        row_number = func.row_number().over(
+            partition_by=CarbonFootprint.user_id,
+            order_by=newest_first
+        ).label('row_number')
+        ranked = select(CarbonFootprint, row_number).subquery('ranked_footprint')
+        subquery = select(ranked).where(ranked.c.row_number == 1).subquery('latest_footprint')
+
+    return aliased(CarbonFootprint, subquery, name='latest_footprint')
+
+
+def month_bucket(column):
+    """
+    Truncate a date column to its month as a 'YYYY-MM' string.
+
+    Args:
+        column (ColumnElement): Date or datetime column
+
+    Returns:
+        ColumnElement: 'YYYY-MM' expression, identical on PostgreSQL and SQLite
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def add_months(month_start, count):
+    """
+    Shift the first day of a month by a number of months.
+
+    Args:
+        month_start (date): First day of a month
+        count (int): Months to add (negative to go back)
+
+    Returns:
+        date: First day of the shifted month
+    """
+    month_index = month_start.year * 12 + month_start.month - 1 + count
+    return month_start.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
@@ -0,0 +1,185 @@
+"""
+Query Plan Audit Module
+
+Replays the blueprints' GET routes as an employee and an executive, captures
+every SELECT they send to the database and runs EXPLAIN on each one. Plans
+that read a large table with a sequential scan are reported as violations.
+
+Only GET routes are replayed, and routes with URL parameters only with
+every parameter set to 1, so queries behind forms, other ids or empty
+results are not covered.
+
+The routes run for real (some create default rows, e.g. training modules),
+so point the audit at a staging copy of the database.
+"""
+
+import json
+import logging
+import re
+
+from flask import g, url_for
+from sqlalchemy import event, func, select
+
+from app import db
+from models import User
+
+AUDITED_BLUEPRINTS = ('auth', 'employee', 'company')
+SKIPPED_ENDPOINTS = ('auth.logout',)  # Would end the replay session
+
+
+class QueryCapture:
+    """Collects distinct SELECT statements issued on an engine while active."""
+
+    def __init__(self, engine):
+        """
+        Initialize the capture.
+
+        Args:
+            engine (Engine): Engine to listen on
+        """
+        self.engine = engine
+        self.statements = {}  # statement -> (parameters, endpoint)
+        self.endpoint = None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        self.statements.setdefault(statement, (parameters, self.endpoint))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+
+def _audited_urls(app):
+    """List (endpoint, url) pairs for the GET routes of the audited blueprints."""
+    urls = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint.split('.')[0] not in AUDITED_BLUEPRINTS:
+            continue
+        if rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        # Parameterized routes are exercised with id 1
+        values = {arg: 1 for arg in rule.arguments}
+        with app.test_request_context():
+            urls.append((rule.endpoint, url_for(rule.endpoint, **values)))
+    return urls
+
+
+def capture_route_queries(app, users):
+    """
+    Request every audited GET route as each user and capture the SELECTs.
+
+    Args:
+        app (Flask): The application
+        users (list): Users to log in as (typically one employee, one executive)
+
+    Returns:
+        dict: {statement: (parameters, endpoint)}
+    """
+    urls = _audited_urls(app)
+    with QueryCapture(db.engine) as capture:
+        for user in users:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user.id)
+                session['_fresh'] = True
+            for endpoint, url in urls:
+                capture.endpoint = endpoint
+                # Requests reuse the caller's app context; drop Flask-Login's cached user
+                g.pop('_login_user', None)
+                try:
+                    response = client.get(url)
+                    logging.debug(f"Audit {user.username} {url}: {response.status_code}")
+                except Exception as e:
+                    # Queries issued before the failure were still captured
+                    logging.error(f"Audit request {url} failed: {str(e)}")
+    return capture.statements
+
+
+TABLE_ALIAS = re.compile(r'"?(\w+)"?\s+AS\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def _table_aliases(statement):
+    """Map the aliases of tables in a statement (e.g. "carbon_footprint AS f") to the table names."""
+    return {
+        alias: table for table, alias in TABLE_ALIAS.findall(statement)
+        if table in db.metadata.tables
+    }
+
+
+def _sqlite_seq_scans(connection, statement, parameters):
+    """Tables read by a full scan without an index in a SQLite plan."""
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    aliases = _table_aliases(statement)
+    tables = []
+    for row in plan:
+        detail = row[-1].replace('SCAN TABLE ', 'SCAN ')  # Older SQLite wording
+        if detail.startswith('SCAN ') and 'USING' not in detail:
+            # Recent SQLite prints only the alias of an aliased table ("SCAN f")
+            name = detail.split()[1]
+            tables.append(aliases.get(name, name))
+    return tables
+
+
+def _postgres_seq_scans(connection, statement, parameters):
+    """Tables read by a Seq Scan node in a PostgreSQL plan."""
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    tables = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            tables.append(node.get('Relation Name'))
+        nodes.extend(node.get('Plans', []))
+    return tables
+
+
+def audit_query_plans(app, min_rows=1000, users=None):
+    """
+    Explain every query the blueprints issue and flag sequential scans.
+
+    Args:
+        app (Flask): The application
+        min_rows (int): Tables with at least this many rows count as large
+        users (list, optional): Users to replay routes as; defaults to the
+                                first employee and the first executive
+
+    Returns:
+        dict: 'queries' (number explained) and 'violations', a list of
+              {endpoint, table, rows, statement} dicts
+    """
+    if users is None:
+        users = [u for u in (
+            User.query.filter_by(role='employee').order_by(User.id).first(),
+            User.query.filter_by(role='executive').order_by(User.id).first()
+        ) if u is not None]
+    statements = capture_route_queries(app, users)
+
+    dialect = db.engine.dialect.name
+    explain = _postgres_seq_scans if dialect == 'postgresql' else _sqlite_seq_scans
+    row_counts = {}
+    violations = []
+
+    with db.engine.connect() as connection:
+        for statement, (parameters, endpoint) in statements.items():
+            for table in explain(connection, statement, parameters):
+                if table not in row_counts:
+                    table_obj = db.metadata.tables.get(table)
+                    row_counts[table] = connection.execute(
+                        select(func.count()).select_from(table_obj)
+                    ).scalar() if table_obj is not None else 0
+                if row_counts[table] >= min_rows:
+                    violations.append({
+                        'endpoint': endpoint,
+                        'table': table,
+                        'rows': row_counts[table],
+                        'statement': statement
+                    })
+
+    return {'queries': len(statements), 'violations': violations}
@@ -0,0 +1,216 @@
+"""
+Quiz History Module
+
+Tracks which questions each user has answered and how, so quizzes can
+favor unseen questions and questions due for review (spaced repetition).
+A user's history is one QuizHistory row holding two packed arrays indexed
+by question id: a bitset of whether the last answer was correct, and a
+uint16 array of the quiz number in which the question was last answered.
+The question bank keeps ids at most MAX_QUESTION_ID, which bounds a row
+to about 9 KB.
+
+Per-question difficulty statistics are kept in QuizQuestionStat and updated
+incrementally with every submission. The shared question bank is `quiz`.
+"""
+
+from array import array
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import QuizHistory, QuizQuestionStat
+from ai_helpers.quiz import SustainabilityQuiz
+
+# Quizzes after which a question is fully due again, by last answer
+REVIEW_INTERVAL = {False: 1, True: 4}
+MIN_WEIGHT = 0.05  # Selection weight of a question just answered correctly
+MAX_QUIZ_NUMBER = 0xFFFF  # last_seen is stored as uint16
+
+# Observed correct rate -> difficulty label, once a question has MIN_ATTEMPTS
+DIFFICULTY_THRESHOLDS = ((0.75, 'easy'), (0.45, 'medium'), (0.0, 'hard'))
+MIN_ATTEMPTS = 20
+
+
+class QuestionHistory:
+    """A user's unpacked question history."""
+
+    def __init__(self, row=None):
+        """
+        Unpack a history row.
+
+        Args:
+            row (QuizHistory, optional): The stored history; empty if omitted
+        """
+        self.quiz_count = (row.quiz_count or 0) if row is not None else 0
+        self.correct = bytearray(row.correct or b'') if row is not None else bytearray()
+        self.last_seen = array('H')
+        if row is not None and row.last_seen:
+            self.last_seen.frombytes(row.last_seen)
+
+    def _grow(self, question_id):
+        if question_id >= len(self.last_seen):
+            self.last_seen.extend([0] * (question_id + 1 - len(self.last_seen)))
+        if question_id >> 3 >= len(self.correct):
+            self.correct.extend(bytes((question_id >> 3) + 1 - len(self.correct)))
+
+    def was_correct(self, question_id):
+        """Whether the user's last answer to a question was correct."""
+        byte = question_id >> 3
+        return byte < len(self.correct) and bool(self.correct[byte] >> (question_id & 7) & 1)
+
+    def quizzes_since(self, question_id):
+        """Quizzes submitted since a question was last answered, or None if never."""
+        last = self.last_seen[question_id] if question_id < len(self.last_seen) else 0
+        return None if last == 0 else self.quiz_count - last + 1
+
+    def weight(self, question_id):
+        """
+        Selection weight of a question for the next quiz.
+
+        Unseen questions weigh 1. Answered ones start low and grow with the
+        quizzes taken since, reaching 1 after REVIEW_INTERVAL quizzes (sooner
+        after a wrong answer).
+        """
+        since = self.quizzes_since(question_id)
+        if since is None:
+            return 1.0
+        interval = REVIEW_INTERVAL[self.was_correct(question_id)]
+        return min(1.0, MIN_WEIGHT + (since - 1) / interval)
+
+    def record(self, answers):
+        """
+        Apply a submitted quiz.
+
+        Args:
+            answers (list): (question_id, correct) tuples; unanswered questions count as wrong
+        """
+        self.quiz_count = min(self.quiz_count + 1, MAX_QUIZ_NUMBER)
+        for question_id, correct in answers:
+            self._grow(question_id)
+            self.last_seen[question_id] = self.quiz_count
+            if correct:
+                self.correct[question_id >> 3] |= 1 << (question_id & 7)
+            else:
+                self.correct[question_id >> 3] &= ~(1 << (question_id & 7)) & 0xFF
+
+    def store(self, row):
+        """Pack the history into a row."""
+        row.quiz_count = self.quiz_count
+        row.correct = bytes(self.correct)
+        row.last_seen = self.last_seen.tobytes()
+        row.updated_at = datetime.utcnow()
+
+
+def load_history(user_id):
+    """
+    Read a user's question history.
+
+    Args:
+        user_id (int): The user's id
+
+    Returns:
+        QuestionHistory: The history (empty for a first quiz)
+    """
+    return QuestionHistory(db.session.get(QuizHistory, user_id))
+
+
+def _update_question_stats(answers):
+    """Add one attempt per answered question, inserting missing stat rows."""
+    table = QuizQuestionStat.__table__
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    now = datetime.utcnow()
+    statement = dialect.insert(table).values([
+        {'question_id': question_id, 'attempts': 1, 'correct_count': int(correct), 'updated_at': now}
+        for question_id, correct in answers
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=['question_id'],
+        set_={
+            'attempts': table.c.attempts + statement.excluded.attempts,
+            'correct_count': table.c.correct_count + statement.excluded.correct_count,
+            'updated_at': statement.excluded.updated_at
+        }
+    )
+    db.session.execute(statement)
+
+
+def lock_history(user_id):
+    """
+    Lock a user's history row for the current transaction, creating it if missing.
+
+    Quiz submissions of one user hold this lock, so they run one at a time.
+
+    Args:
+        user_id (int): The user's id
+
+    Returns:
+        QuizHistory: The locked row
+    """
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    db.session.execute(
+        dialect.insert(QuizHistory.__table__).values(user_id=user_id, quiz_count=0).on_conflict_do_nothing()
+    )
+    return db.session.execute(
+        select(QuizHistory).where(QuizHistory.user_id == user_id).with_for_update()
+    ).scalar_one()
+
+
+def record_quiz(user_id, answers):
+    """
+    Record a submitted quiz in the user's history and the question statistics.
+
+    Call before committing the quiz score.
+
+    Args:
+        user_id (int): The user's id
+        answers (list): (question_id, correct) tuples, one per question shown
+    """
+    if not answers:
+        return
+    # Duplicate ids would conflict twice within one upsert
+    answers = list(dict(answers).items())
+
+    row = lock_history(user_id)
+    history = QuestionHistory(row)
+    history.record(answers)
+    history.store(row)
+
+    _update_question_stats(answers)
+
+
+def _difficulty(correct_rate):
+    for threshold, label in DIFFICULTY_THRESHOLDS:
+        if correct_rate >= threshold:
+            return label
+
+
+def question_stats(question_ids=None):
+    """
+    Get per-question difficulty statistics from all submissions.
+
+    Args:
+        question_ids (iterable, optional): Only these questions; all if omitted
+
+    Returns:
+        dict: question_id -> attempts, correct_count, correct_rate and
+              observed_difficulty (None below MIN_ATTEMPTS)
+    """
+    query = select(QuizQuestionStat).order_by(QuizQuestionStat.question_id)
+    if question_ids is not None:
+        query = query.where(QuizQuestionStat.question_id.in_(list(question_ids)))
+
+    stats = {}
+    for stat in db.session.execute(query).scalars():
+        correct_rate = stat.correct_count / stat.attempts if stat.attempts else 0.0
+        stats[stat.question_id] = {
+            'attempts': stat.attempts,
+            'correct_count': stat.correct_count,
+            'correct_rate': round(correct_rate, 3),
+            'observed_difficulty': _difficulty(correct_rate) if stat.attempts >= MIN_ATTEMPTS else None
+        }
+    return stats
+
+
+quiz = SustainabilityQuiz()
@@ -0,0 +1,89 @@
+"""
+Quiz Token Module
+
+Issues and verifies the signed tokens that carry a quiz from the question
+page to its submission. A token holds only the taker's user id, the id of
+their latest quiz score and the question ids in display order, signed with
+the application's secret key and stamped with its issue time. The page
+posts it back in a hidden field, and questions, answers and explanations
+are looked up in the question bank by id, so nothing about the quiz is
+kept in the session cookie.
+
+A token is accepted once: submitting stores a newer quiz score, after which
+the token's score id is no longer the latest. The check runs with the
+user's quiz history row locked, so concurrent submissions of one token
+cannot both pass it.
+"""
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from sqlalchemy import select, func
+
+from app import db
+from models import QuizScore
+from services.quiz_history import lock_history
+
+SALT = 'sustainability-quiz'
+MAX_AGE = 2 * 60 * 60  # Seconds a quiz may stay open
+
+
+class QuizTokenError(ValueError):
+    """A quiz token that cannot be accepted."""
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt=SALT)
+
+
+def _latest_score_id(user_id):
+    latest = db.session.execute(select(func.max(QuizScore.id)).where(QuizScore.user_id == user_id)).scalar()
+    return latest or 0
+
+
+def issue_quiz_token(user_id, questions):
+    """
+    Issue a token for a quiz shown to a user.
+
+    Args:
+        user_id (int): The quiz taker's id
+        questions (list): The questions in display order
+
+    Returns:
+        str: The signed token
+    """
+    return _serializer().dumps([user_id, _latest_score_id(user_id), [q['id'] for q in questions]])
+
+
+def load_quiz_token(token, user_id, max_age=MAX_AGE):
+    """
+    Verify a submitted token and read its question ids.
+
+    Locks the user's quiz history row; commit or roll back afterwards.
+
+    Args:
+        token (str): The token posted with the answers
+        user_id (int): The submitting user's id
+        max_age (int): Seconds after issue the token stays valid
+
+    Returns:
+        list: Question ids in display order
+
+    Raises:
+        QuizTokenError: If the token is missing, invalid, expired, issued to
+                        another user or already used
+    """
+    if not token:
+        raise QuizTokenError('Quiz session expired. Please start a new quiz.')
+    try:
+        token_user_id, score_id, question_ids = _serializer().loads(token, max_age=max_age)
+    except SignatureExpired:
+        raise QuizTokenError('Quiz session expired. Please start a new quiz.')
+    except (BadSignature, TypeError, ValueError):
+        raise QuizTokenError('Quiz data not found. Please start a new quiz.')
+    if token_user_id != user_id:
+        raise QuizTokenError('Quiz data not found. Please start a new quiz.')
+    # Held until the submission commits; a concurrent one then sees its score
+    lock_history(user_id)
+    if _latest_score_id(user_id) != score_id:
+        raise QuizTokenError('This quiz has already been submitted. Please start a new quiz.')
+    return question_ids
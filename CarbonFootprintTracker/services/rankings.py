@@ -0,0 +1,223 @@
+"""
+Footprint Ranking Module
+
+Maintains FootprintRanking, a periodically refreshed table with every user's
+latest footprint score, rank and percentile inputs, so peer comparisons are a
+primary key read instead of counts over all stored footprints. Users are
+ranked within their company (and department within it), never across
+companies. A refresh also copies the ranks onto the latest CarbonFootprint
+rows, touching last_updated where they changed so incremental exports pick
+them up.
+
+Reads never rebuild a stale table themselves: they serve it as is and start
+a refresh in a background thread, at most one per process. Only an empty
+table is built on the request thread. The refresh-rankings command rebuilds
+it from cron or a deploy script.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, func, delete, update, case, literal, or_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import User, CarbonFootprint, FootprintRanking
+from services.queries import latest_footprints
+
+# Rankings older than this are rebuilt on the next read
+DEFAULT_MAX_AGE = timedelta(minutes=5)
+
+PeerAverages = namedtuple('PeerAverages', ['avg_footprint', 'avg_score'])
+
+# Held while this process refreshes the rankings in the background
+_refresh_lock = threading.Lock()
+
+
+def refresh_rankings():
+    """
+    Rebuild the ranking table from each user's latest footprint.
+
+    Ranks and lower-score counts come from window functions in a single
+    INSERT ... SELECT; the ranks are then written back to the latest
+    CarbonFootprint rows. Runs inside the caller's transaction; commit
+    afterwards.
+    """
+    now = datetime.utcnow()
+    latest = latest_footprints()
+    company = func.coalesce(User.company, '')
+    department = func.coalesce(User.department, '')
+    score = func.coalesce(latest.footprint_score, 0)
+    ranked = select(
+        latest.user_id,
+        latest.id,
+        company,
+        department,
+        score,
+        func.coalesce(latest.total_footprint, 0.0),
+        func.rank().over(partition_by=company, order_by=score.desc()),
+        func.rank().over(partition_by=(company, department), order_by=score.desc()),
+        func.rank().over(partition_by=company, order_by=score) - 1,
+        func.rank().over(partition_by=(company, department), order_by=score) - 1,
+        func.count().over(partition_by=company),
+        func.count().over(partition_by=(company, department)),
+        literal(now)
+    ).join(User, User.id == latest.user_id)
+
+    db.session.execute(delete(FootprintRanking))
+    db.session.execute(FootprintRanking.__table__.insert().from_select([
+        'user_id', 'footprint_id', 'company', 'department', 'footprint_score', 'total_footprint',
+        'rank_in_company', 'rank_in_department', 'lower_in_company', 'lower_in_department',
+        'company_size', 'department_size', 'refreshed_at'
+    ], ranked))
+
+    # Only rows whose ranks moved count as updated (exports watermark on last_updated)
+    db.session.execute(
+        update(CarbonFootprint)
+        .where(
+            CarbonFootprint.id == FootprintRanking.footprint_id,
+            or_(
+                CarbonFootprint.rank_in_company.is_distinct_from(FootprintRanking.rank_in_company),
+                CarbonFootprint.rank_in_department.is_distinct_from(FootprintRanking.rank_in_department)
+            )
+        )
+        .values(
+            rank_in_company=FootprintRanking.rank_in_company,
+            rank_in_department=FootprintRanking.rank_in_department,
+            last_updated=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def start_ranking_refresh(app):
+    """
+    Rebuild the rankings in a background thread, unless one is already running.
+
+    Args:
+        app (Flask): The application (the thread pushes its own context)
+
+    Returns:
+        bool: Whether a refresh was started
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+
+    def run():
+        with app.app_context():
+            try:
+                refresh_rankings()
+                db.session.commit()
+            except Exception as e:
+                # A concurrent refresh in another process may have won; its result is as fresh
+                logging.error(f"Error refreshing rankings: {str(e)}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+                _refresh_lock.release()
+
+    try:
+        threading.Thread(target=run, name='ranking-refresh', daemon=True).start()
+    except Exception:
+        _refresh_lock.release()
+        raise
+    return True
+
+
+def ensure_rankings(latest_footprint=None, max_age=DEFAULT_MAX_AGE):
+    """
+    Keep the rankings fresh without rebuilding them on the request thread.
+
+    An empty table is built at once, since there is nothing to serve. A table
+    older than max_age, or one that does not rank the given footprint yet
+    (its owner just submitted it), is served as is while a background
+    refresh brings it up to date.
+
+    Args:
+        latest_footprint (CarbonFootprint, optional): A user's latest footprint
+                                                      that should be ranked
+        max_age (timedelta): Oldest refresh served without starting another
+
+    Returns:
+        bool: Whether a rebuild was done or started
+    """
+    refreshed_at = db.session.execute(select(FootprintRanking.refreshed_at).limit(1)).scalar()
+    if refreshed_at is None:
+        try:
+            refresh_rankings()
+            db.session.commit()
+        except IntegrityError as e:
+            # A concurrent request built the table first; its result is as fresh
+            logging.error(f"Concurrent ranking refresh: {str(e)}")
+            db.session.rollback()
+        return True
+
+    stale = datetime.utcnow() - refreshed_at > max_age
+    if not stale and latest_footprint is not None:
+        ranked_id = db.session.execute(
+            select(FootprintRanking.footprint_id).where(FootprintRanking.user_id == latest_footprint.user_id)
+        ).scalar()
+        stale = ranked_id != latest_footprint.id
+    if not stale:
+        return False
+    return start_ranking_refresh(current_app._get_current_object())
+
+
+def get_user_ranking(user_id):
+    """
+    Get a user's ranking row.
+
+    Args:
+        user_id (int): The user's id
+
+    Returns:
+        FootprintRanking: The ranking, or None if the user has no footprint
+    """
+    return db.session.get(FootprintRanking, user_id)
+
+
+def ranking_percentile(ranking, scope='company'):
+    """
+    Percentage of ranked users with a strictly lower score.
+
+    Args:
+        ranking (FootprintRanking): The user's ranking
+        scope (str): 'company' or 'department'
+
+    Returns:
+        int: Percentile from 0 to 100
+    """
+    if scope == 'department':
+        lower, size = ranking.lower_in_department, ranking.department_size
+    else:
+        lower, size = ranking.lower_in_company, ranking.company_size
+    return int(lower / size * 100) if size else 0
+
+
+def peer_averages(company=None, department=None):
+    """
+    Average latest footprint and score across a company and one of its departments.
+
+    Args:
+        company (str, optional): Company to average (users without one if omitted)
+        department (str, optional): Department to average as well
+
+    Returns:
+        tuple: (company PeerAverages, department PeerAverages or None)
+    """
+    in_department = FootprintRanking.department == (department or '')
+    row = db.session.execute(select(
+        func.avg(FootprintRanking.total_footprint),
+        func.avg(FootprintRanking.footprint_score),
+        func.avg(case((in_department, FootprintRanking.total_footprint))),
+        func.avg(case((in_department, FootprintRanking.footprint_score)))
+    ).where(FootprintRanking.company == (company or ''))).one()
+
+    company = PeerAverages(row[0], row[1])
+    if not department or row[2] is None:
+        return company, None
+    return company, PeerAverages(row[2], row[3])
+
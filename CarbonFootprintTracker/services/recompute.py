@@ -0,0 +1,205 @@
+"""
+Footprint Recompute Module
+
+Refreshes the calculated columns of stored CarbonFootprint rows after the
+emission factors change. Only rows whose inputs touch a changed factor are
+rewritten, in keyset-paginated chunks committed one at a time, and progress is
+recorded in RecomputeJob so an interrupted run resumes where it stopped.
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, update, and_, or_, false
+
+from app import db
+from models import CarbonFootprint, RecomputeJob
+from carbon_calculator.calculator import CarbonFootprintCalculator
+from carbon_calculator.emission_factors import LEGACY_FACTOR_VERSION
+from carbon_calculator.factor_registry import factor_registry
+from services.rollups import rebuild_rollups
+from services.forecasts import mark_for_refit
+
+# Batch calculator input name -> stored CarbonFootprint column
+BATCH_INPUT_COLUMNS = {
+    'distance': CarbonFootprint.commute_distance,
+    'days_by_car': CarbonFootprint.commute_days_by_car,
+    'days_public_transit': CarbonFootprint.commute_days_public_transit,
+    'days_ev': CarbonFootprint.commute_days_ev,
+    'car_type': CarbonFootprint.car_type,
+    'remote_days': CarbonFootprint.remote_work_days,
+    'video_hours': CarbonFootprint.video_conference_hours,
+    'computer_hours': CarbonFootprint.computer_hours,
+    'printer_pages': CarbonFootprint.printer_pages,
+    'hvac_usage': CarbonFootprint.hvac_usage,
+    'air_miles': CarbonFootprint.air_travel_miles,
+    'hotel_nights': CarbonFootprint.hotel_nights,
+    'rental_car_days': CarbonFootprint.rental_car_days
+}
+
+LABEL_INPUTS = ('car_type', 'hvac_usage')
+
+
+def _factor_condition(name):
+    """
+    Build the condition selecting rows whose stored values depend on a factor.
+
+    Factors only used by the legacy calculate_*_emissions methods (train,
+    diet, paper, ...) never feed the stored columns and match no rows.
+
+    Args:
+        name (str): Dotted factor name from FACTOR_KEYS
+
+    Returns:
+        ColumnElement: SQL condition on CarbonFootprint
+    """
+    fp = CarbonFootprint
+    drives = and_(fp.commute_distance > 0, fp.commute_days_by_car > 0)
+    conditions = {
+        'commute.car.gas': and_(drives, or_(fp.car_type.is_(None), fp.car_type.notin_(['hybrid', 'electric']))),
+        'commute.car.hybrid': and_(drives, fp.car_type == 'hybrid'),
+        'commute.car.electric': or_(
+            and_(drives, fp.car_type == 'electric'),
+            and_(fp.commute_distance > 0, fp.commute_days_ev > 0)
+        ),
+        'commute.bus': and_(fp.commute_distance > 0, fp.commute_days_public_transit > 0),
+        'hvac.low': fp.hvac_usage == 'low',
+        'hvac.medium': or_(fp.hvac_usage.is_(None), fp.hvac_usage.notin_(['low', 'high'])),
+        'hvac.high': fp.hvac_usage == 'high',
+        'office_activity.video_hour': fp.video_conference_hours > 0,
+        'office_activity.computer_hour': fp.computer_hours > 0,
+        'office_activity.printer_page': fp.printer_pages > 0,
+        'office_activity.remote_day_savings': fp.remote_work_days > 0,
+        'travel.air_mile': fp.air_travel_miles > 0,
+        'travel.hotel_night': fp.hotel_nights > 0,
+        'travel.rental_car_day': fp.rental_car_days > 0
+    }
+    return conditions.get(name)
+
+
+def affected_rows_condition(target):
+    """
+    Build the condition selecting rows that change when moving to a factor set.
+
+    Rows keep the version they were computed with, so for every other
+    registered version only the rows using one of the factors that differ
+    from the target are selected. Personal-spending rows are never affected.
+
+    Args:
+        target (CompiledFactorSet): Factor set being applied
+
+    Returns:
+        ColumnElement: SQL condition on CarbonFootprint
+    """
+    version_conditions = []
+    for version in factor_registry.versions:
+        if version == target.version:
+            continue
+        changed = factor_registry.get(version).changed_factors(target)
+        factor_conditions = [c for c in (_factor_condition(name) for name in changed) if c is not None]
+        if not factor_conditions:
+            continue
+        version_match = CarbonFootprint.factor_version == version
+        if version == LEGACY_FACTOR_VERSION:
+            version_match = or_(version_match, CarbonFootprint.factor_version.is_(None))
+        version_conditions.append(and_(version_match, or_(*factor_conditions)))
+
+    if not version_conditions:
+        return false()
+    return and_(CarbonFootprint.has_transaction_data.is_not(True), or_(*version_conditions))
+
+
+def _batch_columns(rows):
+    """Turn fetched rows into batch calculator input columns."""
+    columns = {}
+    for name in BATCH_INPUT_COLUMNS:
+        values = [getattr(row, name) for row in rows]
+        if name in LABEL_INPUTS:
+            columns[name] = values
+        else:
+            # NULL inputs count as 0, like the form defaults
+            columns[name] = np.nan_to_num(np.array(values, dtype=float))
+    return columns
+
+
+def recompute_footprints(to_version=None, chunk_size=1000, resume=True):
+    """
+    Recompute stored footprints affected by a change of emission factors.
+
+    Args:
+        to_version (str, optional): Factor version to apply (defaults to the
+                                    registry's default version)
+        chunk_size (int): Rows recomputed and committed per UPDATE batch
+        resume (bool): Continue the latest unfinished job for this version
+                       instead of starting over
+
+    Returns:
+        RecomputeJob: The finished job record
+    """
+    target = factor_registry.get(to_version)
+    calculator = CarbonFootprintCalculator(target.version)
+    condition = affected_rows_condition(target)
+
+    job = None
+    if resume:
+        job = RecomputeJob.query.filter(
+            RecomputeJob.to_version == target.version,
+            RecomputeJob.status.in_(['running', 'failed'])
+        ).order_by(RecomputeJob.id.desc()).first()
+    if job is None:
+        job = RecomputeJob(to_version=target.version, status='running', last_footprint_id=0, rows_processed=0)
+        db.session.add(job)
+    job.status = 'running'
+    job.error = None
+    db.session.commit()
+
+    query = select(
+        CarbonFootprint.id,
+        *[column.label(name) for name, column in BATCH_INPUT_COLUMNS.items()]
+    ).where(condition).order_by(CarbonFootprint.id).limit(chunk_size)
+
+    try:
+        while True:
+            rows = db.session.execute(query.where(CarbonFootprint.id > job.last_footprint_id)).all()
+            if not rows:
+                break
+
+            results = calculator.calculate_batch_footprints(_batch_columns(rows))
+            now = datetime.utcnow()
+            db.session.execute(update(CarbonFootprint), [
+                {
+                    'id': row.id,
+                    'commute_footprint': float(results['commute_footprint'][i]),
+                    'office_footprint': float(results['office_footprint'][i]),
+                    'travel_footprint': float(results['travel_footprint'][i]),
+                    'total_footprint': float(results['total_footprint'][i]),
+                    'footprint_score': int(results['footprint_score'][i]),
+                    'factor_version': target.version,
+                    'last_updated': now
+                }
+                for i, row in enumerate(rows)
+            ])
+
+            # Progress is committed with the chunk so a restart skips it
+            job.last_footprint_id = rows[-1].id
+            job.rows_processed += len(rows)
+            job.updated_at = now
+            db.session.commit()
+            logging.info(f"Recompute to {target.version}: {job.rows_processed} rows done")
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+    # Monthly rollups and forecast states are built on the recomputed columns
+    if job.rows_processed:
+        rebuild_rollups()
+        mark_for_refit()
+    job.status = 'completed'
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+    return job
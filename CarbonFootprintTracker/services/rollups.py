@@ -0,0 +1,147 @@
+"""
+Footprint Rollup Module
+
+Maintains MonthlyFootprintRollup, a materialized per (month, department,
+company) summary of CarbonFootprint, so executive views aggregate
+O(months x departments) rows instead of every stored footprint.
+
+Rollups are updated incrementally as footprints are inserted and can be
+rebuilt from scratch (after a recompute, or to backfill existing data).
+Whether a footprint is its user's first of the month (employee_count) is
+looked up with the user's row locked, so concurrent submissions by one user
+count them once. Bulk imports decide it before inserting, so a submission
+racing an import of the same user-month can count them twice until
+rebuild-rollups runs.
+"""
+
+from collections import defaultdict
+from sqlalchemy import select, func, delete, exists
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import User, CarbonFootprint, MonthlyFootprintRollup
+from services.queries import month_bucket, add_months
+
+# Rollup column -> CarbonFootprint column it sums
+SUM_COLUMNS = {
+    'commute_sum': 'commute_footprint',
+    'office_sum': 'office_footprint',
+    'travel_sum': 'travel_footprint',
+    'transaction_sum': 'transaction_footprint',
+    'total_sum': 'total_footprint',
+    'score_sum': 'footprint_score'
+}
+
+COUNT_COLUMNS = ('footprint_count', 'employee_count')
+
+
+def _upsert(rows):
+    """Add rollup deltas, inserting missing (month, department, company) keys."""
+    table = MonthlyFootprintRollup.__table__
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=['month', 'department', 'company'],
+        set_={
+            column: table.c[column] + statement.excluded[column]
+            for column in (*SUM_COLUMNS, *COUNT_COLUMNS)
+        }
+    )
+    db.session.execute(statement)
+
+
+def _is_first_of_month(footprint, recorded_ids):
+    """Whether the user has no footprint in the month besides those being recorded."""
+    month_start = footprint.date.replace(day=1)
+    return not db.session.execute(select(exists().where(
+        CarbonFootprint.user_id == footprint.user_id,
+        CarbonFootprint.id.notin_(recorded_ids),
+        CarbonFootprint.date >= month_start,
+        CarbonFootprint.date < add_months(month_start, 1)
+    ))).scalar()
+
+
+def record_footprints(entries):
+    """
+    Add newly inserted footprints to their monthly rollups.
+
+    Call after the footprints are flushed and before committing, so the
+    rollup update commits (or rolls back) together with them.
+
+    Args:
+        entries (list): (footprint, user, is_new_employee) tuples, where
+                        is_new_employee says whether this is the user's first
+                        footprint of that month (None to look it up). A
+                        user-month is counted at most once per call.
+    """
+    recorded_ids = defaultdict(list)
+    for footprint, user, is_new_employee in entries:
+        if is_new_employee is None:
+            recorded_ids[(user.id, footprint.date.strftime('%Y-%m'))].append(footprint.id)
+    if recorded_ids:
+        # Held until commit, so a concurrent first submission of the user sees this one
+        user_ids = sorted({user_id for user_id, _ in recorded_ids})
+        db.session.execute(select(User.id).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()).all()
+
+    counted = set()
+    deltas = defaultdict(lambda: dict.fromkeys((*SUM_COLUMNS, *COUNT_COLUMNS), 0))
+    for footprint, user, is_new_employee in entries:
+        month = footprint.date.strftime('%Y-%m')
+        if (user.id, month) in counted:
+            is_new_employee = False
+        elif is_new_employee is None:
+            is_new_employee = _is_first_of_month(footprint, recorded_ids[(user.id, month)])
+        counted.add((user.id, month))
+        key = (month, user.department or '', user.company or '')
+        delta = deltas[key]
+        for rollup_column, footprint_column in SUM_COLUMNS.items():
+            delta[rollup_column] += getattr(footprint, footprint_column) or 0
+        delta['footprint_count'] += 1
+        delta['employee_count'] += 1 if is_new_employee else 0
+
+    if deltas:
+        _upsert([
+            {'month': month, 'department': department, 'company': company, **delta}
+            for (month, department, company), delta in deltas.items()
+        ])
+
+
+def record_footprint(footprint, user):
+    """
+    Add one newly inserted footprint to its monthly rollup.
+
+    Args:
+        footprint (CarbonFootprint): The flushed footprint
+        user (User): Its owner
+    """
+    record_footprints([(footprint, user, None)])
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup row from CarbonFootprint in one INSERT ... SELECT.
+
+    Runs inside the caller's transaction; commit afterwards.
+    """
+    month = month_bucket(CarbonFootprint.date)
+    department = func.coalesce(User.department, '')
+    company = func.coalesce(User.company, '')
+    aggregates = select(
+        month,
+        department,
+        company,
+        *[func.coalesce(func.sum(getattr(CarbonFootprint, column)), 0) for column in SUM_COLUMNS.values()],
+        func.count(CarbonFootprint.id),
+        func.count(func.distinct(CarbonFootprint.user_id))
+    ).join(User, User.id == CarbonFootprint.user_id).group_by(month, department, company)
+
+    db.session.execute(delete(MonthlyFootprintRollup))
+    db.session.execute(MonthlyFootprintRollup.__table__.insert().from_select(
+        ['month', 'department', 'company', *SUM_COLUMNS, *COUNT_COLUMNS],
+        aggregates
+    ))
+
+
+def month_key(day):
+    """Format a date as its rollup month key ('YYYY-MM')."""
+    return day.strftime('%Y-%m')
@@ -0,0 +1,387 @@
+"""
+Server-Side Session Module
+
+Replaces Flask's signed-cookie sessions with sessions stored on the server,
+selected by SESSION_BACKEND: 'sql' keeps them in the ServerSession table,
+'filesystem' in one file per session under SESSION_FILE_DIR, and 'cookie'
+(the default) keeps Flask's own cookie sessions. The client only holds a
+signed random session id.
+
+A session is loaded from the store the first time it is read or written.
+Flask-Login reads it on every request that checks the current user, so in
+practice only requests that never do (static files, anonymous API calls)
+skip the store. Sessions are only written back when modified (or
+refreshed, for permanent sessions).
+
+Logging in and out rotates the session id (rotate_session), deleting the
+old stored session, so an id fixed before login is useless after it.
+
+Expired sessions are deleted in batches, at most every SESSION_GC_INTERVAL
+seconds per process, and by the purge-sessions command.
+"""
+
+import logging
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from flask import session
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import Signer, BadSignature
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import ServerSession
+
+SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class ServerSideSession(SessionMixin):
+    """Session data loaded from the store on first access."""
+
+    def __init__(self, sid=None, loader=None):
+        """
+        Initialize the session.
+
+        Args:
+            sid (str, optional): Id sent by the client; None for a new session
+            loader (callable, optional): Reads the stored data of sid (None if
+                                         unknown or expired)
+        """
+        self.sid = sid
+        self._loader = loader
+        self._data = None if loader else {}
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.rotated_from = None  # Stored id to delete when saving
+
+    @property
+    def loaded(self):
+        """Whether the data has been read (or the session is new)."""
+        return self._data is not None
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            data = self._loader()
+            if data is None:
+                # Unknown or expired: start over under a fresh id
+                self.sid = None
+                self.new = True
+                data = {}
+            self._data = data
+        return self._data
+
+    def rotate(self):
+        """Move the data to a fresh session id when saved, deleting the old one."""
+        self._load()
+        if self.sid is not None:
+            self.rotated_from = self.sid
+            self.sid = None
+        self.new = True
+        self.modified = True
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return f'<ServerSideSession {self.sid!r} {self._data!r}>'
+
+
+class SQLSessionStore:
+    """Sessions in the ServerSession table, accessed outside the ORM session."""
+
+    def __init__(self, engine):
+        """
+        Initialize the store.
+
+        Args:
+            engine (Engine): Database engine
+        """
+        self.engine = engine
+        self.table = ServerSession.__table__
+
+    def load(self, sid):
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(self.table.c.data).where(
+                    self.table.c.sid == sid,
+                    self.table.c.expires_at > datetime.utcnow()
+                )
+            ).first()
+        return None if row is None else session_json_serializer.loads(row.data.decode())
+
+    def save(self, sid, data, expires_at):
+        dialect = postgresql if self.engine.dialect.name == 'postgresql' else sqlite
+        statement = dialect.insert(self.table).values(
+            sid=sid, data=session_json_serializer.dumps(data).encode(), expires_at=expires_at
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['sid'],
+            set_={'data': statement.excluded.data, 'expires_at': statement.excluded.expires_at}
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement)
+
+    def delete(self, sid):
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.sid == sid))
+
+    def purge_expired(self, batch_size=1000, max_batches=None):
+        """
+        Delete expired sessions in batches, one transaction per batch.
+
+        Args:
+            batch_size (int): Sessions deleted per batch
+            max_batches (int, optional): Stop after this many batches
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        deleted = 0
+        batches = 0
+        now = datetime.utcnow()
+        while max_batches is None or batches < max_batches:
+            expired = select(self.table.c.sid).where(
+                self.table.c.expires_at <= now
+            ).order_by(self.table.c.expires_at).limit(batch_size)
+            with self.engine.begin() as connection:
+                sids = connection.execute(expired).scalars().all()
+                if sids:
+                    connection.execute(delete(self.table).where(self.table.c.sid.in_(sids)))
+            deleted += len(sids)
+            batches += 1
+            if len(sids) < batch_size:
+                break
+        return deleted
+
+
+class FilesystemSessionStore:
+    """Sessions as files named by session id; a file's mtime is its expiry."""
+
+    def __init__(self, directory):
+        """
+        Initialize the store.
+
+        Args:
+            directory (str): Directory holding the session files (created if missing)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid):
+        path = self._path(sid)
+        try:
+            if os.stat(path).st_mtime <= time.time():
+                return None
+            with open(path, encoding='utf-8') as f:
+                return session_json_serializer.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, sid, data, expires_at):
+        # Write a temporary file and rename it, so readers never see a partial session
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(session_json_serializer.dumps(data))
+            expires = (expires_at - datetime(1970, 1, 1)).total_seconds()
+            os.utime(temp_path, (expires, expires))
+            os.replace(temp_path, self._path(sid))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def delete(self, sid):
+        try:
+            os.unlink(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self, batch_size=1000, max_batches=None):
+        """
+        Delete expired session files, scanning the directory once.
+
+        Args:
+            batch_size (int): Files deleted per batch
+            max_batches (int, optional): Stop after this many batches
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        limit = None if max_batches is None else batch_size * max_batches
+        now = time.time()
+        deleted = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if limit is not None and deleted >= limit:
+                    break
+                try:
+                    if entry.name.startswith('.tmp-'):
+                        # Temporary file of a write in progress, or left by an interrupted one
+                        expired = entry.stat().st_mtime <= now - 3600
+                    else:
+                        expired = entry.stat().st_mtime <= now
+                    if expired:
+                        os.unlink(entry.path)
+                        deleted += 1
+                except OSError:
+                    continue
+        return deleted
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a session store."""
+
+    salt = 'server-side-session'
+
+    def __init__(self, store, gc_interval=300, gc_batch_size=1000):
+        """
+        Initialize the interface.
+
+        Args:
+            store (SQLSessionStore or FilesystemSessionStore): Where sessions live
+            gc_interval (float): Seconds between expired-session purges per process
+            gc_batch_size (int): Sessions deleted per purge batch
+        """
+        self.store = store
+        self.gc_interval = gc_interval
+        self.gc_batch_size = gc_batch_size
+        self._last_gc = time.monotonic()
+        self._gc_lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        signed_sid = request.cookies.get(self.get_cookie_name(app))
+        if signed_sid:
+            try:
+                sid = self._signer(app).unsign(signed_sid).decode()
+            except BadSignature:
+                sid = None
+            if sid and SID_PATTERN.match(sid):
+                return ServerSideSession(sid, loader=lambda: self.store.load(sid))
+        return ServerSideSession()
+
+    def _expires_at(self, app):
+        return datetime.utcnow() + app.permanent_session_lifetime
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.loaded:
+            # The view never touched the session
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.rotated_from:
+            self.store.delete(session.rotated_from)
+        if not session:
+            if session.modified and (session.sid or session.rotated_from):
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        # Non-permanent sessions end with the browser; the store still expires them
+        self.store.save(session.sid, dict(session), self._expires_at(app))
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        """Purge one batch of expired sessions if the interval has passed."""
+        now = time.monotonic()
+        if now - self._last_gc < self.gc_interval or not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_gc = now
+            self.store.purge_expired(self.gc_batch_size, max_batches=1)
+        except Exception as e:
+            logging.error(f"Error purging expired sessions: {str(e)}")
+        finally:
+            self._gc_lock.release()
+
+
+def rotate_session():
+    """
+    Give the current session a fresh id, as on login and logout.
+
+    A no-op for cookie sessions, which carry no id.
+    """
+    if isinstance(session, ServerSideSession):
+        session.rotate()
+
+
+def init_session_interface(app, engine):
+    """
+    Install the server-side session interface chosen by SESSION_BACKEND.
+
+    Args:
+        app (Flask): The application (SESSION_BACKEND, SESSION_FILE_DIR,
+                     SESSION_GC_INTERVAL, SESSION_GC_BATCH_SIZE config)
+        engine (Engine): Database engine for the 'sql' backend
+
+    Returns:
+        ServerSideSessionInterface: The installed interface, or None for
+                                    cookie sessions
+    """
+    backend = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend == 'cookie':
+        return None
+    if backend == 'sql':
+        store = SQLSessionStore(engine)
+    elif backend == 'filesystem':
+        store = FilesystemSessionStore(app.config['SESSION_FILE_DIR'])
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}', expected cookie, sql or filesystem")
+
+    interface = ServerSideSessionInterface(
+        store,
+        gc_interval=app.config.get('SESSION_GC_INTERVAL', 300),
+        gc_batch_size=app.config.get('SESSION_GC_BATCH_SIZE', 1000)
+    )
+    app.session_interface = interface
+    return interface
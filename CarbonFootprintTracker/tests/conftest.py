@@ -0,0 +1,61 @@
+"""
+Test Configuration
+
+Points the app at a throwaway SQLite database before it is imported, and
+provides fresh tables and logged-in clients for each test.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='ecopulse-tests-'), 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+os.environ['SESSION_BACKEND'] = 'cookie'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db  # noqa: E402
+from models import User  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """The application with empty tables."""
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user: make_user(username, role='employee', company=None, department=None)."""
+    def make(username, role='employee', company=None, department=None):
+        user = User(
+            username=username,
+            email=f'{username}@example.com',
+            password_hash='-',
+            role=role,
+            company=company,
+            department=department
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """Return a test client logged in as a user: login(user)."""
+    def log_in(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return log_in
@@ -0,0 +1,60 @@
+"""Tests for the executive API response cache."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.dialects import sqlite
+
+from app import db
+from models import CarbonFootprint
+
+URL = '/company/api/department_data'
+
+
+@pytest.fixture
+def client(make_user, login):
+    """An executive client of a company with one footprint."""
+    executive = make_user('boss', role='executive', company='Acme')
+    alice = make_user('alice', company='Acme', department='Sales')
+    db.session.add(CarbonFootprint(id=1, user_id=alice.id, date=date(2024, 5, 1), total_footprint=10.0))
+    db.session.commit()
+    return login(executive)
+
+
+def test_revalidation_with_the_current_etag_gets_304(client):
+    first = client.get(URL)
+    assert first.status_code == 200 and first.get_etag()[0] is not None
+
+    again = client.get(URL, headers={'If-None-Match': f'"{first.get_etag()[0]}"'})
+
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+
+def test_bulk_update_invalidates_the_cached_response(client):
+    before = client.get(URL)
+
+    db.session.execute(update(CarbonFootprint).values(total_footprint=50.0))
+    db.session.commit()
+    after = client.get(URL)
+
+    assert after.status_code == 200
+    assert after.get_etag() != before.get_etag()
+    assert after.get_data() != before.get_data()
+
+
+def test_upsert_invalidates_the_cached_response(client):
+    before = client.get(URL)
+
+    statement = sqlite.insert(CarbonFootprint.__table__).values(
+        id=1, user_id=1, date=date(2024, 5, 1), total_footprint=80.0
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['id'], set_={'total_footprint': statement.excluded.total_footprint}
+    ))
+    db.session.commit()
+    after = client.get(URL, headers={'If-None-Match': f'"{before.get_etag()[0]}"'})
+
+    assert after.status_code == 200
+    assert after.get_data() != before.get_data()
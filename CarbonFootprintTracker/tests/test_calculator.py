@@ -0,0 +1,74 @@
+"""Tests that the batch footprint calculation matches the scalar methods."""
+
+import random
+
+from carbon_calculator.calculator import CarbonFootprintCalculator
+
+CAR_TYPES = ['gas', 'hybrid', 'electric', 'diesel', None]
+HVAC_LEVELS = ['low', 'medium', 'high', 'extreme', None]
+
+
+def random_rows(count, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        # Every tenth row is all zeros
+        scale = 0 if i % 10 == 0 else 1
+        rows.append({
+            'distance': scale * rng.uniform(0, 60),
+            'days_by_car': scale * rng.randint(0, 5),
+            'days_public_transit': scale * rng.randint(0, 5),
+            'days_ev': scale * rng.randint(0, 5),
+            'car_type': rng.choice(CAR_TYPES),
+            'remote_days': scale * rng.randint(0, 5),
+            'video_hours': scale * rng.uniform(0, 20),
+            'computer_hours': scale * rng.uniform(0, 10),
+            'printer_pages': scale * rng.randint(0, 200),
+            'hvac_usage': rng.choice(HVAC_LEVELS),
+            'air_miles': scale * rng.uniform(0, 3000),
+            'hotel_nights': scale * rng.randint(0, 10),
+            'rental_car_days': scale * rng.randint(0, 5)
+        })
+    return rows
+
+
+def scalar_footprint(calculator, row):
+    commute = calculator.calculate_commute_footprint({
+        key: row[key] for key in ('distance', 'days_by_car', 'days_public_transit', 'days_ev', 'car_type')
+    })
+    office = calculator.calculate_office_footprint({
+        key: row[key] for key in ('remote_days', 'video_hours', 'computer_hours', 'printer_pages', 'hvac_usage')
+    })
+    travel = calculator.calculate_travel_footprint({
+        key: row[key] for key in ('air_miles', 'hotel_nights', 'rental_car_days')
+    })
+    total = commute + office + travel
+    return commute, office, travel, total, calculator.calculate_footprint_score(total)
+
+
+def test_batch_matches_scalar_methods():
+    calculator = CarbonFootprintCalculator()
+    rows = random_rows(2000)
+    columns = {key: [row[key] for row in rows] for key in rows[0]}
+
+    results = calculator.calculate_batch_footprints(columns)
+
+    batch = zip(*(results[name] for name in (
+        'commute_footprint', 'office_footprint', 'travel_footprint', 'total_footprint', 'footprint_score'
+    )))
+    for row, expected, actual in zip(rows, (scalar_footprint(calculator, row) for row in rows), batch):
+        assert tuple(actual) == expected, row
+
+
+def test_batch_scores_match_at_the_edges():
+    calculator = CarbonFootprintCalculator()
+    totals = [-1.0, 0.0, 0.5, 1.0, 99.0, 100.0, 101.0, 199.0, 199.5, 200.0, 250.0]
+
+    assert calculator.calculate_batch_scores(totals).tolist() == [calculator.calculate_footprint_score(t) for t in totals]
+
+
+def test_batch_of_no_rows():
+    results = CarbonFootprintCalculator().calculate_batch_footprints({'distance': [], 'car_type': []})
+
+    assert all(len(values) == 0 for values in results.values())
+    assert CarbonFootprintCalculator().calculate_batch_footprints({})['total_footprint'].shape == (0,)
@@ -0,0 +1,62 @@
+"""Tests for the streaming export API."""
+
+import json
+from datetime import date, datetime, timedelta
+
+from app import db
+from models import CarbonFootprint
+
+
+def add_footprint(user, updated):
+    footprint = CarbonFootprint(user_id=user.id, date=date(2024, 5, 1), total_footprint=10.0, last_updated=updated)
+    db.session.add(footprint)
+    db.session.commit()
+    return footprint
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_is_limited_to_the_executives_company(make_user, login):
+    executive = make_user('boss', role='executive', company='Acme')
+    alice = make_user('alice', company='Acme')
+    bob = make_user('bob', company='Globex')
+    now = datetime.utcnow()
+    add_footprint(alice, now)
+    add_footprint(bob, now)
+
+    response = login(executive).get('/company/api/export/footprints?format=ndjson')
+
+    assert response.status_code == 200
+    assert [row['username'] for row in read_ndjson(response)] == ['alice']
+
+
+def test_export_requires_a_company(make_user, login):
+    executive = make_user('boss', role='executive')
+    add_footprint(make_user('bob'), datetime.utcnow())
+
+    response = login(executive).get('/company/api/export/footprints?format=ndjson')
+
+    assert response.status_code == 403
+
+
+def test_watermark_includes_rows_changed_in_place(make_user, login):
+    executive = make_user('boss', role='executive', company='Acme')
+    alice = make_user('alice', company='Acme')
+    start = datetime.utcnow()
+    first = add_footprint(alice, start)
+    second = add_footprint(alice, start + timedelta(seconds=1))
+    client = login(executive)
+
+    rows = read_ndjson(client.get('/company/api/export/footprints?format=ndjson'))
+    assert [row['id'] for row in rows] == [first.id, second.id]
+    watermark = f"since_updated={rows[-1]['last_updated']}&since_id={rows[-1]['id']}"
+
+    # A recompute updates the older row in place
+    first.total_footprint = 12.0
+    first.last_updated = start + timedelta(seconds=2)
+    db.session.commit()
+
+    rows = read_ndjson(client.get(f'/company/api/export/footprints?format=ndjson&{watermark}'))
+    assert [(row['id'], row['total_footprint']) for row in rows] == [(first.id, 12.0)]
@@ -0,0 +1,29 @@
+"""Tests for the stored employee forecasts."""
+
+import pytest
+
+import services.forecast_cache
+from app import db
+from models import DashboardForecast
+
+OFFICE_FORM = {
+    'form_type': 'office', 'commute_distance': '12', 'car_type': 'hybrid', 'commute_days_by_car': '3',
+    'commute_days_public_transit': '1', 'commute_days_ev': '0', 'remote_work_days': '1',
+    'video_conference_hours': '4', 'air_travel_miles': '300', 'hotel_nights': '1', 'rental_car_days': '0',
+    'computer_hours': '6', 'printer_pages': '20', 'hvac_usage': 'medium'
+}
+
+
+def test_submission_stores_the_forecasts_reads_serve(make_user, login, monkeypatch):
+    alice = make_user('alice', company='Acme')
+    client = login(alice)
+
+    assert client.post('/employee/carbon_form', data=OFFICE_FORM).status_code == 302
+    stored = db.session.execute(db.select(DashboardForecast).where(DashboardForecast.user_id == alice.id)).scalars()
+    assert sorted(row.months for row in stored) == [6, 12]
+
+    def compute(*args):
+        pytest.fail('a stored forecast was recomputed')
+    monkeypatch.setattr(services.forecast_cache, '_compute_forecast', compute)
+    assert client.get('/employee/api/forecast').status_code == 200
+    assert client.get('/employee/dashboard').status_code == 200
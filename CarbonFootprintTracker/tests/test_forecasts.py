@@ -0,0 +1,56 @@
+"""Tests for the incremental history forecast states."""
+
+import json
+from datetime import date
+
+import pytest
+
+from app import db
+from models import CarbonFootprint
+from services.forecasts import user_key, fit_series, get_series_state, record_footprint
+
+STATE_FIELDS = ('level', 'trend', 'last_month', 'observations', 'open_month', 'open_sum', 'open_count')
+
+
+def submit(user, day, total):
+    footprint = CarbonFootprint(user_id=user.id, date=day, total_footprint=total)
+    db.session.add(footprint)
+    db.session.flush()
+    record_footprint(footprint)
+    db.session.commit()
+    return footprint
+
+
+def snapshot(row):
+    return {field: getattr(row, field) for field in STATE_FIELDS}, json.loads(row.seasonal)
+
+
+def test_incremental_fold_matches_a_full_refit(make_user):
+    alice = make_user('alice')
+    submit(alice, date(2024, 1, 5), 80.0)
+    fit_series(user_key(alice.id))
+    db.session.commit()
+
+    totals = [75.0, 90.0, 60.0, 70.0, 65.0, 85.0, 55.0, 50.0]
+    for month in range(2, 10):
+        submit(alice, date(2024, month, 3), totals[month - 2])
+        submit(alice, date(2024, month, 20), totals[month - 2] + 4.0)
+    row = get_series_state(user_key(alice.id))
+    assert not row.needs_refit and row.observations == 8
+    state, seasonal = snapshot(row)
+
+    refit_state, refit_seasonal = snapshot(fit_series(user_key(alice.id)))
+
+    assert state == pytest.approx(refit_state)
+    assert seasonal == pytest.approx(refit_seasonal)
+
+
+def test_backdated_footprint_flags_a_refit(make_user):
+    alice = make_user('alice')
+    submit(alice, date(2024, 3, 5), 80.0)
+    row = fit_series(user_key(alice.id))
+    db.session.commit()
+
+    submit(alice, date(2024, 1, 5), 70.0)
+
+    assert row.needs_refit
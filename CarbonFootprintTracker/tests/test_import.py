@@ -0,0 +1,75 @@
+"""Tests for the bulk footprint import API."""
+
+import io
+
+import pytest
+
+import routes.company
+import services.ingest
+from models import CarbonFootprint
+from services.ingest import import_footprints
+
+CSV_HEADER = 'username,date,commute_distance,commute_days_by_car,car_type\n'
+
+
+@pytest.fixture(autouse=True)
+def no_precompute(monkeypatch):
+    """Skip the background dashboard precompute an import starts."""
+    monkeypatch.setattr(routes.company, 'start_dashboard_precompute', lambda app, forecaster: None)
+
+
+def post_csv(client, body):
+    return client.post('/company/api/import_footprints', data=body, content_type='text/csv')
+
+
+def test_import_rejects_users_of_other_companies(make_user, login):
+    executive = make_user('boss', role='executive', company='Acme')
+    alice = make_user('alice', company='Acme')
+    bob = make_user('bob', company='Globex')
+
+    response = post_csv(login(executive), CSV_HEADER + 'alice,2024-05-01,10,3,gas\nbob,2024-05-01,10,3,gas\n')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['inserted'] == 1
+    assert report['errors'] == [{'line': 3, 'error': "Unknown user 'bob'"}]
+    assert CarbonFootprint.query.filter_by(user_id=alice.id).count() == 1
+    assert CarbonFootprint.query.filter_by(user_id=bob.id).count() == 0
+
+
+def test_import_requires_a_company(make_user, login):
+    executive = make_user('boss', role='executive')
+    bob = make_user('bob')
+
+    response = post_csv(login(executive), CSV_HEADER + 'bob,2024-05-01,10,3,gas\n')
+
+    assert response.status_code == 403
+    assert CarbonFootprint.query.filter_by(user_id=bob.id).count() == 0
+
+
+def test_import_without_company_never_matches_company_users(make_user):
+    make_user('bob', company='Globex')
+    loner = make_user('loner')
+
+    report = import_footprints(io.StringIO(CSV_HEADER + 'bob,2024-05-01,10,3,gas\nloner,2024-05-01,10,3,gas\n'))
+
+    assert report['inserted'] == 1
+    assert [error['line'] for error in report['errors']] == [2]
+    assert CarbonFootprint.query.filter_by(user_id=loner.id).count() == 1
+
+
+def test_failed_chunk_reports_each_line_once(make_user, monkeypatch):
+    make_user('alice')
+
+    def fail(entries):
+        raise RuntimeError('rollup failed')
+    monkeypatch.setattr(services.ingest, 'record_footprints', fail)
+
+    report = import_footprints(io.StringIO(CSV_HEADER + 'alice,2024-05-01,10,3,gas\nghost,2024-05-01,10,3,gas\n'))
+
+    assert report['inserted'] == 0
+    assert report['error_count'] == 2
+    assert report['errors'] == [
+        {'line': 3, 'error': "Unknown user 'ghost'"},
+        {'line': 2, 'error': 'Chunk failed to insert'}
+    ]
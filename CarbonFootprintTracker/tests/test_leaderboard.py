@@ -0,0 +1,47 @@
+"""Tests for the leaderboard API."""
+
+from datetime import date
+
+from app import db
+from models import CarbonFootprint
+from services.leaderboard import leaderboard
+
+
+def add_footprint(user, score):
+    db.session.add(CarbonFootprint(user_id=user.id, date=date(2024, 5, 1), total_footprint=10.0, footprint_score=score))
+    db.session.commit()
+
+
+def usernames(response):
+    return [entry['username'] for entry in response.get_json()['entries']]
+
+
+def test_pages_hold_at_most_their_size_when_scores_tie(make_user, login):
+    users = [make_user(f'user{i}', company='Acme') for i in range(4)]
+    for user in users:
+        add_footprint(user, 70)
+    client = login(users[0])
+
+    pages = [client.get(f'/employee/api/leaderboard?size=1&page={page}') for page in range(1, 6)]
+
+    assert [usernames(page) for page in pages] == [['user0'], ['user1'], ['user2'], ['user3'], []]
+    assert [entry['rank'] for page in pages[:4] for entry in page.get_json()['entries']] == [1, 1, 1, 1]
+
+    around = client.get('/employee/api/leaderboard?around=me&size=3').get_json()
+    assert around['first_position'] == 1
+    assert [entry['is_me'] for entry in around['entries']] == [True, False, False]
+
+
+def test_boards_only_show_the_users_company(make_user, login):
+    alice = make_user('alice', company='Acme', department='Sales')
+    bob = make_user('bob', company='Globex', department='Sales')
+    add_footprint(alice, 50)
+    add_footprint(bob, 90)
+    leaderboard.clear()
+    client = login(alice)
+
+    for scope in ('company', 'department'):
+        assert usernames(client.get(f'/employee/api/leaderboard?scope={scope}')) == ['alice']
+        assert usernames(client.get(f'/employee/api/leaderboard?scope={scope}&around=me')) == ['alice']
+    assert [entry.username for entry in leaderboard.top('Acme')] == ['alice']
+    assert [entry.username for entry in leaderboard.top('Acme', department='Sales')] == ['alice']
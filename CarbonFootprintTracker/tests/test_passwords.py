@@ -0,0 +1,18 @@
+"""Tests for password hashing."""
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from services.passwords import method_prefix
+
+
+@pytest.mark.parametrize('method', [None, 'scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha512:1000'])
+def test_method_prefix_matches_werkzeug(method):
+    pwhash = generate_password_hash('secret') if method is None else generate_password_hash('secret', method=method)
+
+    assert pwhash.split('$', 1)[0] == method_prefix(method)
+
+
+def test_method_prefix_rejects_unknown_methods():
+    with pytest.raises(ValueError):
+        method_prefix('md5')
@@ -0,0 +1,38 @@
+"""Tests for quiz submission tokens and the question bank."""
+
+import pytest
+
+from ai_helpers.quiz import SustainabilityQuiz
+from app import db
+from models import QuizHistory, QuizScore
+from services.quiz_history import quiz
+from services.quiz_tokens import issue_quiz_token
+
+
+def submit(client, token, questions):
+    form = {'quiz_token': token}
+    form.update({f"question_{q['id']}": q['correct_answer'] for q in questions})
+    return client.post('/employee/quiz', data=form)
+
+
+def test_quiz_token_is_accepted_once(app, make_user, login):
+    alice = make_user('alice')
+    questions = quiz.get_questions([quiz.question_bank[0]['id'], quiz.question_bank[1]['id']])
+    with app.test_request_context():
+        token = issue_quiz_token(alice.id, questions)
+    client = login(alice)
+
+    assert submit(client, token, questions).status_code == 200
+    assert submit(client, token, questions).status_code == 302
+
+    assert QuizScore.query.filter_by(user_id=alice.id).count() == 1
+    assert db.session.get(QuizHistory, alice.id).quiz_count == 1
+
+
+@pytest.mark.parametrize('question_id', ['7', -1, 10_000_000, True])
+def test_question_ids_must_be_small_integers(question_id):
+    bank = SustainabilityQuiz()
+    question = dict(bank.question_bank[0], id=question_id)
+
+    with pytest.raises(ValueError):
+        bank.add_questions([question])
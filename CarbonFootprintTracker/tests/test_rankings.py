@@ -0,0 +1,61 @@
+"""Tests for the footprint ranking table."""
+
+from datetime import date, datetime, timedelta
+
+from app import db
+from models import CarbonFootprint
+from services.rankings import refresh_rankings, get_user_ranking, peer_averages
+
+
+def add_footprint(user, score, updated=None):
+    footprint = CarbonFootprint(
+        user_id=user.id, date=date(2024, 5, 1), total_footprint=100.0 - score, footprint_score=score,
+        last_updated=updated or datetime.utcnow()
+    )
+    db.session.add(footprint)
+    db.session.commit()
+    return footprint
+
+
+def test_users_are_ranked_within_their_company(make_user):
+    alice = make_user('alice', company='Acme', department='Sales')
+    carol = make_user('carol', company='Acme', department='Sales')
+    bob = make_user('bob', company='Globex', department='Sales')
+    add_footprint(alice, 50)
+    add_footprint(carol, 40)
+    add_footprint(bob, 90)
+
+    refresh_rankings()
+    db.session.commit()
+
+    ranking = get_user_ranking(alice.id)
+    assert (ranking.company, ranking.rank_in_company, ranking.company_size) == ('Acme', 1, 2)
+    assert (ranking.rank_in_department, ranking.department_size, ranking.lower_in_company) == (1, 2, 1)
+    assert get_user_ranking(bob.id).rank_in_company == 1
+    company, department = peer_averages('Acme', 'Sales')
+    assert company.avg_score == department.avg_score == 45
+
+
+def test_rank_changes_touch_last_updated(make_user):
+    alice = make_user('alice', company='Acme')
+    carol = make_user('carol', company='Acme')
+    long_ago = datetime.utcnow() - timedelta(days=1)
+    first = add_footprint(alice, 50, long_ago)
+    second = add_footprint(carol, 40, long_ago)
+
+    refresh_rankings()
+    db.session.commit()
+    ranked_at = db.session.get(CarbonFootprint, first.id).last_updated
+    assert ranked_at > long_ago
+
+    # Unchanged ranks leave the rows alone
+    refresh_rankings()
+    db.session.commit()
+    assert db.session.get(CarbonFootprint, first.id).last_updated == ranked_at
+
+    second.footprint_score = 60
+    db.session.commit()
+    refresh_rankings()
+    db.session.commit()
+    assert db.session.get(CarbonFootprint, first.id).rank_in_company == 2
+    assert db.session.get(CarbonFootprint, first.id).last_updated > ranked_at
@@ -0,0 +1,39 @@
+"""Tests for the monthly footprint rollups."""
+
+from datetime import date
+
+from app import db
+from models import CarbonFootprint, MonthlyFootprintRollup
+from services.rollups import record_footprints, record_footprint
+
+
+def add_footprints(user, *days):
+    footprints = [CarbonFootprint(user_id=user.id, date=date(2024, 5, day), total_footprint=10.0) for day in days]
+    db.session.add_all(footprints)
+    db.session.flush()
+    return footprints
+
+
+def rollup():
+    return db.session.execute(db.select(MonthlyFootprintRollup)).scalar_one()
+
+
+def test_user_month_is_counted_once_per_call(make_user):
+    alice = make_user('alice', company='Acme')
+    first, second = add_footprints(alice, 1, 2)
+
+    record_footprints([(first, alice, None), (second, alice, None)])
+    db.session.commit()
+
+    assert (rollup().footprint_count, rollup().employee_count) == (2, 1)
+
+
+def test_later_footprint_of_a_month_is_not_a_new_employee(make_user):
+    alice = make_user('alice', company='Acme')
+    record_footprint(add_footprints(alice, 1)[0], alice)
+    db.session.commit()
+
+    record_footprint(add_footprints(alice, 9)[0], alice)
+    db.session.commit()
+
+    assert (rollup().footprint_count, rollup().employee_count) == (2, 1)
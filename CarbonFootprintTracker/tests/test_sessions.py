@@ -0,0 +1,45 @@
+"""Tests for server-side sessions."""
+
+import pytest
+
+from app import db
+from models import ServerSession
+from services.sessions import SQLSessionStore, ServerSideSessionInterface
+
+
+@pytest.fixture
+def client(app):
+    """A test client of the app with sessions in the ServerSession table."""
+    cookie_interface = app.session_interface
+    app.session_interface = ServerSideSessionInterface(SQLSessionStore(db.engine))
+    yield app.test_client()
+    app.session_interface = cookie_interface
+
+
+def session_cookie(client, app):
+    return client.get_cookie(app.config.get('SESSION_COOKIE_NAME', 'session')).value
+
+
+def stored_sids():
+    return set(db.session.execute(db.select(ServerSession.sid)).scalars())
+
+
+def test_login_and_logout_rotate_the_session_id(app, client, make_user):
+    user = make_user('alice')
+    user.set_password('secret')
+    db.session.commit()
+
+    # A session the attacker could have planted before login
+    with client.session_transaction() as session:
+        session['planted'] = True
+    before = stored_sids()
+    fixed = session_cookie(client, app)
+    assert len(before) == 1
+
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    after_login = stored_sids()
+    assert session_cookie(client, app) != fixed
+    assert len(after_login) == 1 and after_login.isdisjoint(before)
+
+    client.get('/logout')
+    assert stored_sids().isdisjoint(after_login)